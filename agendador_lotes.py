@@ -0,0 +1,166 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+
+class AgendadorLotes:
+    """
+    Agendador de micro-batching para o pipeline hierárquico
+
+    Agrupa as imagens das requisições concorrentes por até `janela_ms`
+    milissegundos ou até `tamanho_maximo` imagens, executa o pipeline em lote
+    uma única vez e devolve a cada requisição o seu resultado.
+
+    Até `lotes_simultaneos` lotes ficam em execução ao mesmo tempo (um por
+    thread do `executor`); com todos ocupados, as imagens seguintes esperam
+    na fila e formam lotes maiores.
+    """
+
+    def __init__(self, funcao_lote: Callable[[np.ndarray], List[Dict[str, Any]]],
+                 janela_ms: float = 5.0, tamanho_maximo: int = 16, executor=None,
+                 lotes_simultaneos: int = 1):
+        self.funcao_lote = funcao_lote
+        self.janela = janela_ms / 1000.0
+        self.tamanho_maximo = max(1, tamanho_maximo)
+        self.executor = executor
+        self.lotes_simultaneos = max(1, lotes_simultaneos)
+
+        self._fila: Optional[asyncio.Queue] = None
+        self._tarefa: Optional[asyncio.Task] = None
+        self._em_andamento: Set[asyncio.Task] = set()
+
+        # Estatísticas para ajuste de latência x throughput
+        self.histograma_lotes = Counter()
+        self.total_lotes = 0
+        self.total_imagens = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+
+    async def iniciar(self):
+        """Inicia a tarefa de coleta de lotes no event loop atual"""
+        self._fila = asyncio.Queue()
+        self._tarefa = asyncio.create_task(self._executar())
+
+    async def parar(self):
+        """Interrompe a coleta e cancela as requisições ainda pendentes"""
+        if self._tarefa:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+
+        for tarefa in list(self._em_andamento):
+            tarefa.cancel()
+        if self._em_andamento:
+            await asyncio.gather(*self._em_andamento, return_exceptions=True)
+
+        while self._fila and not self._fila.empty():
+            _, futuro, _ = self._fila.get_nowait()
+            if not futuro.done():
+                futuro.cancel()
+
+    async def submeter(self, img_array: np.ndarray) -> Dict[str, Any]:
+        """Enfileira uma imagem preprocessada e aguarda o resultado do seu lote"""
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila.put((img_array, futuro, time.perf_counter()))
+        return await futuro
+
+    async def _coletar_lote(self) -> list:
+        """Aguarda a primeira imagem e coleta as seguintes até fechar a janela"""
+        loop = asyncio.get_running_loop()
+        itens = [await self._fila.get()]
+        prazo = loop.time() + self.janela
+
+        while len(itens) < self.tamanho_maximo:
+            restante = prazo - loop.time()
+            if restante <= 0:
+                break
+            try:
+                itens.append(await asyncio.wait_for(self._fila.get(), restante))
+            except asyncio.TimeoutError:
+                break
+
+        # Aproveitar o que já estiver na fila sem esperar mais
+        while len(itens) < self.tamanho_maximo and not self._fila.empty():
+            itens.append(self._fila.get_nowait())
+
+        return itens
+
+    async def _executar(self):
+        """Loop principal: coleta lotes e os executa, com até `lotes_simultaneos` em andamento"""
+        vagas = asyncio.Semaphore(self.lotes_simultaneos)
+
+        def finalizar(tarefa: asyncio.Task):
+            self._em_andamento.discard(tarefa)
+            vagas.release()
+
+        while True:
+            await vagas.acquire()
+            try:
+                itens = await self._coletar_lote()
+            except BaseException:
+                vagas.release()
+                raise
+            tarefa = asyncio.create_task(self._processar_lote(itens))
+            self._em_andamento.add(tarefa)
+            tarefa.add_done_callback(finalizar)
+
+    async def _processar_lote(self, itens: list):
+        """Executa o pipeline para um lote e distribui os resultados (ou o erro) às requisições"""
+        # Descartar requisições canceladas (cliente desconectou)
+        itens = [item for item in itens if not item[1].done()]
+        if not itens:
+            return
+
+        # Qualquer falha chega a todas as requisições do lote: nenhuma fica esperando para sempre
+        try:
+            inicio = time.perf_counter()
+            for _, _, enfileirado_em in itens:
+                espera = inicio - enfileirado_em
+                self.espera_total += espera
+                self.espera_maxima = max(self.espera_maxima, espera)
+
+            self.histograma_lotes[len(itens)] += 1
+            self.total_lotes += 1
+            self.total_imagens += len(itens)
+
+            img_batch = np.concatenate([img for img, _, _ in itens], axis=0)
+            resultados = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.funcao_lote, img_batch
+            )
+            if len(resultados) != len(itens):
+                raise RuntimeError(f"Pipeline devolveu {len(resultados)} resultados para {len(itens)} imagens")
+
+            for (_, futuro, _), resultado in zip(itens, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+        except asyncio.CancelledError:
+            for _, futuro, _ in itens:
+                futuro.cancel()
+            raise
+        except Exception as e:
+            for _, futuro, _ in itens:
+                if not futuro.done():
+                    futuro.set_exception(e)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Retorna profundidade da fila, histograma de tamanhos de lote e tempos de espera"""
+        return {
+            'ativo': self._tarefa is not None,
+            'janela_ms': self.janela * 1000.0,
+            'tamanho_maximo': self.tamanho_maximo,
+            'lotes_simultaneos': self.lotes_simultaneos,
+            'lotes_em_andamento': len(self._em_andamento),
+            'profundidade_fila': self._fila.qsize() if self._fila else 0,
+            'total_lotes': self.total_lotes,
+            'total_imagens': self.total_imagens,
+            'tamanho_medio_lote': self.total_imagens / self.total_lotes if self.total_lotes else 0.0,
+            'histograma_tamanho_lote': {str(k): v for k, v in sorted(self.histograma_lotes.items())},
+            'espera_media_ms': (self.espera_total / self.total_imagens * 1000.0) if self.total_imagens else 0.0,
+            'espera_maxima_ms': self.espera_maxima * 1000.0
+        }
@@ -1,65 +1,703 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing import image
+from fastapi import FastAPI, File, Header, UploadFile, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import numpy as np
+import asyncio
+import gc
 import pickle
+import hashlib
+import hmac
+import logging
+import threading
+import time
 import os
-from PIL import Image
-import io
-from typing import Dict, Any
-from contextlib import asynccontextmanager
-
-# Variáveis globais para os modelos
-modelo_especies = None
-encoder_especies = None
-modelos_especialistas = {}
-
-# THRESHOLDS CIENTÍFICOS OTIMIZADOS
-# Valores encontrados através de análise científica de dados reais
-# Baseado em maximização do F1-Score para cada espécie
-thresholds_cientificos = {
-    'tomato': 0.75,    # F1=100% - Threshold alto para modelo sensível
-    'potato': 0.65,    # F1=95.2% - Threshold médio-alto equilibrado
-    'pepper': 0.15     # F1=95.2% - Threshold baixo para modelo conservador
+from multiprocessing import AuthenticationError
+from typing import Dict, Any, List, Optional
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from agendador_lotes import AgendadorLotes
+from cache_predicoes import CachePredicoes
+from backends_inferencia import ESPECIES_ESPECIALISTAS, caminho_backend, carregar_backend
+from processamento_lotes import (
+    dividir_em_lotes, eh_compactado, eh_imagem, executar_em_estagios, iterar_imagens_compactadas
+)
+from executor_inferencia import ExecutorInferencia, PoolSaturado
+from ingestao_uploads import (
+    MiddlewareLimiteCorpo, conteudo_em_memoria, configurar_spool_multipart, detectar_formato_imagem,
+    tamanho_arquivo
+)
+from logging_estruturado import MiddlewareIdRequisicao, amostrar, configurar_logging, logs_descartados
+from metricas import BUCKETS_BYTES, Registro
+from mosaico import TAMANHO_TILE, agregar_tiles, extrair_tiles
+from preprocessamento import carregar_rgb, decodificar_imagem, normalizar, normalizar_lote
+from registro_modelos import DIRETORIO_REGISTRO, ConjuntoModelos, RegistroModelos, caminhos_fixos
+from thresholds import THRESHOLDS_PADRAO, MonitorThresholds, arquivo_thresholds, thresholds_em_uso
+from serializacao import json_bytes, negociar_formato, resposta as serializar_resposta
+from servidor_inferencia import ClienteInferencia
+
+# Modelos em uso (espécies, encoder, especialistas e backbone compartilhado).
+# Uma recarga troca o conjunto inteiro de uma vez (ver recarregar_modelos)
+modelos_ativos = ConjuntoModelos()
+
+# Registro versionado dos modelos (ver registro_modelos.py); sem versões
+# publicadas, os modelos são lidos dos caminhos fixos de modelos_salvos/
+REGISTRO_MODELOS = os.getenv('REGISTRO_MODELOS', DIRETORIO_REGISTRO)
+registro_modelos = RegistroModelos(REGISTRO_MODELOS)
+
+# Token dos endpoints /admin (header X-Admin-Token); sem ele, os endpoints ficam desativados
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN') or None
+estado_recarga: Dict[str, Any] = {'status': 'nenhuma'}
+_lock_recarga = threading.Lock()
+_thread_recarga = None
+
+# Backend de inferência: 'keras', 'tf_function', 'tflite' ou 'onnx'
+BACKEND_INFERENCIA = os.getenv('BACKEND_INFERENCIA', 'keras')
+BACKEND_THREADS = int(os.getenv('BACKEND_THREADS', str(os.cpu_count() or 1)))
+# Variante dos modelos TFLite: 'fp32', 'fp16' ou 'int8' (ver quantizar_modelos.py)
+VARIANTE_MODELO = os.getenv('VARIANTE_MODELO', 'fp32')
+
+# Tronco ResNet50 compartilhado entre os modelos (modo opcional)
+BACKBONE_COMPARTILHADO = os.getenv('BACKBONE_COMPARTILHADO', '0') == '1'
+BACKBONE_CORTE_MINIMO = os.getenv('BACKBONE_CORTE_MINIMO', 'conv4_block1_out')
+
+# Carregamento paralelo/lazy dos modelos
+CARREGAMENTO_WORKERS = int(os.getenv('CARREGAMENTO_WORKERS', '4'))
+CARREGAMENTO_LAZY = os.getenv('CARREGAMENTO_LAZY', '0') == '1'
+tempos_carregamento: Dict[str, Dict[str, Any]] = {}
+_lock_carregamento = threading.Lock()
+_pool_carregamento = None
+
+# Servidor de inferência compartilhado entre workers (ver servidor_inferencia.py).
+# Com SERVIDOR_INFERENCIA definido, este processo não carrega TensorFlow nem os
+# modelos: os lotes são enviados ao servidor por memória compartilhada
+SERVIDOR_INFERENCIA = os.getenv('SERVIDOR_INFERENCIA') or None
+SERVIDOR_INFERENCIA_CONEXOES = int(os.getenv('SERVIDOR_INFERENCIA_CONEXOES', os.getenv('INFERENCIA_THREADS', '1')))
+cliente_inferencia = None
+info_servidor_inferencia: Dict[str, Any] = {}
+
+# Estado de prontidão do servidor (modelos carregados em segundo plano)
+modelos_prontos = False
+erro_carregamento = None
+
+# Identificador da versão dos modelos carregados (usado na chave do cache)
+versao_modelos = ''
+
+# Agendador de micro-batching e executor de inferência (criados no lifespan)
+agendador_lotes = None
+executor_inferencia = None
+
+# Cache de predições por conteúdo da imagem (opcional)
+cache_predicoes = None
+CACHE_ATIVO = os.getenv('CACHE_ATIVO', '0') == '1'
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memoria')  # 'memoria' ou 'disco'
+CACHE_DIRETORIO = os.getenv('CACHE_DIRETORIO') or None
+CACHE_MAX_ITENS = int(os.getenv('CACHE_MAX_ITENS', '4096'))
+CACHE_TTL_SEGUNDOS = float(os.getenv('CACHE_TTL_SEGUNDOS', '3600'))
+
+# Configuração do micro-batching via variáveis de ambiente
+MICRO_BATCH_ATIVO = os.getenv('MICRO_BATCH_ATIVO', '1') == '1'
+MICRO_BATCH_JANELA_MS = float(os.getenv('MICRO_BATCH_JANELA_MS', '5'))
+MICRO_BATCH_TAMANHO_MAXIMO = int(os.getenv('MICRO_BATCH_TAMANHO_MAXIMO', '16'))
+
+# Configuração dos pools de inferência/decodificação e da contrapressão
+INFERENCIA_THREADS = int(os.getenv('INFERENCIA_THREADS', '1'))
+DECODIFICACAO_WORKERS = int(os.getenv('DECODIFICACAO_WORKERS', '2'))
+DECODIFICACAO_MODO = os.getenv('DECODIFICACAO_MODO', 'processos')  # 'processos' ou 'threads'
+LIMITE_REQUISICOES_PENDENTES = int(os.getenv('LIMITE_REQUISICOES_PENDENTES', '64'))
+RETRY_AFTER_SEGUNDOS = int(os.getenv('RETRY_AFTER_SEGUNDOS', '1'))
+
+# Modo de preprocessamento: 'exato' (paridade com o caminho original) ou 'rapido' (JPEG draft)
+PREPROCESSAMENTO_MODO = os.getenv('PREPROCESSAMENTO_MODO', 'exato')
+
+# Limites de upload
+TAMANHO_MAXIMO_IMAGEM = 10 * 1024 * 1024  # 10MB
+# Limites do corpo das requisições, verificados antes da leitura (ver ingestao_uploads.py)
+LIMITE_CORPO_PREDICT = TAMANHO_MAXIMO_IMAGEM + 64 * 1024  # folga para o envelope multipart
+LIMITE_CORPO_LOTE = int(os.getenv('LIMITE_CORPO_LOTE', str(512 * 1024 * 1024)))
+LIMITE_CORPO_STREAM = int(os.getenv('LIMITE_CORPO_STREAM', str(4 * 1024 * 1024 * 1024)))
+# Arquivos até este tamanho ficam em memória durante o parse do multipart (sem ida ao disco)
+UPLOAD_SPOOL_MAXIMO = int(os.getenv('UPLOAD_SPOOL_MAXIMO', str(4 * 1024 * 1024)))
+MAX_IMAGENS_POR_LOTE = int(os.getenv('MAX_IMAGENS_POR_LOTE', '256'))
+TAMANHO_LOTE_INFERENCIA = int(os.getenv('TAMANHO_LOTE_INFERENCIA', '32'))
+MAX_IMAGENS_STREAM = int(os.getenv('MAX_IMAGENS_STREAM', '10000'))
+TAMANHO_BUFFER_STREAM = int(os.getenv('TAMANHO_BUFFER_STREAM', '64'))
+
+# Inferência em mosaico (POST /predict_tiles, ver mosaico.py)
+TILES_TAMANHO_MAXIMO_IMAGEM = int(os.getenv('TILES_TAMANHO_MAXIMO_IMAGEM', str(40 * 1024 * 1024)))
+TILES_MAXIMO = int(os.getenv('TILES_MAXIMO', '64'))
+TILES_SOBREPOSICAO = float(os.getenv('TILES_SOBREPOSICAO', '0.25'))
+TILES_LADO_MAXIMO = int(os.getenv('TILES_LADO_MAXIMO', '4096'))
+TILES_FRACAO_VERDE_MINIMA = float(os.getenv('TILES_FRACAO_VERDE_MINIMA', '0.05'))
+TILES_FRACAO_DOENTE = float(os.getenv('TILES_FRACAO_DOENTE', '0.1'))
+
+# Aquecimento dos modelos antes da prontidão: uma passada por tamanho de lote
+# (por padrão, os tamanhos usados pelo micro-batching e pelo /predict_batch)
+AQUECIMENTO_ATIVO = os.getenv('AQUECIMENTO_ATIVO', '1') == '1'
+AQUECIMENTO_TAMANHOS = sorted({
+    int(t) for t in os.getenv(
+        'AQUECIMENTO_TAMANHOS', f'1,{MICRO_BATCH_TAMANHO_MAXIMO},{TAMANHO_LOTE_INFERENCIA}'
+    ).split(',') if t.strip()
+})
+AQUECIMENTO_REPETICOES = int(os.getenv('AQUECIMENTO_REPETICOES', '2'))
+
+# Política de roteamento para os especialistas (ver _rotear_especies):
+# 'padrao' (sempre o especialista da espécie predita), 'piso_confianca'
+# (nenhum especialista abaixo do piso de confiança da espécie), 'top_k'
+# (especialistas das k espécies mais prováveis quando a espécie é ambígua)
+# ou 'somente_especies' (nenhum especialista)
+POLITICAS_ROTEAMENTO = ('padrao', 'piso_confianca', 'top_k', 'somente_especies')
+POLITICA_ROTEAMENTO = os.getenv('POLITICA_ROTEAMENTO', 'padrao')
+if POLITICA_ROTEAMENTO not in POLITICAS_ROTEAMENTO:
+    raise ValueError(f"POLITICA_ROTEAMENTO inválida: {POLITICA_ROTEAMENTO}. Opções: {', '.join(POLITICAS_ROTEAMENTO)}")
+ROTEAMENTO_PISO_CONFIANCA = float(os.getenv('ROTEAMENTO_PISO_CONFIANCA', '0.5'))
+ROTEAMENTO_TOP_K = int(os.getenv('ROTEAMENTO_TOP_K', '2'))
+# Com 'top_k', a espécie é ambígua quando as duas mais prováveis diferem menos que a margem
+ROTEAMENTO_MARGEM = float(os.getenv('ROTEAMENTO_MARGEM', '0.2'))
+
+# Métricas no formato Prometheus (GET /metrics); desativadas, a instrumentação não custa nada
+METRICAS_ATIVAS = os.getenv('METRICAS_ATIVAS', '1') == '1'
+metricas = Registro(ativo=METRICAS_ATIVAS)
+LATENCIA_ETAPAS = metricas.histograma(
+    'plant_etapa_segundos', 'Latência de cada etapa da requisição', ['etapa']
+)
+LATENCIA_REQUISICOES = metricas.histograma(
+    'plant_requisicao_segundos', 'Latência total da requisição por endpoint', ['endpoint']
+)
+TAMANHO_UPLOADS = metricas.histograma(
+    'plant_upload_bytes', 'Tamanho das imagens recebidas', buckets=BUCKETS_BYTES
+)
+PREDICOES = metricas.contador(
+    'plant_predicoes_total', 'Predições por espécie e status de saúde', ['especie', 'saude']
+)
+ESPECIALISTA_INDISPONIVEL = metricas.contador(
+    'plant_especialista_indisponivel_total', 'Predições sem modelo especialista disponível', ['especie']
+)
+TILES = metricas.contador(
+    'plant_tiles_total', 'Tiles do /predict_tiles processados ou descartados como fundo', ['destino']
+)
+ROTEAMENTO = metricas.contador(
+    'plant_roteamento_total', 'Decisões da política de roteamento por predição', ['politica', 'decisao']
+)
+PASSADAS_ESPECIALISTA = metricas.contador(
+    'plant_especialista_passadas_total', 'Imagens processadas pelos especialistas', ['politica']
+)
+PASSADAS_EVITADAS = metricas.contador(
+    'plant_especialista_passadas_evitadas_total',
+    'Passadas de especialista que a política padrão faria e a política em uso evitou', ['politica']
+)
+PASSADAS_ADICIONAIS = metricas.contador(
+    'plant_especialista_passadas_adicionais_total',
+    'Passadas de especialista além da política padrão (roteamento top_k)', ['politica']
+)
+
+# Modo padrão das respostas de predição: 'completo' ou 'compacto' (ver serializacao.py)
+RESPOSTA_MODO_PADRAO = os.getenv('RESPOSTA_MODO_PADRAO', 'completo')
+
+# Logs estruturados (JSON por linha) escritos por uma thread separada
+LOG_NIVEL = os.getenv('LOG_NIVEL', 'INFO')
+LOG_FORMATO = os.getenv('LOG_FORMATO', 'json')  # 'json' ou 'texto'
+LOG_AMOSTRAGEM = float(os.getenv('LOG_AMOSTRAGEM', '1.0'))  # fração das predições registradas
+LOG_FILA_MAXIMA = int(os.getenv('LOG_FILA_MAXIMA', '10000'))
+logger = logging.getLogger('plant_api')
+
+# Mapeamento do nome da espécie (encoder) para o modelo especialista
+MAPEAMENTO_ESPECIES = {
+    'Tomato': 'tomato',
+    'Potato': 'potato', 
+    'Pepper_bell': 'pepper'
 }
 
-def carregar_modelos():
-    """Carrega todos os modelos necessários"""
-    global modelo_especies, encoder_especies, modelos_especialistas
+# Thresholds científicos em uso (valores padrão em thresholds.py)
+thresholds_cientificos = dict(THRESHOLDS_PADRAO)
+
+# Arquivo versionado gerado por `otimizar_thresholds.py`. Quando existe,
+# substitui os valores padrão e é recarregado sempre que muda no disco
+# (verificado a cada THRESHOLDS_RECARGA_SEGUNDOS; 0 desativa a recarga)
+THRESHOLDS_ARQUIVO = arquivo_thresholds()
+THRESHOLDS_RECARGA_SEGUNDOS = float(os.getenv('THRESHOLDS_RECARGA_SEGUNDOS', '5'))
+versao_thresholds = 'padrao'
+monitor_thresholds = None
+
+def _aplicar_thresholds(conteudo: Dict[str, Any]):
+    """Troca os thresholds em uso pelos de um arquivo já validado"""
+    global thresholds_cientificos, versao_thresholds
+    
+    # Um novo dicionário é atribuído de uma vez: predições em andamento
+    # continuam com o anterior
+    thresholds_cientificos = {**THRESHOLDS_PADRAO, **conteudo['thresholds']}
+    versao_thresholds = str(conteudo.get('versao', 'desconhecida'))
+    logger.info("thresholds carregados", extra={'campos': {
+        'arquivo': THRESHOLDS_ARQUIVO, 'versao': versao_thresholds, 'thresholds': thresholds_cientificos
+    }})
+
+def carregar_thresholds():
+    """
+    Aplica o arquivo de thresholds uma única vez, sem vigiá-lo
+    
+    Usado pelas ferramentas offline: uma execução longa usa uma única versão,
+    e um arquivo inválido interrompe a execução (ValueError).
+    """
+    global thresholds_cientificos, versao_thresholds
     
+    thresholds_cientificos, versao_thresholds = thresholds_em_uso(THRESHOLDS_ARQUIVO)
+
+def iniciar_monitor_thresholds():
+    """Carrega o arquivo de thresholds (se existir) e passa a recarregá-lo quando mudar"""
+    global monitor_thresholds
+    
+    if monitor_thresholds is None:
+        monitor_thresholds = MonitorThresholds(
+            THRESHOLDS_ARQUIVO, _aplicar_thresholds,
+            lambda e: logger.error("arquivo de thresholds inválido; mantendo os atuais", extra={'campos': {
+                'arquivo': THRESHOLDS_ARQUIVO, 'erro': str(e)
+            }})
+        )
+        monitor_thresholds.iniciar(THRESHOLDS_RECARGA_SEGUNDOS)
+
+def parar_monitor_thresholds():
+    global monitor_thresholds
+    
+    if monitor_thresholds is not None:
+        monitor_thresholds.parar()
+        monitor_thresholds = None
+
+def _calcular_versao_modelos(caminhos: List[str]) -> str:
+    """Identificador curto derivado do tamanho e data de modificação dos arquivos de modelo"""
+    h = hashlib.blake2b(digest_size=8)
+    for caminho in sorted(caminhos):
+        if os.path.exists(caminho):
+            info = os.stat(caminho)
+            h.update(f"{caminho}:{info.st_size}:{info.st_mtime_ns}".encode('utf-8'))
+    return h.hexdigest()
+
+def _registrar_carregamento(nome: str, inicio: float, status: str, erro: Optional[str] = None,
+                            tempos: Optional[Dict[str, Dict[str, Any]]] = None):
+    """Registra o tempo e o resultado do carregamento de um modelo (em `tempos_carregamento`, por padrão)"""
+    if tempos is None:
+        tempos = tempos_carregamento
+    tempos[nome] = {
+        'status': status,
+        'tempo_s': round(time.perf_counter() - inicio, 3)
+    }
+    if erro:
+        tempos[nome]['erro'] = erro
+
+def _resolver_modelos(versao: Optional[str] = None):
+    """
+    Versão e caminhos dos modelos a carregar
+    
+    Com versões publicadas em REGISTRO_MODELOS usa `versao` (ou a apontada
+    por ATUAL); sem registro, os caminhos fixos de `modelos_salvos/`.
+    
+    Returns:
+        tuple: (versão do registro ou None, caminhos por nome lógico)
+    """
+    if versao is None:
+        versao = registro_modelos.versao_atual()
+    if versao is None:
+        return None, caminhos_fixos()
+    caminhos = registro_modelos.caminhos(versao)
+    registro_modelos.verificar(versao)
+    return versao, caminhos
+
+def _arquivo_modelo(nome: str, caminhos: Dict[str, str]) -> str:
+    """Arquivo efetivamente carregado para um modelo no backend configurado"""
+    return caminho_backend(nome, caminhos[nome], BACKEND_INFERENCIA, caminhos['exportados'], VARIANTE_MODELO)
+
+def _carregar_backend(nome: str, caminhos: Dict[str, str]):
+    return carregar_backend(
+        nome, caminhos[nome], BACKEND_INFERENCIA, BACKEND_THREADS,
+        diretorio=caminhos['exportados'], variante=VARIANTE_MODELO
+    )
+
+def _carregar_modelo_especies(conjunto: ConjuntoModelos, tempos: Dict[str, Dict[str, Any]]):
+    """Carrega o modelo de espécies e seu label encoder"""
+    inicio = time.perf_counter()
+    logger.info("carregando modelo de espécies", extra={'campos': {
+        'backend': BACKEND_INFERENCIA, 'versao': conjunto.versao or None
+    }})
+    conjunto.modelo_especies = _carregar_backend('especies', conjunto.caminhos)
+    
+    with open(conjunto.caminhos['encoder_especies'], 'rb') as f:
+        conjunto.encoder_especies = pickle.load(f)
+    
+    _registrar_carregamento('especies', inicio, 'carregado', tempos=tempos)
+    logger.info("modelo de espécies carregado", extra={'campos': {
+        'classes': conjunto.encoder_especies.classes_.tolist(), 'tempo_s': tempos['especies']['tempo_s']
+    }})
+
+def _carregar_especialista(especie: str, conjunto: ConjuntoModelos, tempos: Dict[str, Dict[str, Any]]):
+    """Carrega um modelo especialista balanceado e o registra no conjunto"""
+    nome = f'especialista_{especie}'
+    inicio = time.perf_counter()
     try:
-        # Carregar modelo de espécies
-        print("📂 Carregando modelo de espécies...")
-        modelo_especies = load_model('modelos_salvos/melhor_modelo_especies_final_otimizado.h5')
-        
-        with open('datasets_processados/label_encoder_especies_modelo.pkl', 'rb') as f:
-            encoder_especies = pickle.load(f)
-        
-        print(f"✅ Modelo de espécies carregado: {encoder_especies.classes_}")
-        
-        # Carregar modelos especialistas balanceados
-        print("📂 Carregando modelos especialistas balanceados...")
-        for especie in ['tomato', 'potato', 'pepper']:
-            modelo_path = f'modelos_salvos/especialistas/especialista_{especie}_balanceado_final.h5'
-            if os.path.exists(modelo_path):
-                modelos_especialistas[especie] = load_model(modelo_path)
-                print(f"✅ Modelo {especie} balanceado carregado")
-            else:
-                print(f"⚠️ Modelo {especie} não encontrado em {modelo_path}")
-        
-        print("🎯 Todos os modelos carregados com sucesso!")
+        conjunto.modelos_especialistas[especie] = _carregar_backend(nome, conjunto.caminhos)
+    except Exception as e:
+        _registrar_carregamento(nome, inicio, 'erro', str(e), tempos=tempos)
+        logger.error("erro ao carregar especialista", extra={'campos': {'especie': especie, 'erro': str(e)}})
+        raise
+    _registrar_carregamento(nome, inicio, 'carregado', tempos=tempos)
+    logger.info("especialista carregado", extra={'campos': {
+        'especie': especie, 'tempo_s': tempos[nome]['tempo_s']
+    }})
+
+def _agendar_especialista(especie: str, conjunto: ConjuntoModelos,
+                          tempos: Optional[Dict[str, Dict[str, Any]]] = None):
+    """Inicia (uma única vez por conjunto) o carregamento de um especialista no pool de carregamento"""
+    global _pool_carregamento
+    
+    if tempos is None:
+        tempos = tempos_carregamento
+    with _lock_carregamento:
+        futuro = conjunto.futuros_especialistas.get(especie)
+        if futuro is None:
+            if _pool_carregamento is None:
+                _pool_carregamento = ThreadPoolExecutor(
+                    max_workers=CARREGAMENTO_WORKERS, thread_name_prefix='carregamento'
+                )
+            tempos[f'especialista_{especie}'] = {'status': 'carregando'}
+            futuro = _pool_carregamento.submit(_carregar_especialista, especie, conjunto, tempos)
+            conjunto.futuros_especialistas[especie] = futuro
+        return futuro
+
+def especialista_disponivel(especie: str, modelos: Optional[ConjuntoModelos] = None) -> bool:
+    """
+    Verifica se o especialista pode ser usado, aguardando seu carregamento se necessário
+    
+    Com carregamento lazy, o primeiro uso dispara o carregamento e a
+    requisição aguarda o modelo em vez de responder sem a saúde.
+    """
+    modelos = modelos or modelos_ativos
+    if especie in modelos.modelos_especialistas:
+        return True
+    if not os.path.exists(_arquivo_modelo(f'especialista_{especie}', modelos.caminhos)):
+        return False
+    try:
+        _agendar_especialista(especie, modelos).result()
+    except Exception:
+        return False
+    return especie in modelos.modelos_especialistas
+
+def _carregar_conjunto(versao: Optional[str] = None, lazy: bool = CARREGAMENTO_LAZY,
+                       tempos: Optional[Dict[str, Dict[str, Any]]] = None) -> ConjuntoModelos:
+    """Carrega os modelos de uma versão (especialistas em paralelo), sem colocá-los em uso"""
+    if tempos is None:
+        tempos = tempos_carregamento
+    versao, caminhos = _resolver_modelos(versao)
+    conjunto = ConjuntoModelos(versao or '', caminhos)
+    arquivos = [_arquivo_modelo('especies', caminhos), caminhos['encoder_especies']]
+    
+    # Carregar modelos especialistas balanceados em paralelo ao de espécies
+    futuros = []
+    for especie in ESPECIES_ESPECIALISTAS:
+        nome = f'especialista_{especie}'
+        modelo_path = _arquivo_modelo(nome, caminhos)
+        arquivos.append(modelo_path)
+        if not os.path.exists(modelo_path):
+            tempos[nome] = {'status': 'ausente'}
+            logger.warning("especialista não encontrado", extra={'campos': {'especie': especie, 'caminho': modelo_path}})
+        elif lazy:
+            tempos[nome] = {'status': 'pendente'}
+            logger.info("especialista será carregado no primeiro uso", extra={'campos': {'especie': especie}})
+        else:
+            futuros.append(_agendar_especialista(especie, conjunto, tempos))
+    
+    _carregar_modelo_especies(conjunto, tempos)
+    
+    for futuro in futuros:
+        futuro.result()
+    
+    if BACKBONE_COMPARTILHADO:
+        if BACKEND_INFERENCIA != 'keras':
+            logger.warning("backbone compartilhado requer BACKEND_INFERENCIA=keras; ignorado")
+        elif lazy:
+            logger.warning("backbone compartilhado requer CARREGAMENTO_LAZY=0; ignorado")
+        else:
+            ativar_backbone_compartilhado(conjunto)
+    
+    # Sem registro, a versão é derivada dos arquivos carregados
+    if not conjunto.versao:
+        conjunto.versao = _calcular_versao_modelos(arquivos)
+    return conjunto
+
+def _ativar_conjunto(conjunto: ConjuntoModelos):
+    """
+    Coloca um conjunto de modelos em uso
+    
+    É uma única atribuição: cada lote lê `modelos_ativos` uma vez no início,
+    então os lotes em andamento terminam com o conjunto anterior.
+    """
+    global modelos_ativos, versao_modelos
+    
+    modelos_ativos = conjunto
+    versao_modelos = conjunto.versao
+
+def carregar_modelos(versao: Optional[str] = None):
+    """Carrega todos os modelos necessários (em paralelo), aquece e os coloca em uso"""
+    try:
+        conjunto = _carregar_conjunto(versao)
+        # A prontidão só é sinalizada depois do aquecimento
+        if AQUECIMENTO_ATIVO:
+            _aquecer_conjunto(conjunto, tempos_carregamento)
+        _ativar_conjunto(conjunto)
+        logger.info("modelos carregados", extra={'campos': {'versao_modelos': versao_modelos}})
         
     except Exception as e:
-        print(f"❌ Erro ao carregar modelos: {e}")
+        logger.exception("erro ao carregar modelos")
         raise e
 
+def ativar_backbone_compartilhado(conjunto: ConjuntoModelos):
+    """Substitui os especialistas compatíveis por cabeças sobre um tronco único"""
+    from backbone_compartilhado import construir_backbone_compartilhado
+    
+    backbone = construir_backbone_compartilhado(
+        conjunto.modelo_especies, conjunto.modelos_especialistas, corte_minimo=BACKBONE_CORTE_MINIMO
+    )
+    
+    if backbone is None:
+        logger.warning("nenhum especialista compartilha o backbone do modelo de espécies")
+        return
+    
+    # Manter apenas as cabeças, liberando as cópias completas da ResNet50
+    conjunto.backbone_compartilhado = backbone
+    conjunto.modelos_especialistas.update(backbone.cabecas_especialistas)
+    gc.collect()
+    
+    logger.info("backbone compartilhado ativo", extra={'campos': {
+        'corte': backbone.corte, 'especies': backbone.especies,
+        'sem_compartilhamento': backbone.especies_sem_compartilhamento
+    }})
+
+def _medir_ms(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, round((time.perf_counter() - inicio) * 1000, 2)
+
+def aquecer_modelos(conjunto: ConjuntoModelos, tamanhos: List[int] = AQUECIMENTO_TAMANHOS,
+                    repeticoes: int = AQUECIMENTO_REPETICOES) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Executa lotes sintéticos de cada tamanho no modelo de espécies e em cada especialista
+    
+    O Keras traça e aloca sob demanda na primeira chamada de cada forma de
+    entrada; sem o aquecimento, esse custo cai na primeira requisição que usa
+    cada modelo. Só os especialistas já carregados são aquecidos (com
+    CARREGAMENTO_LAZY=1 os demais continuam frios até o primeiro uso).
+    
+    Returns:
+        dict: {modelo: {tamanho do lote: {'frio_ms', 'quente_ms'}}}, onde
+        `frio_ms` é a primeira passada e `quente_ms` a melhor das `repeticoes` seguintes
+    """
+    tempos: Dict[str, Dict[str, Dict[str, float]]] = {}
+    
+    def registrar(modelo: str, tamanho: int, funcao, *args):
+        resultado, frio = _medir_ms(funcao, *args)
+        quente = min((_medir_ms(funcao, *args)[1] for _ in range(repeticoes)), default=frio)
+        tempos.setdefault(modelo, {})[str(tamanho)] = {'frio_ms': frio, 'quente_ms': quente}
+        return resultado
+    
+    for tamanho in tamanhos:
+        entrada = np.zeros((tamanho, 224, 224, 3), dtype=np.float32)
+        _, features = registrar('especies', tamanho, _classificar_especies_lote, entrada, conjunto)
+        for especie in list(conjunto.modelos_especialistas):
+            registrar(f'especialista_{especie}', tamanho, _classificar_saude_lote, especie, entrada, features, conjunto)
+    
+    conjunto.tempos_aquecimento = tempos
+    return tempos
+
+def _aquecer_conjunto(conjunto: ConjuntoModelos, tempos: Dict[str, Dict[str, Any]]):
+    """Aquece o conjunto registrando a duração total como a etapa 'aquecimento' do carregamento"""
+    inicio = time.perf_counter()
+    tempos['aquecimento'] = {'status': 'aquecendo'}
+    try:
+        aquecer_modelos(conjunto)
+    except Exception as e:
+        _registrar_carregamento('aquecimento', inicio, 'erro', str(e), tempos=tempos)
+        raise
+    _registrar_carregamento('aquecimento', inicio, 'concluido', tempos=tempos)
+    logger.info("modelos aquecidos", extra={'campos': {
+        'tamanhos': AQUECIMENTO_TAMANHOS, 'tempo_s': tempos['aquecimento']['tempo_s'],
+        'tempos': conjunto.tempos_aquecimento
+    }})
+
+def recarregar_modelos(versao: Optional[str] = None):
+    """
+    Carrega uma versão em segundo plano, aquece e troca pelos modelos em uso
+    
+    Os modelos atuais continuam servindo durante todo o carregamento. Em caso
+    de erro, nada é trocado. Com registro, a versão carregada passa a ser a
+    ATUAL (mantida em reinicializações).
+    """
+    tempos: Dict[str, Dict[str, Any]] = {}
+    estado_recarga.update({
+        'status': 'carregando', 'versao_anterior': versao_modelos, 'versao_pedida': versao,
+        'versao_nova': None, 'iniciada_em': time.strftime('%Y-%m-%dT%H:%M:%S'), 'erro': None,
+        'tempos_carregamento': tempos
+    })
+    inicio = time.perf_counter()
+    try:
+        conjunto = _carregar_conjunto(versao, lazy=False, tempos=tempos)
+        estado_recarga['status'] = 'aquecendo'
+        _aquecer_conjunto(conjunto, tempos)
+        if versao is not None:
+            registro_modelos.ativar(versao)
+        _ativar_conjunto(conjunto)
+        tempos_carregamento.update(tempos)
+    except Exception as e:
+        estado_recarga.update({'status': 'erro', 'erro': str(e), 'duracao_s': round(time.perf_counter() - inicio, 3)})
+        logger.exception("erro ao recarregar modelos", extra={'campos': {'versao': versao}})
+        return
+    
+    estado_recarga.update({
+        'status': 'concluida', 'versao_nova': conjunto.versao, 'duracao_s': round(time.perf_counter() - inicio, 3)
+    })
+    logger.info("modelos recarregados", extra={'campos': {
+        'versao_anterior': estado_recarga['versao_anterior'], 'versao_modelos': conjunto.versao,
+        'duracao_s': estado_recarga['duracao_s']
+    }})
+
+def iniciar_recarga(versao: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Dispara `recarregar_modelos` em uma thread, se não houver outra recarga em andamento
+    
+    Raises:
+        HTTPException: 409 se já há uma recarga em andamento, 404 se a versão não existe
+    """
+    global _thread_recarga
+    
+    if versao is not None:
+        try:
+            registro_modelos.caminhos(versao)
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    with _lock_recarga:
+        if _thread_recarga is not None and _thread_recarga.is_alive():
+            raise HTTPException(status_code=409, detail="Já existe uma recarga de modelos em andamento")
+        estado_recarga.update({'status': 'carregando', 'versao_pedida': versao, 'erro': None})
+        _thread_recarga = threading.Thread(target=recarregar_modelos, args=(versao,), name='recarga', daemon=True)
+        _thread_recarga.start()
+    return dict(estado_recarga)
+
+def info_modelos() -> Dict[str, Any]:
+    """Versão em uso, versões do registro e estado da última recarga"""
+    versoes = registro_modelos.versoes()
+    return {
+        'versao_modelos': versao_modelos,
+        'registro': {
+            'diretorio': REGISTRO_MODELOS,
+            'versoes': versoes,
+            'atual': registro_modelos.versao_atual() if versoes else None
+        },
+        'recarga': dict(estado_recarga)
+    }
+
+async def _carregar_modelos_em_segundo_plano():
+    """Executa `carregar_modelos` fora do event loop e marca o servidor como pronto"""
+    global modelos_prontos, erro_carregamento
+    
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, carregar_modelos)
+        modelos_prontos = True
+    except Exception as e:
+        erro_carregamento = str(e)
+
+def _falha_servidor_inferencia(inicio: float, erro: str):
+    """Registra uma falha definitiva de conexão: o worker fica não pronto, com o erro em /health"""
+    global erro_carregamento
+    
+    erro_carregamento = erro
+    _registrar_carregamento('servidor_inferencia', inicio, 'erro', erro)
+    logger.error("falha ao conectar ao servidor de inferência", extra={'campos': {
+        'endereco': SERVIDOR_INFERENCIA, 'erro': erro
+    }})
+
+async def _conectar_servidor_inferencia():
+    """Aguarda o servidor de inferência aceitar conexões e marca o worker como pronto"""
+    global cliente_inferencia, info_servidor_inferencia, versao_modelos, modelos_prontos
+    
+    loop = asyncio.get_running_loop()
+    tempos_carregamento['servidor_inferencia'] = {'status': 'aguardando', 'endereco': SERVIDOR_INFERENCIA}
+    inicio = time.perf_counter()
+    try:
+        while cliente_inferencia is None:
+            try:
+                cliente_inferencia = await loop.run_in_executor(
+                    None, ClienteInferencia, SERVIDOR_INFERENCIA, SERVIDOR_INFERENCIA_CONEXOES
+                )
+            except (FileNotFoundError, ConnectionRefusedError):
+                # Servidor ainda não iniciado
+                await asyncio.sleep(1)
+        
+        info_servidor_inferencia = await loop.run_in_executor(None, cliente_inferencia.info)
+    except AuthenticationError as e:
+        _falha_servidor_inferencia(inicio, f"Chave de autenticação recusada pelo servidor de inferência: {e}")
+        return
+    except Exception as e:
+        _falha_servidor_inferencia(inicio, f"{type(e).__name__}: {e}")
+        return
+    
+    versao_modelos = info_servidor_inferencia['versao_modelos']
+    _registrar_carregamento('servidor_inferencia', inicio, 'conectado')
+    modelos_prontos = True
+    logger.info("conectado ao servidor de inferência", extra={'campos': {'endereco': SERVIDOR_INFERENCIA}})
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gerencia o ciclo de vida da aplicação"""
-    carregar_modelos()
+    global agendador_lotes, executor_inferencia, cache_predicoes
+    
+    ouvinte_logs = configurar_logging('plant_api', LOG_NIVEL, LOG_FORMATO, LOG_FILA_MAXIMA)
+    iniciar_monitor_thresholds()
+    
+    # Modelos carregam em segundo plano: /health/live responde imediatamente
+    # e /health/ready só fica pronto quando o carregamento termina
+    if SERVIDOR_INFERENCIA:
+        tarefa_carregamento = asyncio.create_task(_conectar_servidor_inferencia())
+    else:
+        tarefa_carregamento = asyncio.create_task(_carregar_modelos_em_segundo_plano())
+    
+    if CACHE_ATIVO:
+        cache_predicoes = CachePredicoes(
+            max_itens=CACHE_MAX_ITENS,
+            ttl_segundos=CACHE_TTL_SEGUNDOS,
+            backend=CACHE_BACKEND,
+            diretorio=CACHE_DIRETORIO
+        )
+    
+    executor_inferencia = ExecutorInferencia(
+        threads_inferencia=INFERENCIA_THREADS,
+        workers_decodificacao=DECODIFICACAO_WORKERS,
+        modo_decodificacao=DECODIFICACAO_MODO,
+        limite_pendentes=LIMITE_REQUISICOES_PENDENTES
+    )
+    
+    if MICRO_BATCH_ATIVO:
+        agendador_lotes = AgendadorLotes(
+            pipeline_hierarquico_lote,
+            janela_ms=MICRO_BATCH_JANELA_MS,
+            tamanho_maximo=MICRO_BATCH_TAMANHO_MAXIMO,
+            executor=executor_inferencia.inferencia,
+            lotes_simultaneos=INFERENCIA_THREADS
+        )
+        await agendador_lotes.iniciar()
+    
     yield
+    
+    tarefa_carregamento.cancel()
+    
+    if agendador_lotes is not None:
+        await agendador_lotes.parar()
+        agendador_lotes = None
+    
+    executor_inferencia.encerrar()
+    executor_inferencia = None
+    
+    if cliente_inferencia is not None:
+        cliente_inferencia.fechar()
+    
+    parar_monitor_thresholds()
+    ouvinte_logs.stop()
 
 app = FastAPI(
     title="Plant Disease Detection API",
@@ -67,6 +705,14 @@ app = FastAPI(
     version="4.0.0",
     lifespan=lifespan
 )
+app.add_middleware(MiddlewareLimiteCorpo, limites={
+    '/predict': LIMITE_CORPO_PREDICT,
+    '/predict_batch': LIMITE_CORPO_LOTE,
+    '/predict_stream': LIMITE_CORPO_STREAM,
+    '/predict_tiles': TILES_TAMANHO_MAXIMO_IMAGEM + 64 * 1024
+})
+app.add_middleware(MiddlewareIdRequisicao)
+configurar_spool_multipart(UPLOAD_SPOOL_MAXIMO)
 
 # Endpoint de status
 @app.get("/")
@@ -78,12 +724,19 @@ async def root():
         "features": [
             "🔬 Thresholds científicos baseados em análise de dados",
             "🎯 Performance otimizada (>95% acurácia)",
-            "📊 Tomato: 0.75, Potato: 0.65, Pepper: 0.15",
+            "📊 " + ", ".join(f"{especie.capitalize()}: {valor}" for especie, valor in thresholds_cientificos.items()),
             "🌱 Modelos especialistas balanceados"
         ],
         "endpoints": {
             "/predict": "POST - Classificar imagem de planta",
+            "/predict_batch": "POST - Classificar várias imagens (ou um zip/tar) em uma requisição",
+            "/predict_stream": "POST - Como /predict_batch, devolvendo NDJSON à medida que cada imagem termina",
+            "/predict_tiles": "POST - Classificar foto de campo em alta resolução por tiles, com mapa de doença",
             "/status": "GET - Verificar status dos modelos",
+            "/admin/modelos/recarregar": "POST - Recarregar os modelos sem reiniciar (X-Admin-Token)",
+            "/metrics": "GET - Métricas no formato Prometheus",
+            "/health/live": "GET - Liveness do processo",
+            "/health/ready": "GET - Readiness (modelos carregados)",
             "/docs": "GET - Documentação interativa"
         }
     }
@@ -91,133 +744,626 @@ async def root():
 @app.get("/status")
 async def check_status():
     """Verifica o status dos modelos carregados"""
+    modelos = modelos_ativos
     return {
         "modelo_especies": {
-            "carregado": modelo_especies is not None,
-            "classes": encoder_especies.classes_.tolist() if encoder_especies else []
+            "carregado": modelos.modelo_especies is not None,
+            "classes": modelos.encoder_especies.classes_.tolist() if modelos.encoder_especies else []
         },
         "modelos_especialistas": {
-            "carregados": list(modelos_especialistas.keys()),
-            "total": len(modelos_especialistas)
+            "carregados": list(modelos.modelos_especialistas.keys()),
+            "total": len(modelos.modelos_especialistas)
         },
-        "thresholds_cientificos": {
-            "tomato": thresholds_cientificos['tomato'],
-            "potato": thresholds_cientificos['potato'],
-            "pepper": thresholds_cientificos['pepper']
+        "thresholds_cientificos": thresholds_cientificos,
+        "thresholds": {
+            "versao": versao_thresholds,
+            "arquivo": THRESHOLDS_ARQUIVO if versao_thresholds != 'padrao' else None
         },
+        "backbone_compartilhado": (
+            modelos.backbone_compartilhado.info() if modelos.backbone_compartilhado else {"ativo": False}
+        ),
+        "micro_batching": agendador_lotes.estatisticas() if agendador_lotes else {"ativo": False},
+        "executor": executor_inferencia.estatisticas() if executor_inferencia else {},
+        "cache": cache_predicoes.estatisticas() if cache_predicoes else {"ativo": False},
+        "versao_modelos": versao_modelos,
+        "recarga_modelos": dict(estado_recarga),
+        "logs_descartados": logs_descartados(),
+        "modelos_prontos": modelos_prontos,
+        "tempos_carregamento": tempos_carregamento,
+        "roteamento": configuracao_roteamento(),
+        "aquecimento": {
+            "ativo": AQUECIMENTO_ATIVO,
+            "tamanhos": AQUECIMENTO_TAMANHOS,
+            "tempos": modelos.tempos_aquecimento
+        },
+        "backend_inferencia": BACKEND_INFERENCIA,
+        "variante_modelo": VARIANTE_MODELO if BACKEND_INFERENCIA == 'tflite' else 'fp32',
+        "servidor_inferencia": (
+            {"ativo": True, "endereco": SERVIDOR_INFERENCIA, **info_servidor_inferencia}
+            if SERVIDOR_INFERENCIA else {"ativo": False}
+        ),
         "versao": "4.0.0 - Thresholds Científicos"
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Métricas no formato texto do Prometheus"""
+    if not METRICAS_ATIVAS:
+        raise HTTPException(status_code=404, detail="Métricas desativadas (METRICAS_ATIVAS=0)")
+    return PlainTextResponse(metricas.expor(), media_type="text/plain; version=0.0.4")
+
+def _coletar_tempos_carregamento():
+    """Tempos de carregamento dos modelos, derivados de `tempos_carregamento`"""
+    amostras = [
+        ({'modelo': nome, 'status': info['status']}, info['tempo_s'])
+        for nome, info in list(tempos_carregamento.items()) if 'tempo_s' in info
+    ]
+    aquecimento = [
+        ({'modelo': modelo, 'tamanho_lote': tamanho, 'fase': fase}, medidas[f'{fase}_ms'] / 1000)
+        for modelo, por_tamanho in list(modelos_ativos.tempos_aquecimento.items())
+        for tamanho, medidas in por_tamanho.items()
+        for fase in ('frio', 'quente')
+    ]
+    return [
+        ('plant_modelo_carregamento_segundos', 'gauge', 'Tempo de carregamento de cada modelo', amostras),
+        ('plant_modelos_prontos', 'gauge', 'Modelos carregados e servidor pronto', [({}, float(modelos_prontos))]),
+        ('plant_aquecimento_segundos', 'gauge',
+         'Passada de aquecimento por modelo e tamanho de lote (frio: primeira, quente: seguintes)', aquecimento)
+    ]
+
+metricas.adicionar_coletor(_coletar_tempos_carregamento)
+
+@app.get("/health/live")
+async def health_live():
+    """
+    Liveness: o processo está respondendo (os modelos podem ainda estar carregando)
+    
+    Uma falha no carregamento dos modelos não derruba a liveness: reiniciar o
+    processo não a corrigiria. Ela aparece em /health/ready.
+    """
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness: todos os modelos necessários foram carregados (ou o erro que impediu o carregamento)"""
+    if modelos_prontos:
+        status = "pronto"
+    elif erro_carregamento:
+        status = "erro"
+    else:
+        status = "carregando"
+    conteudo = {"status": status, "tempos_carregamento": tempos_carregamento}
+    if erro_carregamento and not modelos_prontos:
+        conteudo["erro"] = erro_carregamento
+    if not modelos_prontos:
+        return JSONResponse(status_code=503, content=conteudo)
+    return conteudo
+
+def verificar_admin(token: Optional[str]):
+    """Exige o header X-Admin-Token igual a ADMIN_TOKEN (endpoints desativados sem ADMIN_TOKEN)"""
+    if ADMIN_TOKEN is None:
+        raise HTTPException(status_code=403, detail="Endpoints de administração desativados (defina ADMIN_TOKEN)")
+    if token is None or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="X-Admin-Token inválido")
+
+def _controlar_servidor_inferencia(operacao: str, *args) -> Dict[str, Any]:
+    """Repassa uma operação de administração ao servidor de inferência, mantendo o status HTTP"""
+    resposta = cliente_inferencia.controlar(operacao, *args)
+    if 'erro_http' in resposta:
+        raise HTTPException(status_code=resposta['erro_http'], detail=resposta['detail'])
+    return resposta
+
+@app.get("/admin/modelos")
+async def admin_modelos(x_admin_token: Optional[str] = Header(None)):
+    """Versão dos modelos em uso, versões do registro e estado da última recarga"""
+    verificar_admin(x_admin_token)
+    if cliente_inferencia is not None:
+        return await asyncio.get_running_loop().run_in_executor(None, _controlar_servidor_inferencia, 'modelos')
+    return info_modelos()
+
+@app.post("/admin/modelos/recarregar", status_code=202)
+async def admin_recarregar_modelos(versao: Optional[str] = None, x_admin_token: Optional[str] = Header(None)):
+    """
+    Recarrega os modelos sem reiniciar o servidor
+    
+    Carrega `versao` do registro (ou a versão ATUAL / os arquivos de
+    modelos_salvos/) em segundo plano, aquece e troca pelos modelos em uso.
+    As predições continuam sendo atendidas pelos modelos atuais até a troca.
+    Acompanhe o andamento em GET /admin/modelos.
+    """
+    verificar_admin(x_admin_token)
+    verificar_prontidao()
+    if cliente_inferencia is not None:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, _controlar_servidor_inferencia, 'recarregar', versao
+        )
+    return iniciar_recarga(versao)
+
+def verificar_prontidao():
+    """Recusa requisições de predição enquanto os modelos não foram carregados"""
+    if not modelos_prontos and erro_carregamento:
+        raise HTTPException(status_code=503, detail=f"Erro ao carregar os modelos: {erro_carregamento}")
+    if not modelos_prontos:
+        raise HTTPException(
+            status_code=503,
+            detail="Modelos ainda carregando. Tente novamente em instantes.",
+            headers={"Retry-After": str(RETRY_AFTER_SEGUNDOS)}
+        )
+
 def preprocessar_imagem(img_bytes: bytes, target_size=(224, 224)):
     """Preprocessa imagem para os modelos"""
     try:
-        # Converter bytes para PIL Image
-        img = Image.open(io.BytesIO(img_bytes))
-        
-        # Converter para RGB se necessário
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Redimensionar
-        img = img.resize(target_size)
-        
-        # Converter para array numpy
-        img_array = np.array(img)
-        
-        # Normalizar
-        img_array = img_array / 255.0
-        
-        # Adicionar dimensão batch
-        img_array = np.expand_dims(img_array, axis=0)
-        
-        return img_array
-        
+        return decodificar_imagem(img_bytes, target_size, PREPROCESSAMENTO_MODO)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erro ao processar imagem: {str(e)}")
 
-def pipeline_hierarquico(img_array: np.ndarray) -> Dict[str, Any]:
+async def preprocessar_imagem_async(img_bytes: bytes, target_size=(224, 224)):
+    """Preprocessa imagem no pool de decodificação, sem bloquear o event loop"""
+    if executor_inferencia is None:
+        return preprocessar_imagem(img_bytes, target_size)
+    try:
+        return await executor_inferencia.decodificar(
+            decodificar_imagem, img_bytes, target_size, PREPROCESSAMENTO_MODO
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Erro ao processar imagem: {str(e)}")
+
+async def carregar_rgb_async(img_bytes: bytes, target_size=(224, 224)) -> np.ndarray:
     """
-    Pipeline completo: Espécie → Saúde → Resultado Final
-    Usa thresholds científicos fixos otimizados para cada espécie
+    Decodifica a imagem para uint8 no pool de decodificação
+    
+    Usado nos endpoints em lote: a normalização é feita depois, diretamente no
+    buffer float32 do lote (ver `normalizar_lote`).
+    """
+    try:
+        return await executor_inferencia.decodificar(
+            carregar_rgb, img_bytes, target_size, PREPROCESSAMENTO_MODO
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Erro ao processar imagem: {str(e)}")
+
+async def executar_pipeline(img_array: np.ndarray) -> Dict[str, Any]:
+    """Executa o pipeline hierárquico fora do event loop (em lote, se ativo)"""
+    if agendador_lotes is not None:
+        return await agendador_lotes.submeter(img_array)
+    if executor_inferencia is not None:
+        return await executor_inferencia.inferir(pipeline_hierarquico, img_array)
+    return pipeline_hierarquico(img_array)
+
+def _erro_arquivo_grande(limite: int) -> HTTPException:
+    return HTTPException(status_code=400, detail=f"Arquivo muito grande. Máximo: {limite // (1024 * 1024)}MB")
+
+def validar_bytes_imagem(img_bytes: bytes, limite: int = TAMANHO_MAXIMO_IMAGEM):
+    """Valida o tamanho e o formato (magic bytes) do conteúdo de uma imagem, sem decodificá-la"""
+    if len(img_bytes) == 0:
+        raise HTTPException(status_code=400, detail="Arquivo de imagem vazio")
+    
+    if len(img_bytes) > limite:
+        raise _erro_arquivo_grande(limite)
+    
+    if detectar_formato_imagem(img_bytes) is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Conteúdo não é uma imagem suportada (JPEG, PNG, GIF, BMP, WEBP ou TIFF)"
+        )
+
+def _verificar_tamanho_upload(arquivo, limite: int = TAMANHO_MAXIMO_IMAGEM):
+    """Recusa uploads acima do limite pelo tamanho do arquivo recebido, antes de lê-lo"""
+    if tamanho_arquivo(arquivo) > limite:
+        raise _erro_arquivo_grande(limite)
+
+def ler_upload(arquivo) -> bytes:
+    """
+    Lê o conteúdo de uma imagem recebida respeitando o limite de tamanho
+    
+    Uploads mantidos em memória pelo parser multipart são devolvidos sem cópia.
+    """
+    _verificar_tamanho_upload(arquivo)
+    conteudo = conteudo_em_memoria(arquivo)
+    if conteudo is None:
+        conteudo = arquivo.read(TAMANHO_MAXIMO_IMAGEM + 1)
+    return conteudo
+
+async def ler_upload_async(file: UploadFile, limite: int = TAMANHO_MAXIMO_IMAGEM) -> bytes:
+    """Como `ler_upload`, lendo uploads gravados em disco fora do event loop"""
+    _verificar_tamanho_upload(file.file, limite)
+    conteudo = conteudo_em_memoria(file.file)
+    if conteudo is None:
+        conteudo = await file.read(limite + 1)
+    return conteudo
+
+def _chave_cache(img_bytes: bytes, versao: str) -> Optional[str]:
+    """
+    Chave do cache de predições para a imagem, ou None se o cache está desativado
+    
+    `versao` é a versão dos modelos lida no início da requisição, usada tanto
+    na consulta quanto na gravação (ver `_guardar_cache`).
+    """
+    if cache_predicoes is None:
+        return None
+    return cache_predicoes.chave(img_bytes, versao, thresholds_cientificos, configuracao_roteamento())
+
+def _guardar_cache(chave: Optional[str], versao: str, resultado: Dict[str, Any]):
     """
+    Guarda um resultado sob a chave calculada no início da requisição
+    
+    Se uma recarga trocou os modelos no meio da requisição, o resultado veio
+    de outra versão e não é guardado sob a chave da versão anterior.
+    """
+    if chave and resultado.get('versao_modelos', versao) == versao:
+        cache_predicoes.guardar(chave, resultado)
+
+def _registrar_predicao(resultado: Dict[str, Any]):
+    """Contabiliza uma predição nas métricas"""
+    PREDICOES.inc(especie=resultado['especie']['nome'], saude=resultado['saude']['status'])
+    roteamento = resultado['debug_info'].get('roteamento')
+    if roteamento is None:
+        if not resultado['pipeline_sucesso']:
+            ESPECIALISTA_INDISPONIVEL.inc(especie=resultado['especie']['nome'])
+        return
+    
+    politica, decisao, passadas = roteamento['politica'], roteamento['decisao'], roteamento['passadas']
+    ROTEAMENTO.inc(politica=politica, decisao=decisao)
+    if passadas:
+        PASSADAS_ESPECIALISTA.inc(passadas, politica=politica)
+    if decisao in ('piso_confianca', 'somente_especies'):
+        PASSADAS_EVITADAS.inc(politica=politica)
+    elif decisao == 'top_k' and passadas > 1:
+        PASSADAS_ADICIONAIS.inc(passadas - 1, politica=politica)
+    if not resultado['pipeline_sucesso'] and decisao in ('especialista', 'top_k'):
+        ESPECIALISTA_INDISPONIVEL.inc(especie=resultado['especie']['nome'])
+
+@contextmanager
+def _medir_etapa(etapa: str, tempos: Dict[str, float]):
+    """Mede uma etapa da requisição para as métricas e para o log (em `tempos`, ms)"""
+    inicio = time.perf_counter()
     try:
-        # PASSO 1: Classificar espécie
-        pred_especies = modelo_especies.predict(img_array, verbose=0)
-        indice_especie = np.argmax(pred_especies)
-        especie_predita = encoder_especies.inverse_transform([indice_especie])[0]
-        confianca_especie = float(np.max(pred_especies))
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        LATENCIA_ETAPAS.observar(duracao, etapa=etapa)
+        tempos[etapa] = round(duracao * 1000, 3)
+
+def _campos_log_predicao(resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """Classe, confianças e decisão do threshold de uma predição, para o log estruturado"""
+    debug_info = resultado.get('debug_info', {})
+    return {
+        'especie': resultado['especie']['nome'],
+        'confianca_especie': resultado['especie']['confianca'],
+        'saude': resultado['saude']['status'],
+        'confianca_saude': resultado['saude']['confianca'],
+        'classificacao': resultado['resultado_final']['classificacao'],
+        'confianca': resultado['resultado_final']['confianca'],
+        'threshold': debug_info.get('threshold_usado'),
+        'versao_thresholds': versao_thresholds,
+        'probabilidade_bruta': debug_info.get('probabilidade_bruta'),
+        'roteamento': debug_info.get('roteamento', {}).get('decisao'),
+        'pipeline_sucesso': resultado['pipeline_sucesso']
+    }
+
+def _erro_servidor_saturado() -> HTTPException:
+    """Resposta rápida de contrapressão quando os pools estão saturados"""
+    return HTTPException(
+        status_code=503,
+        detail="Servidor saturado. Tente novamente em instantes.",
+        headers={"Retry-After": str(RETRY_AFTER_SEGUNDOS)}
+    )
+
+def _classificar_especies_lote(img_batch: np.ndarray, modelos: ConjuntoModelos):
+    """
+    Executa o modelo de espécies em um lote de imagens
+    
+    Returns:
+        tuple: (probabilidades, features do backbone compartilhado ou None)
+    """
+    backbone = modelos.backbone_compartilhado
+    if backbone is not None:
+        features = backbone.extrair(img_batch)
+        return backbone.cabeca_especies.predict(features, verbose=0), features
+    return modelos.modelo_especies.predict(img_batch, verbose=0), None
+
+def _classificar_saude_lote(especie_modelo: str, img_batch: np.ndarray,
+                            features: Optional[np.ndarray], modelos: ConjuntoModelos) -> np.ndarray:
+    """Executa o modelo especialista de uma espécie em um lote de imagens"""
+    if features is not None and especie_modelo in modelos.backbone_compartilhado.cabecas_especialistas:
+        entrada = features
+    else:
+        entrada = img_batch
+    return modelos.modelos_especialistas[especie_modelo].predict(entrada, verbose=0)[:, 0]
+
+def _combinar_especialistas(rota: Dict[str, Any], preds_saude: Dict[str, float]):
+    """
+    Probabilidade e threshold combinados dos especialistas executados para uma imagem
+    
+    Com um único especialista são a probabilidade e o threshold dele. No
+    roteamento top_k, são médias ponderadas pela probabilidade de cada
+    espécie candidata, e a decisão `prob > threshold` equivale a somar as
+    margens ponderadas de cada especialista.
+    
+    Returns:
+        tuple: (probabilidade, threshold, candidatos [{'especialista', 'peso', 'probabilidade', 'threshold'}])
+    """
+    candidatos = [
+        {'especialista': especie_modelo, 'peso': rota['especialistas'][especie_modelo],
+         'probabilidade': float(prob), 'threshold': thresholds_cientificos.get(especie_modelo, 0.5)}
+        for especie_modelo, prob in preds_saude.items()
+    ]
+    if len(candidatos) == 1:
+        return candidatos[0]['probabilidade'], candidatos[0]['threshold'], candidatos
+    
+    total = sum(c['peso'] for c in candidatos)
+    for c in candidatos:
+        c['peso'] = c['peso'] / total
+    pred_saude = sum(c['peso'] * c['probabilidade'] for c in candidatos)
+    threshold = sum(c['peso'] * c['threshold'] for c in candidatos)
+    return pred_saude, threshold, candidatos
+
+def _motivo_sem_saude(decisao: str, confianca_especie: float) -> str:
+    if decisao == 'piso_confianca':
+        return f"Confiança da espécie ({confianca_especie:.3f}) abaixo do piso ({ROTEAMENTO_PISO_CONFIANCA:.3f})"
+    if decisao == 'somente_especies':
+        return "Especialista não executado (POLITICA_ROTEAMENTO=somente_especies)"
+    return 'Modelo especialista não disponível'
+
+def _montar_resultado(especie_predita: str, confianca_especie: float, rota: Dict[str, Any],
+                      preds_saude: Optional[Dict[str, float]], versao: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Monta o dicionário de resposta de uma imagem a partir das predições brutas
+    
+    `rota` é a decisão de roteamento da imagem (ver `_rotear_especies`) e
+    `preds_saude` a probabilidade de 'unhealthy' de cada especialista executado.
+    """
+    roteamento = {'politica': POLITICA_ROTEAMENTO, 'decisao': rota['decisao'], 'passadas': len(preds_saude or {})}
+    if preds_saude:
+        # Aplicar threshold científico fixo
+        pred_saude, threshold_fixo, candidatos = _combinar_especialistas(rota, preds_saude)
         
-        # Mapear nome da espécie para o modelo especialista
-        mapeamento_especies = {
-            'Tomato': 'tomato',
-            'Potato': 'potato', 
-            'Pepper_bell': 'pepper'
-        }
+        # Aplicar threshold científico
+        if pred_saude > threshold_fixo:
+            saude_predita = 'unhealthy'
+            confianca_saude = float(pred_saude)
+        else:
+            saude_predita = 'healthy'
+            confianca_saude = float(1 - pred_saude)
+            
+        # Resultado final combinado
+        resultado_final = f"{especie_predita}_{saude_predita}"
+        confianca_final = confianca_especie * confianca_saude
+        pipeline_sucesso = True
         
-        especie_modelo = mapeamento_especies.get(especie_predita)
+        # Informações adicionais para debug (as descrições em texto são
+        # montadas apenas no modo de resposta completo, ver `_detalhar_resultado`)
+        info_threshold = {
+            'threshold_usado': threshold_fixo,
+            'probabilidade_bruta': float(pred_saude),
+            'roteamento': roteamento
+        }
+        if len(candidatos) > 1:
+            info_threshold['candidatos'] = candidatos
         
-        # PASSO 2: Classificar saúde com threshold científico
-        if especie_modelo and especie_modelo in modelos_especialistas:
-            modelo_especialista = modelos_especialistas[especie_modelo]
-            pred_saude = modelo_especialista.predict(img_array, verbose=0)[0][0]
-            
-            # Aplicar threshold científico fixo
-            threshold_fixo = thresholds_cientificos.get(especie_modelo, 0.5)
-            
-            # Aplicar threshold científico
-            if pred_saude > threshold_fixo:
-                saude_predita = 'unhealthy'
-                confianca_saude = float(pred_saude)
-            else:
-                saude_predita = 'healthy'
-                confianca_saude = float(1 - pred_saude)
-                
-            # Resultado final combinado
-            resultado_final = f"{especie_predita}_{saude_predita}"
-            confianca_final = confianca_especie * confianca_saude
-            pipeline_sucesso = True
-            
-            # Informações adicionais para debug
-            info_threshold = {
-                'threshold_usado': threshold_fixo,
-                'probabilidade_bruta': float(pred_saude),
-                'logica_aplicada': f"Threshold científico fixo para {especie_modelo}",
-                'decisao': f"pred_saude ({pred_saude:.3f}) > threshold ({threshold_fixo:.3f}) = {pred_saude > threshold_fixo}",
-                'sistema': 'threshold_cientifico_fixo'
-            }
-            
+    else:
+        # Especialista não disponível ou não executado pela política de roteamento
+        saude_predita = 'unknown'
+        confianca_saude = 0.0
+        resultado_final = f"{especie_predita}_unknown"
+        confianca_final = confianca_especie
+        pipeline_sucesso = False
+        info_threshold = {'erro': _motivo_sem_saude(rota['decisao'], confianca_especie), 'roteamento': roteamento}
+    
+    return {
+        'especie': {
+            'nome': especie_predita,
+            'confianca': confianca_especie
+        },
+        'saude': {
+            'status': saude_predita,
+            'confianca': confianca_saude
+        },
+        'resultado_final': {
+            'classificacao': resultado_final,
+            'confianca': confianca_final
+        },
+        'pipeline_sucesso': pipeline_sucesso,
+        'versao_modelos': versao if versao is not None else versao_modelos,
+        'debug_info': info_threshold
+    }
+
+def _detalhar_resultado(resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """Resposta no modo completo: acrescenta as descrições da decisão ao `debug_info`"""
+    debug_info = resultado['debug_info']
+    if 'threshold_usado' not in debug_info:
+        return resultado
+    
+    especie_modelo = MAPEAMENTO_ESPECIES.get(resultado['especie']['nome'])
+    pred_saude = debug_info['probabilidade_bruta']
+    threshold_fixo = debug_info['threshold_usado']
+    if 'candidatos' in debug_info:
+        especialistas = ', '.join(c['especialista'] for c in debug_info['candidatos'])
+        logica = f"Média ponderada pela espécie dos thresholds científicos de {especialistas} (espécie ambígua)"
+    else:
+        logica = f"Threshold científico fixo para {especie_modelo}"
+    return {
+        **resultado,
+        'debug_info': {
+            **debug_info,
+            'logica_aplicada': logica,
+            'decisao': f"pred_saude ({pred_saude:.3f}) > threshold ({threshold_fixo:.3f}) = {pred_saude > threshold_fixo}",
+            'sistema': 'threshold_cientifico_fixo'
+        }
+    }
+
+def _resultado_compacto(resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """Resposta no modo compacto: apenas classe, saúde e confianças"""
+    return {
+        'classificacao': resultado['resultado_final']['classificacao'],
+        'confianca': resultado['resultado_final']['confianca'],
+        'especie': resultado['especie']['nome'],
+        'confianca_especie': resultado['especie']['confianca'],
+        'saude': resultado['saude']['status'],
+        'confianca_saude': resultado['saude']['confianca'],
+        'versao_modelos': resultado.get('versao_modelos')
+    }
+
+def formatar_resultado(resultado: Dict[str, Any], modo: str) -> Dict[str, Any]:
+    """Converte o resultado interno do pipeline para o modo de resposta pedido"""
+    if modo == 'compacto':
+        return _resultado_compacto(resultado)
+    return _detalhar_resultado(resultado)
+
+def configuracao_roteamento() -> Dict[str, Any]:
+    """Política de roteamento em uso e seus parâmetros (entra na chave do cache)"""
+    configuracao: Dict[str, Any] = {'politica': POLITICA_ROTEAMENTO}
+    if POLITICA_ROTEAMENTO == 'piso_confianca':
+        configuracao['piso_confianca'] = ROTEAMENTO_PISO_CONFIANCA
+    elif POLITICA_ROTEAMENTO == 'top_k':
+        configuracao.update(top_k=ROTEAMENTO_TOP_K, margem=ROTEAMENTO_MARGEM)
+    return configuracao
+
+def _rotear_especies(pred_especies: np.ndarray, classes: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    Decide, para cada imagem, quais especialistas executar (POLITICA_ROTEAMENTO)
+    
+    Returns:
+        list: Por imagem, {'decisao', 'especialistas': {especialista: peso}};
+        a decisão é 'especialista', 'top_k', 'piso_confianca',
+        'somente_especies' ou 'sem_especialista' (espécie sem especialista)
+    """
+    ordem = np.argsort(-pred_especies, axis=1)[:, :max(ROTEAMENTO_TOP_K, 1)]
+    rotas = []
+    for probs, indices in zip(pred_especies, ordem):
+        especie_modelo = MAPEAMENTO_ESPECIES.get(classes[indices[0]])
+        confianca = float(probs[indices[0]])
+        if especie_modelo is None:
+            rotas.append({'decisao': 'sem_especialista', 'especialistas': {}})
+        elif POLITICA_ROTEAMENTO == 'somente_especies':
+            rotas.append({'decisao': 'somente_especies', 'especialistas': {}})
+        elif POLITICA_ROTEAMENTO == 'piso_confianca' and confianca < ROTEAMENTO_PISO_CONFIANCA:
+            rotas.append({'decisao': 'piso_confianca', 'especialistas': {}})
+        elif (POLITICA_ROTEAMENTO == 'top_k' and len(indices) > 1
+              and confianca - float(probs[indices[1]]) < ROTEAMENTO_MARGEM):
+            especialistas: Dict[str, float] = {}
+            for indice in indices:
+                candidato = MAPEAMENTO_ESPECIES.get(classes[indice])
+                if candidato is not None:
+                    especialistas[candidato] = especialistas.get(candidato, 0.0) + float(probs[indice])
+            decisao = 'top_k' if len(especialistas) > 1 else 'especialista'
+            rotas.append({'decisao': decisao, 'especialistas': especialistas})
         else:
-            # Modelo especialista não disponível
-            saude_predita = 'unknown'
-            confianca_saude = 0.0
-            resultado_final = f"{especie_predita}_unknown"
-            confianca_final = confianca_especie
-            pipeline_sucesso = False
-            info_threshold = {'erro': 'Modelo especialista não disponível'}
+            rotas.append({'decisao': 'especialista', 'especialistas': {especie_modelo: 1.0}})
+    return rotas
+
+def etapa_especies_lote(img_batch: np.ndarray, modelos: Optional[ConjuntoModelos] = None):
+    """
+    PASSO 1 do pipeline: classifica a espécie de todo o lote em uma passada
+    e decide os especialistas de cada imagem
+    
+    `modelos` é o conjunto usado (por padrão, o ativo); o PASSO 2 deve
+    receber o mesmo conjunto.
+    
+    Returns:
+        tuple: (espécies preditas, confianças, features do backbone compartilhado ou None, rotas)
+    """
+    if cliente_inferencia is not None:
+        with LATENCIA_ETAPAS.medir(etapa='servidor_inferencia'):
+            return cliente_inferencia.chamar('especies', img_batch)
+    
+    modelos = modelos or modelos_ativos
+    with LATENCIA_ETAPAS.medir(etapa='especies'):
+        pred_especies, features = _classificar_especies_lote(img_batch, modelos)
+    indices_especie = np.argmax(pred_especies, axis=1)
+    especies_preditas = modelos.encoder_especies.inverse_transform(indices_especie)
+    confiancas_especie = np.max(pred_especies, axis=1)
+    rotas = _rotear_especies(pred_especies, modelos.encoder_especies.classes_)
+    return list(especies_preditas), confiancas_especie, features, rotas
+
+def etapa_saude_lote(img_batch: np.ndarray, rotas: List[Dict[str, Any]],
+                     features: Optional[np.ndarray] = None,
+                     modelos: Optional[ConjuntoModelos] = None) -> Dict[int, Dict[str, float]]:
+    """
+    PASSO 2 do pipeline: agrupa o lote por especialista e classifica a saúde
+    
+    Cada especialista executa uma única passada com todas as imagens roteadas
+    para ele (no roteamento top_k, uma imagem pode ir para mais de um).
+    
+    Returns:
+        dict: Por índice do lote, a probabilidade bruta de 'unhealthy' de cada
+        especialista executado (apenas imagens com especialista carregado)
+    """
+    if cliente_inferencia is not None:
+        with LATENCIA_ETAPAS.medir(etapa='servidor_inferencia'):
+            return cliente_inferencia.chamar('saude', img_batch, rotas, features)
+    
+    modelos = modelos or modelos_ativos
+    grupos: Dict[str, List[int]] = {}
+    for i, rota in enumerate(rotas):
+        for especie_modelo in rota['especialistas']:
+            if especialista_disponivel(especie_modelo, modelos):
+                grupos.setdefault(especie_modelo, []).append(i)
+    
+    preds_saude: Dict[int, Dict[str, float]] = {}
+    for especie_modelo, indices in grupos.items():
+        with LATENCIA_ETAPAS.medir(etapa=f'especialista_{especie_modelo}'):
+            probs = _classificar_saude_lote(
+                especie_modelo,
+                img_batch[indices],
+                features[indices] if features is not None else None,
+                modelos
+            )
+        for i, prob in zip(indices, probs):
+            preds_saude.setdefault(i, {})[especie_modelo] = prob
+    return preds_saude
+
+def pipeline_hierarquico_lote(img_batch: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    Pipeline hierárquico em lote: Espécie → Saúde → Resultado Final
+    
+    Executa uma única passada do modelo de espécies para todo o lote, agrupa
+    as imagens pelos especialistas escolhidos pela política de roteamento e
+    executa uma passada por especialista.
+    Retorna um resultado por imagem, na mesma ordem do lote. O lote inteiro
+    usa o conjunto de modelos ativo no seu início, mesmo durante uma recarga.
+    """
+    global versao_modelos
+    
+    try:
+        if cliente_inferencia is not None:
+            with LATENCIA_ETAPAS.medir(etapa='servidor_inferencia'):
+                resultados = cliente_inferencia.chamar('pipeline', img_batch)
+            # Acompanha recargas feitas no servidor (a versão entra na chave do cache)
+            if resultados and resultados[0].get('versao_modelos'):
+                versao_modelos = resultados[0]['versao_modelos']
+            return resultados
         
-        return {
-            'especie': {
-                'nome': especie_predita,
-                'confianca': confianca_especie
-            },
-            'saude': {
-                'status': saude_predita,
-                'confianca': confianca_saude
-            },
-            'resultado_final': {
-                'classificacao': resultado_final,
-                'confianca': confianca_final
-            },
-            'pipeline_sucesso': pipeline_sucesso,
-            'debug_info': info_threshold
-        }
+        modelos = modelos_ativos
+        especies_preditas, confiancas_especie, features, rotas = etapa_especies_lote(img_batch, modelos)
+        preds_saude = etapa_saude_lote(img_batch, rotas, features, modelos)
+        
+        # PASSO 3: Montar resultado de cada imagem
+        return [
+            _montar_resultado(
+                especie_predita,
+                float(confiancas_especie[i]),
+                rotas[i],
+                preds_saude.get(i),
+                modelos.versao
+            )
+            for i, especie_predita in enumerate(especies_preditas)
+        ]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro no pipeline: {str(e)}")
 
+def pipeline_hierarquico(img_array: np.ndarray) -> Dict[str, Any]:
+    """
+    Pipeline completo: Espécie → Saúde → Resultado Final
+    Usa thresholds científicos fixos otimizados para cada espécie
+    """
+    return pipeline_hierarquico_lote(img_array)[0]
+
 # Endpoint principal de predição
 @app.post("/predict")
-async def predict_plant_disease(file: UploadFile = File(...)):
+async def predict_plant_disease(file: UploadFile = File(...), modo: Optional[str] = None,
+                                accept: Optional[str] = Header(None)):
     """
     Endpoint principal para classificação de doenças em plantas
     
@@ -239,46 +1385,550 @@ async def predict_plant_disease(file: UploadFile = File(...)):
     - ✅ Comportamento previsível e estável
     - ✅ Baseado em análise científica de dados
     - ✅ Otimizado para cada espécie individualmente
+    
+    **Formato da resposta**: `?modo=compacto` (ou `Accept: application/vnd.plant.compacto+json`)
+    retorna apenas classe, saúde e confianças; `Accept: application/msgpack`
+    retorna o corpo em MessagePack.
     """
     
-    # Validar tipo de arquivo
-    if not file.content_type or not file.content_type.startswith('image/'):
-        # Se não há content_type, verificar pela extensão do arquivo
-        if not file.filename or not file.filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif')):
+    verificar_prontidao()
+    modo, binario = negociar_formato(modo, accept, RESPOSTA_MODO_PADRAO)
+    inicio = time.perf_counter()
+    tempos: Dict[str, float] = {}
+    # Versão dos modelos no início da requisição (chave do cache na consulta e na gravação)
+    versao = versao_modelos
+    
+    # Validar tipo de arquivo (content_type ou extensão)
+    if not eh_imagem(file.content_type, file.filename):
+        raise HTTPException(
+            status_code=400, 
+            detail="Arquivo deve ser uma imagem (JPEG, PNG, etc.)"
+        )
+    
+    try:
+        async with executor_inferencia.admitir():
+            # Ler bytes da imagem
+            with _medir_etapa('leitura_upload', tempos):
+                img_bytes = await ler_upload_async(file)
+            TAMANHO_UPLOADS.observar(len(img_bytes))
+            
+            # Validar tamanho da imagem
+            validar_bytes_imagem(img_bytes)
+            
+            # Reenvios da mesma imagem são respondidos pelo cache
+            chave_cache = _chave_cache(img_bytes, versao)
+            resultado = cache_predicoes.obter(chave_cache) if chave_cache else None
+            
+            if resultado is None:
+                # Preprocessar imagem (fora do event loop)
+                with _medir_etapa('preprocessamento', tempos):
+                    img_array = await preprocessar_imagem_async(img_bytes)
+                
+                # Executar pipeline hierárquico (fora do event loop)
+                with _medir_etapa('inferencia', tempos):
+                    resultado = await executar_pipeline(img_array)
+                
+                _guardar_cache(chave_cache, versao, resultado)
+        
+        _registrar_predicao(resultado)
+        
+        with _medir_etapa('serializacao', tempos):
+            resposta = serializar_resposta(formatar_resultado(resultado, modo), binario)
+        total = time.perf_counter() - inicio
+        LATENCIA_REQUISICOES.observar(total, endpoint='/predict')
+        
+        # Log do resultado para monitoramento (amostrado)
+        if amostrar(LOG_AMOSTRAGEM) and logger.isEnabledFor(logging.INFO):
+            logger.info("predicao", extra={'campos': {
+                'endpoint': '/predict',
+                'arquivo': file.filename,
+                'bytes': len(img_bytes),
+                'cache': 'inferencia' not in tempos,
+                **_campos_log_predicao(resultado),
+                'tempos_ms': tempos,
+                'total_ms': round(total * 1000, 3)
+            }})
+        return resposta
+        
+    except PoolSaturado:
+        raise _erro_servidor_saturado()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("erro não tratado", extra={'campos': {'endpoint': '/predict'}})
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
+def _inferir_tiles(tiles: np.ndarray) -> List[Dict[str, Any]]:
+    """Normaliza os tiles uint8 e os executa em um único lote do pipeline hierárquico"""
+    return pipeline_hierarquico_lote(normalizar(tiles, modo=PREPROCESSAMENTO_MODO))
+
+def formatar_mosaico(agregado: Dict[str, Any], mosaico: Dict[str, Any], versao: str, modo: str) -> Dict[str, Any]:
+    """Resposta do /predict_tiles no modo pedido"""
+    if modo == 'compacto':
+        return {
+            'classificacao': agregado['resultado_final']['classificacao'],
+            'confianca': agregado['resultado_final']['confianca'],
+            'especie': agregado['especie']['nome'],
+            'confianca_especie': agregado['especie']['confianca'],
+            'saude': agregado['saude']['status'],
+            'confianca_saude': agregado['saude']['confianca'],
+            'tiles_doentes': agregado['saude']['tiles_doentes'],
+            'tiles_avaliados': agregado['saude']['tiles_avaliados'],
+            'mapa_doenca': agregado['mapa_doenca'],
+            'versao_modelos': versao
+        }
+    linhas, colunas = mosaico['grade']
+    return {
+        **agregado,
+        'versao_modelos': versao,
+        'mosaico': {
+            'tamanho_original': list(mosaico['tamanho_original']),
+            'tamanho_processado': list(mosaico['tamanho_processado']),
+            'grade': [linhas, colunas],
+            'tamanho_tile': TAMANHO_TILE,
+            'sobreposicao': TILES_SOBREPOSICAO,
+            'tiles_processados': len(mosaico['posicoes']),
+            'tiles_fundo': linhas * colunas - len(mosaico['posicoes'])
+        }
+    }
+
+@app.post("/predict_tiles")
+async def predict_tiles(file: UploadFile = File(...), modo: Optional[str] = None,
+                        accept: Optional[str] = Header(None)):
+    """
+    Classificação de fotos de campo em alta resolução (drone, várias folhas)
+    
+    A imagem é dividida em tiles de 224px sobrepostos (no máximo
+    `TILES_MAXIMO`; imagens maiores são reduzidas para caber), os tiles de
+    fundo são descartados por uma máscara de pixels verdes e os demais passam
+    juntos, em um único lote, pela espécie e pelos especialistas.
+    
+    Retorna o veredito da imagem (espécie de maior confiança somada; doente
+    se ao menos `TILES_FRACAO_DOENTE` dos tiles avaliados estiverem doentes)
+    e `mapa_doenca`, uma grade com a intensidade de doença de cada tile
+    (0.5 corresponde ao threshold científico da espécie; `null` para fundo).
+    """
+    verificar_prontidao()
+    modo, binario = negociar_formato(modo, accept, RESPOSTA_MODO_PADRAO)
+    inicio = time.perf_counter()
+    tempos: Dict[str, float] = {}
+    
+    if not eh_imagem(file.content_type, file.filename):
+        raise HTTPException(status_code=400, detail="Arquivo deve ser uma imagem (JPEG, PNG, etc.)")
+    
+    try:
+        async with executor_inferencia.admitir():
+            with _medir_etapa('leitura_upload', tempos):
+                img_bytes = await ler_upload_async(file, TILES_TAMANHO_MAXIMO_IMAGEM)
+            TAMANHO_UPLOADS.observar(len(img_bytes))
+            validar_bytes_imagem(img_bytes, TILES_TAMANHO_MAXIMO_IMAGEM)
+            
+            with _medir_etapa('preprocessamento', tempos):
+                try:
+                    mosaico = await executor_inferencia.decodificar(
+                        extrair_tiles, img_bytes, TAMANHO_TILE, TILES_SOBREPOSICAO, TILES_MAXIMO,
+                        TILES_LADO_MAXIMO, TILES_FRACAO_VERDE_MINIMA, PREPROCESSAMENTO_MODO
+                    )
+                except Exception as e:
+                    raise HTTPException(status_code=400, detail=f"Erro ao processar imagem: {str(e)}")
+            
+            resultados = []
+            if len(mosaico['tiles']):
+                with _medir_etapa('inferencia', tempos):
+                    resultados = await executor_inferencia.inferir(_inferir_tiles, mosaico['tiles'])
+        
+        agregado = agregar_tiles(resultados, mosaico['posicoes'], mosaico['grade'], TILES_FRACAO_DOENTE)
+        versao = resultados[0].get('versao_modelos') if resultados else versao_modelos
+        linhas, colunas = mosaico['grade']
+        TILES.inc(len(mosaico['posicoes']), destino='processado')
+        TILES.inc(linhas * colunas - len(mosaico['posicoes']), destino='fundo')
+        PREDICOES.inc(especie=str(agregado['especie']['nome']), saude=agregado['saude']['status'])
+        
+        with _medir_etapa('serializacao', tempos):
+            resposta = serializar_resposta(formatar_mosaico(agregado, mosaico, versao, modo), binario)
+        total = time.perf_counter() - inicio
+        LATENCIA_REQUISICOES.observar(total, endpoint='/predict_tiles')
+        
+        if amostrar(LOG_AMOSTRAGEM) and logger.isEnabledFor(logging.INFO):
+            logger.info("predicao", extra={'campos': {
+                'endpoint': '/predict_tiles',
+                'arquivo': file.filename,
+                'bytes': len(img_bytes),
+                'grade': [linhas, colunas],
+                'tiles_processados': len(mosaico['posicoes']),
+                'especie': agregado['especie']['nome'],
+                'saude': agregado['saude']['status'],
+                'tiles_doentes': agregado['saude']['tiles_doentes'],
+                'confianca': agregado['resultado_final']['confianca'],
+                'versao_modelos': versao,
+                'tempos_ms': tempos,
+                'total_ms': round(total * 1000, 3)
+            }})
+        return resposta
+        
+    except PoolSaturado:
+        raise _erro_servidor_saturado()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("erro não tratado", extra={'campos': {'endpoint': '/predict_tiles'}})
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
+async def _ler_itens_lote(files: List[UploadFile]) -> List[Dict[str, Any]]:
+    """Lê os uploads de um lote, expandindo arquivos zip/tar em imagens individuais"""
+    itens = []
+    
+    for file in files:
+        if eh_compactado(file.content_type, file.filename):
+            try:
+                imagens = list(iterar_imagens_compactadas(
+                    file.file, MAX_IMAGENS_POR_LOTE - len(itens), TAMANHO_MAXIMO_IMAGEM
+                ))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"{file.filename}: {str(e)}")
+            for nome, dados in imagens:
+                if dados is None:
+                    itens.append({'arquivo': nome, 'bytes': b'', 'erro': "Arquivo muito grande. Máximo: 10MB"})
+                else:
+                    itens.append({'arquivo': nome, 'bytes': dados, 'erro': None})
+        elif eh_imagem(file.content_type, file.filename):
+            try:
+                itens.append({'arquivo': file.filename, 'bytes': await ler_upload_async(file), 'erro': None})
+            except HTTPException as e:
+                itens.append({'arquivo': file.filename, 'bytes': b'', 'erro': e.detail})
+        else:
+            itens.append({'arquivo': file.filename, 'bytes': b'',
+                          'erro': "Arquivo deve ser uma imagem (JPEG, PNG, etc.) ou zip/tar"})
+        
+        if len(itens) > MAX_IMAGENS_POR_LOTE:
             raise HTTPException(
-                status_code=400, 
-                detail="Arquivo deve ser uma imagem (JPEG, PNG, etc.)"
+                status_code=400,
+                detail=f"Máximo de {MAX_IMAGENS_POR_LOTE} imagens por requisição"
             )
     
+    return itens
+
+async def _decodificar_item(item: Dict[str, Any], versao: str):
+    """Valida e preprocessa um item do lote (ou o responde pelo cache), registrando o erro no próprio item"""
+    if item['erro'] is not None:
+        return None
     try:
-        # Ler bytes da imagem
-        img_bytes = await file.read()
+        TAMANHO_UPLOADS.observar(len(item['bytes']))
+        validar_bytes_imagem(item['bytes'])
         
-        # Validar tamanho da imagem
-        if len(img_bytes) == 0:
-            raise HTTPException(status_code=400, detail="Arquivo de imagem vazio")
+        item['chave_cache'] = _chave_cache(item['bytes'], versao)
+        if item['chave_cache']:
+            item['resultado'] = cache_predicoes.obter(item['chave_cache'])
+            if item['resultado'] is not None:
+                return None
         
-        if len(img_bytes) > 10 * 1024 * 1024:  # 10MB
-            raise HTTPException(status_code=400, detail="Arquivo muito grande. Máximo: 10MB")
+        return await carregar_rgb_async(item['bytes'])
+    except HTTPException as e:
+        item['erro'] = e.detail
+        return None
+
+# Endpoint de predição em lote
+@app.post("/predict_batch")
+async def predict_batch(files: List[UploadFile] = File(...), modo: Optional[str] = None,
+                        accept: Optional[str] = Header(None)):
+    """
+    Classifica várias imagens em uma única requisição
+    
+    Aceita múltiplos arquivos de imagem e/ou arquivos zip/tar contendo imagens.
+    As imagens são decodificadas em paralelo e executadas pelo pipeline
+    hierárquico em lotes reais. Cada item do resultado segue o mesmo formato
+    do `/predict`, acrescido de `arquivo` e `sucesso`; erros de um item não
+    interrompem os demais. Aceita os mesmos modos de resposta do `/predict`
+    (`?modo=compacto`, `Accept: application/msgpack`).
+    """
+    verificar_prontidao()
+    modo, binario = negociar_formato(modo, accept, RESPOSTA_MODO_PADRAO)
+    inicio = time.perf_counter()
+    tempos: Dict[str, float] = {}
+    # Versão dos modelos no início da requisição (chave do cache na consulta e na gravação)
+    versao = versao_modelos
+    
+    try:
+        async with executor_inferencia.admitir():
+            with _medir_etapa('leitura_upload', tempos):
+                itens = await _ler_itens_lote(files)
+            
+            # Decodificar todas as imagens em paralelo
+            with _medir_etapa('preprocessamento', tempos):
+                arrays = await asyncio.gather(*[_decodificar_item(item, versao) for item in itens])
+            validos = [i for i, arr in enumerate(arrays) if arr is not None]
+            
+            # Executar o pipeline em lotes
+            resultados: Dict[int, Dict[str, Any]] = {}
+            inicio_inferencia = time.perf_counter()
+            for indices in dividir_em_lotes(validos, TAMANHO_LOTE_INFERENCIA):
+                img_batch = normalizar_lote([arrays[i] for i in indices], PREPROCESSAMENTO_MODO)
+                try:
+                    saidas = await executor_inferencia.inferir(pipeline_hierarquico_lote, img_batch)
+                except HTTPException as e:
+                    for i in indices:
+                        itens[i]['erro'] = e.detail
+                    continue
+                resultados.update(zip(indices, saidas))
+                for i, saida in zip(indices, saidas):
+                    _guardar_cache(itens[i].get('chave_cache'), versao, saida)
+            
+            tempos['inferencia'] = round((time.perf_counter() - inicio_inferencia) * 1000, 3)
+            
+            # Itens respondidos pelo cache
+            for i, item in enumerate(itens):
+                if item.get('resultado') is not None:
+                    resultados[i] = item['resultado']
         
-        # Preprocessar imagem
-        img_array = preprocessar_imagem(img_bytes)
+        resposta = []
+        for i, item in enumerate(itens):
+            if i in resultados:
+                _registrar_predicao(resultados[i])
+                resposta.append({'arquivo': item['arquivo'], 'sucesso': True,
+                                 **formatar_resultado(resultados[i], modo)})
+            else:
+                resposta.append({'arquivo': item['arquivo'], 'sucesso': False, 'erro': item['erro']})
         
-        # Executar pipeline hierárquico
-        resultado = pipeline_hierarquico(img_array)
+        total_sucesso = sum(1 for r in resposta if r['sucesso'])
         
-        # Log do resultado para monitoramento
-        print(f"🔍 Predição: {resultado['especie']['nome']} - {resultado['saude']['status']} "
-              f"(Confiança: {resultado['resultado_final']['confianca']:.3f})")
+        with _medir_etapa('serializacao', tempos):
+            resposta_json = serializar_resposta({
+                'total': len(resposta),
+                'sucesso': total_sucesso,
+                'falhas': len(resposta) - total_sucesso,
+                'resultados': resposta
+            }, binario)
+        total = time.perf_counter() - inicio
+        LATENCIA_REQUISICOES.observar(total, endpoint='/predict_batch')
         
-        return JSONResponse(content=resultado)
+        if amostrar(LOG_AMOSTRAGEM) and logger.isEnabledFor(logging.INFO):
+            logger.info("lote", extra={'campos': {
+                'endpoint': '/predict_batch',
+                'imagens': len(resposta),
+                'sucesso': total_sucesso,
+                'classificacoes': dict(Counter(
+                    r['resultado_final']['classificacao'] for r in resultados.values()
+                )),
+                'tempos_ms': tempos,
+                'total_ms': round(total * 1000, 3)
+            }})
+        return resposta_json
         
+    except PoolSaturado:
+        raise _erro_servidor_saturado()
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Erro não tratado: {str(e)}")
+        logger.exception("erro não tratado", extra={'campos': {'endpoint': '/predict_batch'}})
         raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
 
+def _fonte_itens_stream(files: List[UploadFile]):
+    """Lê os uploads sob demanda, um item por imagem (zip/tar expandidos)"""
+    total = 0
+    for file in files:
+        file.file.seek(0)
+        
+        if eh_compactado(file.content_type, file.filename):
+            try:
+                for nome, dados in iterar_imagens_compactadas(
+                        file.file, MAX_IMAGENS_STREAM - total, TAMANHO_MAXIMO_IMAGEM):
+                    total += 1
+                    if dados is None:
+                        yield {'arquivo': nome, 'bytes': b'', 'erro': "Arquivo muito grande. Máximo: 10MB"}
+                    else:
+                        yield {'arquivo': nome, 'bytes': dados, 'erro': None}
+            except ValueError as e:
+                yield {'arquivo': file.filename, 'bytes': b'', 'erro': str(e)}
+            continue
+        
+        total += 1
+        if total > MAX_IMAGENS_STREAM:
+            yield {'arquivo': file.filename, 'bytes': b'',
+                   'erro': f"Máximo de {MAX_IMAGENS_STREAM} imagens por requisição"}
+        elif eh_imagem(file.content_type, file.filename):
+            try:
+                yield {'arquivo': file.filename, 'bytes': ler_upload(file.file), 'erro': None}
+            except HTTPException as e:
+                yield {'arquivo': file.filename, 'bytes': b'', 'erro': e.detail}
+        else:
+            yield {'arquivo': file.filename, 'bytes': b'',
+                   'erro': "Arquivo deve ser uma imagem (JPEG, PNG, etc.) ou zip/tar"}
+
+def _estagio_decodificar(itens: List[Dict[str, Any]], versao: str = '') -> List[Dict[str, Any]]:
+    """
+    Estágio de decodificação: valida e preprocessa as imagens no pool de decodificação
+    
+    Imagens já presentes no cache recebem o resultado aqui e passam direto
+    pelos estágios de inferência.
+    """
+    futuros = {}
+    inicio = time.perf_counter()
+    for i, item in enumerate(itens):
+        if item['erro'] is None:
+            try:
+                TAMANHO_UPLOADS.observar(len(item['bytes']))
+                validar_bytes_imagem(item['bytes'])
+                item['chave_cache'] = _chave_cache(item['bytes'], versao)
+                if item['chave_cache']:
+                    resultado = cache_predicoes.obter(item['chave_cache'])
+                    if resultado is not None:
+                        item['resultado'] = resultado
+                        continue
+                futuros[i] = executor_inferencia.decodificacao.submit(
+                    carregar_rgb, item['bytes'], (224, 224), PREPROCESSAMENTO_MODO
+                )
+            except HTTPException as e:
+                item['erro'] = e.detail
+    
+    for i, futuro in futuros.items():
+        try:
+            itens[i]['imagem'] = futuro.result()
+        except Exception as e:
+            itens[i]['erro'] = f"Erro ao processar imagem: {str(e)}"
+    LATENCIA_ETAPAS.observar(time.perf_counter() - inicio, etapa='preprocessamento')
+    
+    for item in itens:
+        item.pop('bytes', None)
+    return itens
+
+def _estagio_especies(itens: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Estágio de espécies: uma passada do modelo de espécies para as imagens disponíveis"""
+    validos = [item for item in itens if item['erro'] is None and 'resultado' not in item]
+    if validos:
+        img_batch = normalizar_lote([item.pop('imagem') for item in validos], PREPROCESSAMENTO_MODO)
+        # O estágio de especialistas usa o mesmo conjunto de modelos, mesmo se houver recarga entre eles
+        modelos = modelos_ativos if cliente_inferencia is None else None
+        try:
+            especies, confiancas, features, rotas = executor_inferencia.inferencia.submit(
+                etapa_especies_lote, img_batch, modelos
+            ).result()
+        except Exception as e:
+            for item in validos:
+                item['erro'] = f"Erro no pipeline: {str(e)}"
+            return itens
+        
+        for i, item in enumerate(validos):
+            item['array'] = img_batch[i:i + 1]
+            item['especie'] = especies[i]
+            item['confianca_especie'] = float(confiancas[i])
+            item['features'] = features[i:i + 1] if features is not None else None
+            item['rota'] = rotas[i]
+            item['modelos'] = modelos
+    return itens
+
+def _estagio_saude(itens: List[Dict[str, Any]], versao: str = '') -> List[Dict[str, Any]]:
+    """Estágio de especialistas: uma passada por especialista, montagem do resultado e gravação no cache"""
+    validos = [item for item in itens if item['erro'] is None and 'resultado' not in item]
+    if validos:
+        img_batch = np.concatenate([item['array'] for item in validos], axis=0)
+        rotas = [item['rota'] for item in validos]
+        features = None
+        if validos[0]['features'] is not None:
+            features = np.concatenate([item['features'] for item in validos], axis=0)
+        modelos = validos[0]['modelos']
+        try:
+            preds_saude = executor_inferencia.inferencia.submit(
+                etapa_saude_lote, img_batch, rotas, features, modelos
+            ).result()
+        except Exception as e:
+            for item in validos:
+                item['erro'] = f"Erro no pipeline: {str(e)}"
+            return itens
+        
+        for i, item in enumerate(validos):
+            item['resultado'] = _montar_resultado(
+                item['especie'], item['confianca_especie'], item['rota'], preds_saude.get(i),
+                modelos.versao if modelos is not None else None
+            )
+            _guardar_cache(item.get('chave_cache'), versao, item['resultado'])
+    
+    for item in itens:
+        item.pop('array', None)
+        item.pop('features', None)
+        item.pop('rota', None)
+        item.pop('modelos', None)
+    return itens
+
+def _estagio_serializar(itens: List[Dict[str, Any]], modo: str = 'completo') -> List[bytes]:
+    """Estágio final: uma linha NDJSON por imagem"""
+    linhas = []
+    with LATENCIA_ETAPAS.medir(etapa='serializacao'):
+        for item in itens:
+            if item['erro'] is None:
+                _registrar_predicao(item['resultado'])
+                saida = {'arquivo': item['arquivo'], 'sucesso': True,
+                         **formatar_resultado(item['resultado'], modo)}
+            else:
+                saida = {'arquivo': item['arquivo'], 'sucesso': False, 'erro': item['erro']}
+            linhas.append(json_bytes(saida) + b"\n")
+    return linhas
+
+# Endpoint de predição em lote com resposta em streaming
+@app.post("/predict_stream")
+async def predict_stream(request: Request):
+    """
+    Classifica várias imagens devolvendo uma linha NDJSON por imagem
+    
+    Recebe os mesmos campos `files` do `/predict_batch`. Cada linha é enviada
+    assim que o resultado da imagem fica pronto, no mesmo formato dos itens do
+    `/predict_batch`. As etapas decodificação → espécie → especialista →
+    serialização rodam em paralelo, ligadas por filas limitadas, de modo que a
+    memória não cresce com o número de imagens. `?modo=compacto` reduz cada
+    linha a classe, saúde e confianças.
+    """
+    verificar_prontidao()
+    modo, _ = negociar_formato(request.query_params.get('modo'), None, RESPOSTA_MODO_PADRAO)
+    
+    try:
+        executor_inferencia.reservar()
+    except PoolSaturado:
+        raise _erro_servidor_saturado()
+    
+    # O formulário é lido manualmente para que os arquivos temporários
+    # continuem abertos enquanto a resposta é transmitida
+    try:
+        formulario = await request.form(max_files=MAX_IMAGENS_STREAM)
+        files = [f for f in formulario.getlist('files') if not isinstance(f, str)]
+    except Exception as e:
+        executor_inferencia.liberar()
+        raise HTTPException(status_code=400, detail=f"Formulário inválido: {str(e)}")
+    
+    if not files:
+        await formulario.close()
+        executor_inferencia.liberar()
+        raise HTTPException(status_code=400, detail="Nenhum arquivo enviado no campo 'files'")
+    
+    inicio = time.perf_counter()
+    versao = versao_modelos
+    
+    def gerar():
+        linhas = 0
+        try:
+            for linha in executar_em_estagios(
+                _fonte_itens_stream(files),
+                [
+                    (partial(_estagio_decodificar, versao=versao), DECODIFICACAO_WORKERS),
+                    (_estagio_especies, TAMANHO_LOTE_INFERENCIA),
+                    (partial(_estagio_saude, versao=versao), TAMANHO_LOTE_INFERENCIA),
+                    (partial(_estagio_serializar, modo=modo), 1)
+                ],
+                tamanho_buffer=TAMANHO_BUFFER_STREAM
+            ):
+                linhas += 1
+                yield linha
+        finally:
+            for file in files:
+                file.file.close()
+            executor_inferencia.liberar()
+            if amostrar(LOG_AMOSTRAGEM):
+                logger.info("stream", extra={'campos': {
+                    'endpoint': '/predict_stream',
+                    'imagens': linhas,
+                    'total_ms': round((time.perf_counter() - inicio) * 1000, 3)
+                }})
+    
+    return StreamingResponse(gerar(), media_type="application/x-ndjson")
+
 if __name__ == "__main__":
     import uvicorn
     print("🚀 Iniciando Plant Disease Detection API v4.0.0")
@@ -288,6 +1938,6 @@ if __name__ == "__main__":
     print("   - Potato: 0.65 (F1=95.2%)")
     print("   - Pepper: 0.15 (F1=95.2%)")
     print("   - Performance esperada: >90% acurácia")
-    print("   - Endpoints: / | /status | /predict | /docs")
+    print("   - Endpoints: / | /status | /predict | /predict_batch | /predict_stream | /docs")
     print("🌐 Acesse: http://localhost:8000/docs para documentação interativa")
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info") 
\ No newline at end of file
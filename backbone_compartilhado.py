@@ -0,0 +1,158 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+from tensorflow.keras.models import Model
+
+
+def _cortes_resnet50() -> List[str]:
+    """Saídas de bloco da ResNet50, em ordem, onde o grafo pode ser dividido"""
+    blocos = {2: 3, 3: 4, 4: 6, 5: 3}
+    cortes = ['pool1_pool']
+    for estagio, total in blocos.items():
+        cortes += [f'conv{estagio}_block{bloco}_out' for bloco in range(1, total + 1)]
+    return cortes
+
+CORTES_RESNET50 = _cortes_resnet50()
+
+
+def _pesos_iguais(camada_a, camada_b) -> bool:
+    """Verifica se duas camadas possuem exatamente os mesmos pesos"""
+    pesos_a = camada_a.get_weights()
+    pesos_b = camada_b.get_weights()
+    if len(pesos_a) != len(pesos_b):
+        return False
+    return all(a.shape == b.shape and np.array_equal(a, b) for a, b in zip(pesos_a, pesos_b))
+
+
+def encontrar_corte_comum(modelo_referencia, modelo) -> Optional[str]:
+    """
+    Encontra a saída de bloco mais profunda até a qual os dois modelos são idênticos
+
+    Percorre as camadas do modelo de referência em ordem topológica e para na
+    primeira camada cujos pesos diferem (camadas com fine-tuning).
+
+    Returns:
+        str: Nome da camada de corte, ou None se nenhum bloco é compartilhado
+    """
+    ultimo_corte = None
+    for camada in modelo_referencia.layers:
+        try:
+            outra = modelo.get_layer(camada.name)
+        except ValueError:
+            break
+        if camada.weights and not _pesos_iguais(camada, outra):
+            break
+        if camada.name in CORTES_RESNET50:
+            ultimo_corte = camada.name
+    return ultimo_corte
+
+
+def _como_lista(tensores) -> list:
+    return list(tensores) if isinstance(tensores, (list, tuple)) else [tensores]
+
+
+def _cabeca(modelo, corte: str):
+    """
+    Novo modelo com as camadas posteriores ao corte, sobre uma entrada própria
+
+    As camadas são recriadas a partir da configuração e recebem uma cópia dos
+    pesos: a cabeça não guarda referência ao grafo do modelo original, que
+    pode então ser liberado junto com a sua cópia da ResNet50. Um submodelo
+    que começasse no tensor intermediário manteria o grafo inteiro (e o
+    Keras 3 nem aceita tensores intermediários como entrada).
+    """
+    from tensorflow.keras.layers import Input
+
+    camada_corte = modelo.get_layer(corte)
+    entrada = Input(shape=tuple(camada_corte.output.shape[1:]), name=f'{corte}_features')
+    # Tensores do modelo original → tensores equivalentes na cabeça
+    tensores = {id(camada_corte.output): entrada}
+
+    camadas = modelo.layers
+    for camada in camadas[camadas.index(camada_corte) + 1:]:
+        entradas = _como_lista(camada.input)
+        if not all(id(t) in tensores for t in entradas):
+            continue
+        nova = camada.__class__.from_config(camada.get_config())
+        argumentos = [tensores[id(t)] for t in entradas]
+        saida = nova(argumentos if isinstance(camada.input, (list, tuple)) else argumentos[0])
+        nova.set_weights(camada.get_weights())
+        tensores[id(camada.output)] = saida
+
+    saidas = [tensores[id(t)] for t in _como_lista(modelo.output)]
+    return Model(inputs=entrada, outputs=saidas if len(saidas) > 1 else saidas[0],
+                 name=f'{modelo.name}_cabeca')
+
+
+class BackboneCompartilhado:
+    """
+    Tronco ResNet50 compartilhado entre o modelo de espécies e os especialistas
+
+    O tronco (camadas congeladas, idênticas em todos os modelos) é executado
+    uma única vez por imagem; cada modelo executa apenas a sua cabeça (blocos
+    com fine-tuning + camadas densas) sobre as features do tronco. As cabeças
+    são modelos independentes: os especialistas completos podem ser liberados,
+    e só a ResNet50 do modelo de espécies fica em memória.
+    """
+
+    def __init__(self, tronco, cabeca_especies, cabecas_especialistas: Dict[str, Model],
+                 corte: str, especies_sem_compartilhamento: List[str]):
+        self.tronco = tronco
+        self.cabeca_especies = cabeca_especies
+        self.cabecas_especialistas = cabecas_especialistas
+        self.corte = corte
+        self.especies_sem_compartilhamento = especies_sem_compartilhamento
+
+    @property
+    def especies(self) -> List[str]:
+        """Especialistas servidos pela cabeça sobre o tronco compartilhado"""
+        return list(self.cabecas_especialistas.keys())
+
+    def extrair(self, img_batch: np.ndarray) -> np.ndarray:
+        """Executa o tronco compartilhado em um lote de imagens"""
+        return self.tronco.predict(img_batch, verbose=0)
+
+    def info(self) -> Dict:
+        """Resumo da configuração para o endpoint de status"""
+        return {
+            'ativo': True,
+            'corte': self.corte,
+            'especialistas_compartilhados': self.especies,
+            'especialistas_modelo_completo': self.especies_sem_compartilhamento
+        }
+
+
+def construir_backbone_compartilhado(modelo_especies, modelos_especialistas: Dict[str, Model],
+                                     corte_minimo: str = 'conv4_block1_out') -> Optional[BackboneCompartilhado]:
+    """
+    Divide os modelos em tronco compartilhado + cabeças leves
+
+    Especialistas cujo trecho idêntico ao modelo de espécies termina antes de
+    `corte_minimo` (fine-tuning mais profundo) continuam usando o modelo completo.
+
+    Returns:
+        BackboneCompartilhado, ou None se nenhum especialista pode compartilhar o tronco
+    """
+    indice_minimo = CORTES_RESNET50.index(corte_minimo)
+
+    cortes = {}
+    for especie, modelo in modelos_especialistas.items():
+        corte = encontrar_corte_comum(modelo_especies, modelo)
+        if corte is not None and CORTES_RESNET50.index(corte) >= indice_minimo:
+            cortes[especie] = corte
+
+    if not cortes:
+        return None
+
+    # O tronco precisa ser idêntico para todos: usar o corte mais raso
+    corte = min(cortes.values(), key=CORTES_RESNET50.index)
+
+    tronco = Model(inputs=modelo_especies.input, outputs=modelo_especies.get_layer(corte).output)
+
+    return BackboneCompartilhado(
+        tronco=tronco,
+        cabeca_especies=_cabeca(modelo_especies, corte),
+        cabecas_especialistas={especie: _cabeca(modelos_especialistas[especie], corte) for especie in cortes},
+        corte=corte,
+        especies_sem_compartilhamento=[e for e in modelos_especialistas if e not in cortes]
+    )
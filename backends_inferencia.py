@@ -0,0 +1,190 @@
+import os
+import threading
+from typing import Dict
+
+import numpy as np
+
+# TensorFlow é importado sob demanda: workers que delegam a inferência
+# (SERVIDOR_INFERENCIA) não precisam carregá-lo
+
+# Caminhos dos modelos treinados nos notebooks
+CAMINHO_MODELO_ESPECIES = 'modelos_salvos/melhor_modelo_especies_final_otimizado.h5'
+CAMINHO_ENCODER_ESPECIES = 'datasets_processados/label_encoder_especies_modelo.pkl'
+ESPECIES_ESPECIALISTAS = ['tomato', 'potato', 'pepper']
+
+# Dataset de cada especialista (nome usado em `utils.carregar_dataset_especialista`;
+# os CSVs seguem as pastas do PlantVillage, ex.: Pepper__bell → pepper_bell)
+DATASETS_ESPECIALISTAS = {'tomato': 'tomato', 'potato': 'potato', 'pepper': 'pepper_bell'}
+
+# Diretório dos modelos exportados por `exportar_modelos.py`
+DIRETORIO_EXPORTADOS = 'modelos_salvos/exportados'
+
+BACKENDS = ('keras', 'tf_function', 'tflite', 'onnx')
+
+# Variantes dos modelos TFLite geradas por `quantizar_modelos.py`
+VARIANTES = ('fp32', 'fp16', 'int8')
+
+
+def caminho_especialista(especie: str) -> str:
+    """Caminho do modelo especialista balanceado de uma espécie"""
+    return f'modelos_salvos/especialistas/especialista_{especie}_balanceado_final.h5'
+
+
+def csv_especialista(especie: str, caminho_base: str = 'datasets_processados') -> str:
+    """CSV do dataset processado de um especialista"""
+    return f'{caminho_base}/dataset_{DATASETS_ESPECIALISTAS[especie]}.csv'
+
+
+def modelos_servidos() -> Dict[str, str]:
+    """Nome lógico → caminho .h5 de todos os modelos servidos pela API"""
+    modelos = {'especies': CAMINHO_MODELO_ESPECIES}
+    for especie in ESPECIES_ESPECIALISTAS:
+        modelos[f'especialista_{especie}'] = caminho_especialista(especie)
+    return modelos
+
+
+def caminho_exportado(nome: str, formato: str, diretorio: str = DIRETORIO_EXPORTADOS,
+                      variante: str = 'fp32') -> str:
+    """Caminho do modelo exportado (formato: 'tflite' ou 'onnx'; variante quantizada só para tflite)"""
+    sufixo = '' if variante == 'fp32' else f'_{variante}'
+    return os.path.join(diretorio, f'{nome}{sufixo}.{formato}')
+
+
+def caminho_backend(nome: str, caminho_h5: str, backend: str, diretorio: str = DIRETORIO_EXPORTADOS,
+                    variante: str = 'fp32') -> str:
+    """Arquivo efetivamente carregado pelo backend (o .h5 ou o modelo exportado)"""
+    if backend == 'tflite':
+        return caminho_exportado(nome, backend, diretorio, variante)
+    if backend == 'onnx':
+        return caminho_exportado(nome, backend, diretorio)
+    return caminho_h5
+
+
+class BackendTFFunction:
+    """
+    Função concreta compilada com `tf.function` e assinatura de entrada fixa
+
+    Evita o maquinário de data adapters do `Model.predict`, que domina o tempo
+    de lotes pequenos.
+    """
+
+    nome = 'tf_function'
+
+    def __init__(self, modelo):
+        import tensorflow as tf
+
+        self.modelo = modelo
+        assinatura = tf.TensorSpec((None,) + tuple(modelo.input_shape[1:]), tf.float32)
+        self._funcao = tf.function(lambda x: modelo(x, training=False)).get_concrete_function(assinatura)
+
+    def predict(self, lote: np.ndarray, verbose: int = 0) -> np.ndarray:
+        return self._funcao(np.asarray(lote, dtype=np.float32)).numpy()
+
+
+class BackendTFLite:
+    """
+    Interpretador TFLite (XNNPACK é o delegate padrão em CPU)
+
+    Aceita modelos float32, float16 e quantizados em int8 (a entrada e a saída
+    são (des)quantizadas com a escala/zero-point do próprio modelo).
+
+    Um único interpretador por modelo: o XNNPACK reempacota os pesos em cada
+    interpretador, então manter um por tamanho de lote multiplicaria a
+    memória. A entrada é redimensionada para o tamanho exato do lote só
+    quando ele muda (cada troca realoca os tensores).
+    """
+
+    nome = 'tflite'
+
+    def __init__(self, caminho: str, threads: int = 1):
+        import tensorflow as tf
+
+        self.caminho = caminho
+        self.interpretador = tf.lite.Interpreter(model_path=caminho, num_threads=threads)
+        self.interpretador.allocate_tensors()
+        self._entrada = self.interpretador.get_input_details()[0]
+        self._saida = self.interpretador.get_output_details()[0]
+        self._tamanho_lote = int(self._entrada['shape'][0])
+        # O interpretador não é thread-safe
+        self._lock = threading.Lock()
+
+    def _preparar(self, tamanho_lote: int):
+        if tamanho_lote != self._tamanho_lote:
+            forma = [tamanho_lote] + list(self._entrada['shape'][1:])
+            self.interpretador.resize_tensor_input(self._entrada['index'], forma)
+            self.interpretador.allocate_tensors()
+            self._entrada = self.interpretador.get_input_details()[0]
+            self._saida = self.interpretador.get_output_details()[0]
+            self._tamanho_lote = tamanho_lote
+
+    def _quantizar_entrada(self, lote: np.ndarray) -> np.ndarray:
+        escala, zero = self._entrada['quantization']
+        tipo = self._entrada['dtype']
+        if not escala:
+            return lote.astype(tipo, copy=False)
+        # Saturar no intervalo do tipo: sem o clip, valores fora dele dão a volta no cast
+        limites = np.iinfo(tipo)
+        return np.clip(np.round(lote / escala + zero), limites.min, limites.max).astype(tipo)
+
+    def predict(self, lote: np.ndarray, verbose: int = 0) -> np.ndarray:
+        with self._lock:
+            self._preparar(len(lote))
+            self.interpretador.set_tensor(self._entrada['index'], self._quantizar_entrada(lote))
+            self.interpretador.invoke()
+            saida = self.interpretador.get_tensor(self._saida['index'])
+
+            escala, zero = self._saida['quantization']
+            if escala:
+                saida = (saida.astype(np.float32) - zero) * escala
+            return saida
+
+
+class BackendONNX:
+    """Sessão do ONNX Runtime em CPU"""
+
+    nome = 'onnx'
+
+    def __init__(self, caminho: str, threads: int = 1):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("Backend 'onnx' requer o pacote onnxruntime (pip install onnxruntime)")
+
+        opcoes = ort.SessionOptions()
+        opcoes.intra_op_num_threads = threads
+        self.caminho = caminho
+        self.sessao = ort.InferenceSession(caminho, sess_options=opcoes, providers=['CPUExecutionProvider'])
+        self._nome_entrada = self.sessao.get_inputs()[0].name
+
+    def predict(self, lote: np.ndarray, verbose: int = 0) -> np.ndarray:
+        return self.sessao.run(None, {self._nome_entrada: lote.astype(np.float32, copy=False)})[0]
+
+
+def carregar_backend(nome: str, caminho_h5: str, backend: str = 'keras', threads: int = 1,
+                     diretorio: str = DIRETORIO_EXPORTADOS, variante: str = 'fp32'):
+    """
+    Carrega um modelo no backend de inferência escolhido
+
+    Todos os backends expõem `predict(lote, verbose=0)`, como um modelo Keras,
+    e podem ser usados diretamente no pipeline hierárquico.
+
+    Args:
+        nome: Nome lógico do modelo (ver `modelos_servidos`)
+        caminho_h5: Caminho do modelo Keras original
+        backend: 'keras', 'tf_function', 'tflite' ou 'onnx'
+        threads: Threads do interpretador (tflite/onnx)
+        diretorio: Diretório dos modelos exportados
+        variante: 'fp32', 'fp16' ou 'int8' (apenas para o backend tflite)
+    """
+    if backend in ('keras', 'tf_function'):
+        from tensorflow.keras.models import load_model
+
+    if backend == 'keras':
+        return load_model(caminho_h5)
+    if backend == 'tf_function':
+        return BackendTFFunction(load_model(caminho_h5))
+    if backend == 'tflite':
+        return BackendTFLite(caminho_backend(nome, caminho_h5, backend, diretorio, variante), threads)
+    if backend == 'onnx':
+        return BackendONNX(caminho_backend(nome, caminho_h5, backend, diretorio), threads)
+    raise ValueError(f"Backend desconhecido: {backend}. Opções: {BACKENDS}")
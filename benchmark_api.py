@@ -0,0 +1,364 @@
+"""
+Benchmark de carga e latência da API
+
+Envia imagens do PlantVillage (ou imagens sintéticas) com concorrência fixa
+ou a uma taxa constante de requisições, e mede vazão, latências p50/p95/p99
+e taxa de erro. Por padrão a API roda no mesmo processo (cliente ASGI, sem
+rede); com --url o alvo é um servidor já iniciado. Com --modelos-falsos a API
+usa modelos pequenos inicializados aleatoriamente no lugar dos arquivos .h5.
+
+Uso:
+    python benchmark_api.py --concorrencia 16 --requisicoes 500 --saida resultados/keras.json
+    python benchmark_api.py --url http://localhost:8000 --taxa 50 --duracao 30
+    MICRO_BATCH_TAMANHO_MAXIMO=32 python benchmark_api.py --modelos-falsos --endpoint predict_batch
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+DIRETORIO_PLANTVILLAGE = './PlantVillage'
+EXTENSOES = ('.jpg', '.jpeg', '.png')
+
+# Variáveis de ambiente da API registradas junto com os resultados
+CONFIGURACOES_REGISTRADAS = (
+    'BACKEND_INFERENCIA', 'VARIANTE_MODELO', 'BACKEND_THREADS', 'MICRO_BATCH_ATIVO',
+    'MICRO_BATCH_JANELA_MS', 'MICRO_BATCH_TAMANHO_MAXIMO', 'INFERENCIA_THREADS',
+    'DECODIFICACAO_WORKERS', 'DECODIFICACAO_MODO', 'PREPROCESSAMENTO_MODO', 'CACHE_ATIVO',
+    'BACKBONE_COMPARTILHADO', 'SERVIDOR_INFERENCIA', 'WEB_CONCURRENCY'
+)
+
+
+def coletar_imagens(diretorio: str, limite: int, seed: int = 42) -> List[Tuple[str, bytes]]:
+    """Amostra reprodutível de imagens de uma árvore no formato do PlantVillage"""
+    caminhos = []
+    for raiz, _, arquivos in os.walk(diretorio):
+        caminhos.extend(os.path.join(raiz, a) for a in arquivos if a.lower().endswith(EXTENSOES))
+    caminhos.sort()
+    random.Random(seed).shuffle(caminhos)
+
+    imagens = []
+    for caminho in caminhos[:limite]:
+        with open(caminho, 'rb') as f:
+            imagens.append((os.path.basename(caminho), f.read()))
+    return imagens
+
+
+def imagens_sinteticas(quantidade: int, tamanho=(256, 256), seed: int = 42) -> List[Tuple[str, bytes]]:
+    """JPEGs de ruído, usados quando a árvore de imagens não existe"""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    imagens = []
+    for i in range(quantidade):
+        pixels = rng.integers(0, 256, size=(tamanho[1], tamanho[0], 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format='JPEG', quality=90)
+        imagens.append((f'sintetica_{i}.jpg', buffer.getvalue()))
+    return imagens
+
+
+def criar_modelo_falso(saidas: int, ativacao: str):
+    """Modelo pequeno com a mesma entrada/saída dos modelos reais, pesos aleatórios"""
+    import tensorflow as tf
+
+    entrada = tf.keras.Input((224, 224, 3))
+    x = tf.keras.layers.Conv2D(8, 3, strides=4, activation='relu')(entrada)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    return tf.keras.Model(entrada, tf.keras.layers.Dense(saidas, activation=ativacao)(x))
+
+
+def instalar_modelos_falsos(api, seed: int = 0):
+    """Substitui o carregamento de `api` por modelos falsos (sem os arquivos .h5)"""
+    import tensorflow as tf
+    from sklearn.preprocessing import LabelEncoder
+
+    from backends_inferencia import BackendTFFunction
+    from registro_modelos import ConjuntoModelos
+
+    def carregar_conjunto(versao=None, lazy=False, tempos=None):
+        inicio = time.perf_counter()
+        tf.random.set_seed(seed)
+        envolver = BackendTFFunction if api.BACKEND_INFERENCIA == 'tf_function' else (lambda m: m)
+
+        conjunto = ConjuntoModelos(versao or f'modelos_falsos_{seed}')
+        conjunto.modelo_especies = envolver(criar_modelo_falso(len(api.MAPEAMENTO_ESPECIES), 'softmax'))
+        conjunto.encoder_especies = LabelEncoder().fit(list(api.MAPEAMENTO_ESPECIES))
+        for especie in api.ESPECIES_ESPECIALISTAS:
+            conjunto.modelos_especialistas[especie] = envolver(criar_modelo_falso(1, 'sigmoid'))
+        api._registrar_carregamento('modelos_falsos', inicio, 'carregado', tempos=tempos)
+        print("🧪 Usando modelos falsos (pesos aleatórios)")
+        return conjunto
+
+    api._carregar_conjunto = carregar_conjunto
+
+
+def _importar_httpx():
+    try:
+        import httpx
+    except ImportError:
+        raise ImportError("O benchmark requer o pacote httpx (pip install httpx)")
+    return httpx
+
+
+@asynccontextmanager
+async def cliente_em_processo(modelos_falsos: bool, timeout: float):
+    """Cliente ASGI ligado à API no mesmo processo, com o lifespan executado"""
+    httpx = _importar_httpx()
+    import api
+
+    if modelos_falsos:
+        instalar_modelos_falsos(api)
+
+    async with api.lifespan(api.app):
+        transporte = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transporte, base_url='http://benchmark', timeout=timeout) as cliente:
+            yield cliente
+
+
+@asynccontextmanager
+async def cliente_remoto(url: str, timeout: float):
+    """Cliente HTTP para uma API já em execução"""
+    httpx = _importar_httpx()
+    limites = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limites) as cliente:
+        yield cliente
+
+
+async def aguardar_prontidao(cliente, limite_segundos: float = 600.0):
+    """Aguarda /health/ready responder 200"""
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite_segundos:
+        try:
+            resposta = await cliente.get('/health/ready')
+            if resposta.status_code == 200:
+                return time.perf_counter() - inicio
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError(f"API não ficou pronta em {limite_segundos:.0f}s")
+
+
+class Medicoes:
+    """Latências e status das requisições medidas"""
+
+    def __init__(self):
+        self.latencias: List[float] = []
+        self.status: Counter = Counter()
+        self.imagens = 0
+
+    def registrar(self, status, latencia: float, imagens: int):
+        self.status[str(status)] += 1
+        if status == 200:
+            self.latencias.append(latencia)
+            self.imagens += imagens
+
+
+async def enviar(cliente, endpoint: str, imagens: List[Tuple[str, bytes]], indice: int,
+                 por_requisicao: int) -> Tuple[Any, int]:
+    """Uma requisição ao endpoint com `por_requisicao` imagens a partir de `indice`"""
+    selecao = [imagens[(indice + i) % len(imagens)] for i in range(por_requisicao)]
+    if endpoint == 'predict':
+        nome, dados = selecao[0]
+        arquivos = {'file': (nome, dados, 'image/jpeg')}
+    else:
+        arquivos = [('files', (nome, dados, 'image/jpeg')) for nome, dados in selecao]
+
+    try:
+        resposta = await cliente.post(f'/{endpoint}', files=arquivos)
+        await resposta.aread()
+        return resposta.status_code, len(selecao)
+    except Exception as e:
+        return type(e).__name__, len(selecao)
+
+
+async def executar_concorrencia(cliente, args, imagens, medicoes: Medicoes):
+    """Carga fechada: `concorrencia` clientes enviando uma requisição após a outra"""
+    proximo = 0
+    fim = time.perf_counter() + args.duracao if args.duracao else None
+
+    async def usuario():
+        nonlocal proximo
+        while True:
+            if fim is not None:
+                if time.perf_counter() >= fim:
+                    return
+            elif proximo >= args.requisicoes:
+                return
+            indice = proximo
+            proximo += 1
+            inicio = time.perf_counter()
+            status, quantidade = await enviar(
+                cliente, args.endpoint, imagens, indice * args.imagens_por_requisicao,
+                args.imagens_por_requisicao
+            )
+            medicoes.registrar(status, time.perf_counter() - inicio, quantidade)
+
+    await asyncio.gather(*[usuario() for _ in range(args.concorrencia)])
+
+
+async def executar_taxa(cliente, args, imagens, medicoes: Medicoes):
+    """
+    Carga aberta: requisições disparadas a `taxa` por segundo
+
+    A latência é contada a partir do horário agendado, e não do envio, para
+    que o atraso causado por um servidor lento (ou pelo limite de requisições
+    em andamento) apareça nos percentis.
+    """
+    total = int(args.duracao * args.taxa) if args.duracao else args.requisicoes
+    em_andamento = asyncio.Semaphore(args.concorrencia)
+    inicio = time.perf_counter()
+
+    async def requisicao(indice: int, agendado: float):
+        async with em_andamento:
+            status, quantidade = await enviar(
+                cliente, args.endpoint, imagens, indice * args.imagens_por_requisicao,
+                args.imagens_por_requisicao
+            )
+        medicoes.registrar(status, time.perf_counter() - agendado, quantidade)
+
+    tarefas = []
+    for i in range(total):
+        agendado = inicio + i / args.taxa
+        espera = agendado - time.perf_counter()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        tarefas.append(asyncio.create_task(requisicao(i, agendado)))
+    await asyncio.gather(*tarefas)
+
+
+def resumir(medicoes: Medicoes, duracao: float) -> Dict[str, Any]:
+    """Vazão, percentis de latência (ms) e taxa de erro"""
+    total = sum(medicoes.status.values())
+    sucesso = medicoes.status.get('200', 0)
+    resumo = {
+        'requisicoes': total,
+        'sucesso': sucesso,
+        'taxa_erro': (total - sucesso) / total if total else 0.0,
+        'status': dict(medicoes.status),
+        'duracao_s': duracao,
+        'requisicoes_por_s': sucesso / duracao if duracao else 0.0,
+        'imagens_por_s': medicoes.imagens / duracao if duracao else 0.0
+    }
+    if medicoes.latencias:
+        latencias = np.array(medicoes.latencias) * 1000
+        resumo['latencia_ms'] = {
+            'media': float(latencias.mean()),
+            'p50': float(np.percentile(latencias, 50)),
+            'p95': float(np.percentile(latencias, 95)),
+            'p99': float(np.percentile(latencias, 99)),
+            'max': float(latencias.max())
+        }
+    return resumo
+
+
+async def executar(args) -> Dict[str, Any]:
+    if os.path.isdir(args.imagens):
+        imagens = coletar_imagens(args.imagens, args.max_imagens)
+    else:
+        imagens = []
+    if not imagens:
+        print(f"⚠️ Nenhuma imagem em {args.imagens}: usando imagens sintéticas")
+        imagens = imagens_sinteticas(min(args.max_imagens, 64))
+
+    if args.url:
+        contexto = cliente_remoto(args.url, args.timeout)
+    else:
+        contexto = cliente_em_processo(args.modelos_falsos, args.timeout)
+
+    async with contexto as cliente:
+        tempo_prontidao = await aguardar_prontidao(cliente)
+        print(f"✅ API pronta ({tempo_prontidao:.1f}s); {len(imagens)} imagens")
+
+        if args.aquecimento:
+            await asyncio.gather(*[
+                enviar(cliente, args.endpoint, imagens, i, args.imagens_por_requisicao)
+                for i in range(args.aquecimento)
+            ])
+
+        medicoes = Medicoes()
+        inicio = time.perf_counter()
+        if args.taxa:
+            await executar_taxa(cliente, args, imagens, medicoes)
+        else:
+            await executar_concorrencia(cliente, args, imagens, medicoes)
+        duracao = time.perf_counter() - inicio
+
+        status_api = (await cliente.get('/status')).json()
+
+    return {
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'alvo': args.url or 'em_processo',
+        'parametros': {
+            'endpoint': args.endpoint,
+            'concorrencia': args.concorrencia,
+            'taxa': args.taxa,
+            'requisicoes': args.requisicoes,
+            'duracao': args.duracao,
+            'imagens_por_requisicao': args.imagens_por_requisicao,
+            'modelos_falsos': args.modelos_falsos,
+            'imagens_distintas': len(imagens)
+        },
+        'configuracao': {nome: os.environ[nome] for nome in CONFIGURACOES_REGISTRADAS if nome in os.environ},
+        'api': {
+            chave: status_api.get(chave)
+            for chave in ('versao_modelos', 'backend_inferencia', 'variante_modelo', 'micro_batching', 'executor')
+        },
+        'tempo_prontidao_s': tempo_prontidao,
+        'resultados': resumir(medicoes, duracao)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga e latência da API")
+    parser.add_argument('--url', default=None, help="API já em execução (padrão: API no mesmo processo)")
+    parser.add_argument('--endpoint', choices=['predict', 'predict_batch', 'predict_stream'], default='predict')
+    parser.add_argument('--imagens-por-requisicao', type=int, default=1,
+                        help="Imagens por requisição em predict_batch/predict_stream")
+    parser.add_argument('--concorrencia', type=int, default=8,
+                        help="Clientes simultâneos (com --taxa, limite de requisições em andamento)")
+    parser.add_argument('--taxa', type=float, default=None, help="Requisições por segundo (carga aberta)")
+    parser.add_argument('--requisicoes', type=int, default=200)
+    parser.add_argument('--duracao', type=float, default=None, help="Segundos de carga (substitui --requisicoes)")
+    parser.add_argument('--aquecimento', type=int, default=10, help="Requisições descartadas antes da medição")
+    parser.add_argument('--imagens', default=DIRETORIO_PLANTVILLAGE)
+    parser.add_argument('--max-imagens', type=int, default=256)
+    parser.add_argument('--modelos-falsos', action='store_true',
+                        help="Modelos pequenos com pesos aleatórios (não precisa dos .h5)")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--saida', default=None, help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    if args.endpoint == 'predict':
+        args.imagens_por_requisicao = 1
+    if args.url and args.modelos_falsos:
+        parser.error("--modelos-falsos só se aplica à API no mesmo processo")
+
+    relatorio = asyncio.run(executar(args))
+    resultados = relatorio['resultados']
+
+    print(f"📊 {resultados['requisicoes']} requisições em {resultados['duracao_s']:.1f}s: "
+          f"{resultados['requisicoes_por_s']:.1f} req/s, {resultados['imagens_por_s']:.1f} img/s, "
+          f"erros {resultados['taxa_erro'] * 100:.1f}%")
+    if 'latencia_ms' in resultados:
+        latencia = resultados['latencia_ms']
+        print(f"   latência (ms): p50={latencia['p50']:.1f} p95={latencia['p95']:.1f} "
+              f"p99={latencia['p99']:.1f} máx={latencia['max']:.1f}")
+
+    if args.saida:
+        os.makedirs(os.path.dirname(args.saida) or '.', exist_ok=True)
+        with open(args.saida, 'w') as f:
+            json.dump(relatorio, f, indent=2)
+        print(f"💾 Resultados salvos em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Vazão do pipeline de entrada de treino: ImageDataGenerator × tf.data
+
+Mede imagens/s de `criar_geradores`, `criar_datasets_tfdata` e, se o cache de
+`cache_dataset.py` existir, `criar_datasets_cache` (utils.py) sobre o mesmo dataset e configuração, sem treinar nenhum modelo: treino com
+augmentation e duas passagens completas pelo teste (a 2ª já lê do cache do
+tf.data).
+
+Uso:
+    python benchmark_geradores.py --lotes 50
+    python benchmark_geradores.py --especialista Tomato --saida resultados/benchmark_geradores.json
+"""
+import argparse
+import json
+import os
+
+from utils import (
+    carregar_configuracoes, carregar_dataset_cache, carregar_dataset_especialista, carregar_dataset_especies,
+    criar_datasets_cache, criar_datasets_tfdata, criar_geradores, medir_vazao
+)
+
+
+def medir(nome: str, train, test, lotes: int) -> dict:
+    """Vazão de treino (`lotes` lotes) e de duas passagens completas pelo teste"""
+    def vazao(gerador, passagem, quantidade):
+        gerador.reset()
+        valor = medir_vazao(gerador, quantidade)
+        if valor is None:
+            print(f"   {nome:<20} {passagem:<14} lotes insuficientes ({len(gerador)} lotes, 2 de aquecimento)")
+        else:
+            print(f"   {nome:<20} {passagem:<14} {valor:8.1f} img/s")
+        return valor
+
+    return {
+        'treino': vazao(train, 'treino', min(lotes, len(train) - 2)),
+        'teste_1a_passagem': vazao(test, 'teste (1ª)', None),
+        'teste_2a_passagem': vazao(test, 'teste (2ª)', None)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a vazão de ImageDataGenerator e tf.data")
+    parser.add_argument('--especialista', default=None, help="Usa o dataset de um especialista (ex.: Tomato)")
+    parser.add_argument('--lotes', type=int, default=50, help="Lotes medidos por cenário")
+    parser.add_argument('--batch-size', type=int, default=None, help="Sobrescreve o batch_size das configurações")
+    parser.add_argument('--saida', default=None, help="Arquivo JSON para o relatório")
+    args = parser.parse_args()
+
+    config = carregar_configuracoes()
+    if args.batch_size:
+        config['batch_size'] = args.batch_size
+    if args.especialista:
+        dataset = carregar_dataset_especialista(args.especialista)
+    else:
+        dataset = carregar_dataset_especies()
+
+    print(f"📊 Vazão do pipeline de entrada (batch_size={config['batch_size']}, {args.lotes} lotes)")
+    train, _, test = criar_geradores(dataset, config)
+    relatorio = {'ImageDataGenerator': medir('ImageDataGenerator', train, test, args.lotes)}
+    train, _, test = criar_datasets_tfdata(dataset, config)
+    relatorio['tf.data'] = medir('tf.data', train, test, args.lotes)
+
+    nome_cache = f"dataset_{args.especialista.lower()}" if args.especialista else 'dataset_especies'
+    try:
+        dataset_cache = carregar_dataset_cache(nome_cache)
+    except FileNotFoundError:
+        print(f"⚠️ Cache {nome_cache} não encontrado (execute cache_dataset.py): cenário ignorado")
+    else:
+        train, _, test = criar_datasets_cache(dataset_cache, config)
+        relatorio['cache mmap'] = medir('cache mmap', train, test, args.lotes)
+
+    treino_tfdata, treino_gerador = relatorio['tf.data']['treino'], relatorio['ImageDataGenerator']['treino']
+    if treino_tfdata is None or treino_gerador is None:
+        print("⚠️ Lotes insuficientes para comparar a vazão de treino (aumente o dataset ou reduza --batch-size)")
+    else:
+        print(f"✅ tf.data: {treino_tfdata / treino_gerador:.1f}x a vazão de treino do ImageDataGenerator")
+
+    if args.saida:
+        os.makedirs(os.path.dirname(args.saida) or '.', exist_ok=True)
+        with open(args.saida, 'w') as f:
+            json.dump({'batch_size': config['batch_size'], 'lotes': args.lotes,
+                       'dataset': args.especialista or 'especies', 'resultados': relatorio}, f, indent=2)
+        print(f"💾 Relatório salvo em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Cache dos datasets processados como arrays uint8 mapeados em memória
+
+Decodifica e redimensiona uma única vez as imagens listadas nos CSVs de
+`datasets_processados/` e grava, para cada CSV, um diretório com:
+
+- `<split>.npy`: array uint8 (N, altura, largura, 3), lido com `np.load(mmap_mode='r')`
+- `indice.csv`: posição de cada imagem no array do seu split, caminho e rótulo
+- `metadados.json`: origem, hash do CSV, tamanho, modo de decodificação, interpolação e falhas
+
+As imagens são decodificadas com `preprocessamento.carregar_rgb` e
+redimensionadas com vizinho mais próximo, a mesma interpolação de
+`utils.criar_datasets_tfdata` e do `flow_from_dataframe`, para que treinar a
+partir do cache veja os mesmos pixels. (A API usa o resample padrão do PIL.)
+Os loaders ficam em `utils.py` (`carregar_dataset_cache`,
+`criar_datasets_cache`).
+
+Uso:
+    python cache_dataset.py
+    python cache_dataset.py --csv datasets_processados/dataset_tomato.csv --workers 8
+"""
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from preprocessamento import MODOS, carregar_rgb
+from processamento_lotes import dividir_em_lotes
+
+DIRETORIO_CACHE = 'datasets_processados/cache'
+SPLITS = ('train', 'val', 'test')
+COLUNAS_ROTULO = ('especie', 'classe')
+# Mesma interpolação de utils.criar_datasets_tfdata / flow_from_dataframe
+INTERPOLACAO = 'nearest'
+
+
+def hash_arquivo(caminho: str) -> str:
+    """SHA-256 do conteúdo de um arquivo"""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def diretorio_do_cache(caminho_csv: str, destino: str = DIRETORIO_CACHE) -> str:
+    """Diretório do cache de um CSV (`<destino>/<nome do CSV sem extensão>`)"""
+    return os.path.join(destino, os.path.splitext(os.path.basename(caminho_csv))[0])
+
+
+def cache_atualizado(caminho_csv: str, diretorio: str, tamanho: Tuple[int, int], modo: str) -> bool:
+    """Se o cache existe e foi gerado a partir do CSV atual com os mesmos parâmetros"""
+    caminho_meta = os.path.join(diretorio, 'metadados.json')
+    if not os.path.exists(caminho_meta):
+        return False
+    with open(caminho_meta) as f:
+        meta = json.load(f)
+    return (meta.get('csv_sha256') == hash_arquivo(caminho_csv)
+            and tuple(meta.get('tamanho', ())) == tuple(tamanho) and meta.get('modo') == modo
+            and meta.get('interpolacao') == INTERPOLACAO)
+
+
+def _decodificar(caminhos: Sequence[str], tamanho: Tuple[int, int],
+                 modo: str) -> List[Tuple[Optional[np.ndarray], Optional[str]]]:
+    """Decodifica um bloco de arquivos para uint8 (executado no pool de processos)"""
+    altura, largura = tamanho
+    saidas = []
+    for caminho in caminhos:
+        try:
+            with open(caminho, 'rb') as f:
+                saidas.append((carregar_rgb(f, (largura, altura), modo, resample=Image.NEAREST), None))
+        except Exception as e:
+            saidas.append((None, str(e)))
+    return saidas
+
+
+def _gravar_split(pool: ProcessPoolExecutor, caminhos: Sequence[str], destino: str,
+                  tamanho: Tuple[int, int], modo: str, bloco: int) -> Tuple[np.ndarray, List[Dict[str, str]]]:
+    """
+    Decodifica um split direto para `destino` (.npy mapeado em memória)
+
+    Returns:
+        tuple: (máscara das imagens válidas, falhas [{'caminho', 'erro'}])
+    """
+    altura, largura = tamanho
+    temporario = destino + '.tmp'
+    imagens = np.lib.format.open_memmap(temporario, mode='w+', dtype=np.uint8,
+                                        shape=(len(caminhos), altura, largura, 3))
+    validos = np.zeros(len(caminhos), dtype=bool)
+    falhas = []
+
+    blocos = list(dividir_em_lotes(list(caminhos), bloco))
+    posicao = 0
+    for n, saidas in enumerate(pool.map(_decodificar, blocos, [tamanho] * len(blocos), [modo] * len(blocos)), 1):
+        for imagem, erro in saidas:
+            if imagem is None:
+                falhas.append({'caminho': caminhos[posicao], 'erro': erro})
+            else:
+                imagens[posicao] = imagem
+                validos[posicao] = True
+            posicao += 1
+        if n % 20 == 0 or n == len(blocos):
+            print(f"   {os.path.basename(destino)}: {posicao}/{len(caminhos)} imagens")
+
+    imagens.flush()
+    if validos.all():
+        del imagens
+        os.replace(temporario, destino)
+    else:
+        # Compacta o array sem as imagens que falharam
+        compactado = np.lib.format.open_memmap(destino + '.compactado', mode='w+', dtype=np.uint8,
+                                               shape=(int(validos.sum()), altura, largura, 3))
+        indices = np.flatnonzero(validos)
+        for inicio in range(0, len(indices), bloco):
+            parte = indices[inicio:inicio + bloco]
+            compactado[inicio:inicio + len(parte)] = imagens[parte]
+        compactado.flush()
+        del imagens, compactado
+        os.replace(destino + '.compactado', destino)
+        os.remove(temporario)
+    return validos, falhas
+
+
+def construir_cache(caminho_csv: str, destino: str = DIRETORIO_CACHE, tamanho: Tuple[int, int] = (224, 224),
+                    modo: str = 'exato', workers: int = 1, bloco: int = 64) -> str:
+    """
+    Gera o cache de um CSV de dataset processado
+
+    O `metadados.json` é gravado por último: um cache sem ele está incompleto
+    e é reconstruído na próxima execução.
+
+    Returns:
+        str: Diretório do cache
+    """
+    import pandas as pd
+
+    df = pd.read_csv(caminho_csv)
+    coluna_rotulo = next((c for c in COLUNAS_ROTULO if c in df.columns), None)
+    if coluna_rotulo is None:
+        raise ValueError(f"{caminho_csv} não tem coluna de rótulo ({', '.join(COLUNAS_ROTULO)})")
+
+    diretorio = diretorio_do_cache(caminho_csv, destino)
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_meta = os.path.join(diretorio, 'metadados.json')
+    if os.path.exists(caminho_meta):
+        os.remove(caminho_meta)
+
+    indices, falhas, contagens = [], [], {}
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto) as pool:
+        for split in SPLITS:
+            dados = df[df['split'] == split]
+            if dados.empty:
+                continue
+            caminhos = dados['caminho'].tolist()
+            validos, falhas_split = _gravar_split(pool, caminhos, os.path.join(diretorio, f'{split}.npy'),
+                                                  tamanho, modo, bloco)
+            falhas.extend(dict(f, split=split) for f in falhas_split)
+
+            indice = pd.DataFrame({'caminho': dados['caminho'].values[validos],
+                                   'rotulo': dados[coluna_rotulo].values[validos]})
+            indice.insert(0, 'posicao', np.arange(len(indice)))
+            indice.insert(1, 'split', split)
+            indices.append(indice)
+            contagens[split] = len(indice)
+
+    pd.concat(indices, ignore_index=True).to_csv(os.path.join(diretorio, 'indice.csv'), index=False)
+    with open(caminho_meta, 'w') as f:
+        json.dump({
+            'origem': caminho_csv,
+            'csv_sha256': hash_arquivo(caminho_csv),
+            'coluna_rotulo': coluna_rotulo,
+            'tamanho': list(tamanho),
+            'modo': modo,
+            'interpolacao': INTERPOLACAO,
+            'splits': contagens,
+            'falhas': falhas,
+            'criado_em': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }, f, indent=2, ensure_ascii=False)
+    return diretorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera o cache uint8 mapeado em memória dos datasets processados")
+    parser.add_argument('--csv', nargs='*', default=None,
+                        help="CSVs de dataset (padrão: datasets_processados/dataset_*.csv)")
+    parser.add_argument('--destino', default=DIRETORIO_CACHE)
+    parser.add_argument('--tamanho', type=int, nargs=2, default=(224, 224), metavar=('ALTURA', 'LARGURA'))
+    parser.add_argument('--modo', choices=MODOS, default='exato')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processos de decodificação")
+    parser.add_argument('--forcar', action='store_true', help="Reconstrói mesmo caches atualizados")
+    args = parser.parse_args()
+
+    csvs = args.csv or sorted(glob.glob('datasets_processados/dataset_*.csv'))
+    if not csvs:
+        print("❌ Nenhum CSV de dataset encontrado")
+        return
+
+    for caminho_csv in csvs:
+        diretorio = diretorio_do_cache(caminho_csv, args.destino)
+        if not args.forcar and cache_atualizado(caminho_csv, diretorio, args.tamanho, args.modo):
+            print(f"✅ {diretorio} já está atualizado")
+            continue
+
+        print(f"🔄 Gerando cache de {caminho_csv}...")
+        inicio = time.perf_counter()
+        construir_cache(caminho_csv, args.destino, tuple(args.tamanho), args.modo, args.workers)
+        with open(os.path.join(diretorio, 'metadados.json')) as f:
+            meta = json.load(f)
+        print(f"✅ {diretorio}: {meta['splits']} em {time.perf_counter() - inicio:.1f}s"
+              + (f" ({len(meta['falhas'])} falhas)" if meta['falhas'] else ""))
+
+
+if __name__ == "__main__":
+    main()
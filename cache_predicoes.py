@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class _BackendMemoria:
+    """LRU em memória do processo, com expiração por TTL"""
+
+    def __init__(self, max_itens: int, ttl_segundos: float):
+        self.max_itens = max_itens
+        self.ttl = ttl_segundos
+        self._itens: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave: str):
+        """Retorna (resultado, expirado) ou (None, False) se a chave não existe"""
+        with self._lock:
+            entrada = self._itens.get(chave)
+            if entrada is None:
+                return None, False
+            criado_em, resultado = entrada
+            if time.monotonic() - criado_em > self.ttl:
+                del self._itens[chave]
+                return None, True
+            self._itens.move_to_end(chave)
+            return resultado, False
+
+    def guardar(self, chave: str, resultado: Dict[str, Any]) -> int:
+        """Guarda o resultado e retorna quantas entradas foram removidas"""
+        with self._lock:
+            self._itens[chave] = (time.monotonic(), resultado)
+            self._itens.move_to_end(chave)
+            removidos = 0
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                removidos += 1
+            return removidos
+
+    def tamanho(self) -> int:
+        return len(self._itens)
+
+
+class _BackendDisco:
+    """
+    Cache em diretório local, compartilhado entre os workers do uvicorn
+
+    Apontando o diretório para `/dev/shm` o cache fica em memória compartilhada.
+    Cada entrada é um arquivo JSON; o mtime marca o último acesso (LRU) e a
+    expiração por TTL.
+    """
+
+    INTERVALO_LIMPEZA = 64
+
+    def __init__(self, max_itens: int, ttl_segundos: float, diretorio: str):
+        self.max_itens = max_itens
+        self.ttl = ttl_segundos
+        self.diretorio = diretorio
+        self._gravacoes = 0
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, f'{chave}.json')
+
+    def obter(self, chave: str):
+        caminho = self._caminho(chave)
+        try:
+            if time.time() - os.path.getmtime(caminho) > self.ttl:
+                os.remove(caminho)
+                return None, True
+            with open(caminho, 'r') as f:
+                resultado = json.load(f)
+            os.utime(caminho)
+            return resultado, False
+        except (OSError, ValueError):
+            return None, False
+
+    def guardar(self, chave: str, resultado: Dict[str, Any]) -> int:
+        # Escrita atômica: outro worker nunca lê um arquivo pela metade
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(resultado, f)
+        os.replace(temporario, self._caminho(chave))
+
+        self._gravacoes += 1
+        if self._gravacoes % self.INTERVALO_LIMPEZA == 0:
+            return self._limpar()
+        return 0
+
+    def _limpar(self) -> int:
+        """Remove entradas expiradas e as menos usadas acima de `max_itens`"""
+        agora = time.time()
+        entradas = []
+        removidos = 0
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith('.json'):
+                continue
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                mtime = os.path.getmtime(caminho)
+                if agora - mtime > self.ttl:
+                    os.remove(caminho)
+                    removidos += 1
+                else:
+                    entradas.append((mtime, caminho))
+            except OSError:
+                continue
+
+        entradas.sort()
+        for _, caminho in entradas[:max(0, len(entradas) - self.max_itens)]:
+            try:
+                os.remove(caminho)
+                removidos += 1
+            except OSError:
+                pass
+        return removidos
+
+    def tamanho(self) -> int:
+        return sum(1 for nome in os.listdir(self.diretorio) if nome.endswith('.json'))
+
+
+class CachePredicoes:
+    """
+    Cache de predições endereçado pelo conteúdo da imagem
+
+    A chave combina o hash dos bytes enviados com a versão dos modelos e a
+    tabela de thresholds, então qualquer troca de modelo ou threshold invalida
+    as entradas antigas automaticamente.
+    """
+
+    def __init__(self, max_itens: int = 4096, ttl_segundos: float = 3600,
+                 backend: str = 'memoria', diretorio: Optional[str] = None):
+        if backend == 'disco':
+            diretorio = diretorio or ('/dev/shm/plant_cache' if os.path.isdir('/dev/shm') else
+                                      os.path.join(tempfile.gettempdir(), 'plant_cache'))
+            self._backend = _BackendDisco(max_itens, ttl_segundos, diretorio)
+        else:
+            self._backend = _BackendMemoria(max_itens, ttl_segundos)
+
+        self.backend = backend
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+
+    @staticmethod
+    def chave(img_bytes: bytes, versao_modelos: str, thresholds: Dict[str, float],
+              configuracao: Optional[Dict[str, Any]] = None) -> str:
+        """Calcula a chave da imagem para a versão atual dos modelos, thresholds e configuração do pipeline"""
+        h = hashlib.blake2b(digest_size=20)
+        h.update(img_bytes)
+        h.update(versao_modelos.encode('utf-8'))
+        h.update(json.dumps(thresholds, sort_keys=True).encode('utf-8'))
+        if configuracao:
+            h.update(json.dumps(configuracao, sort_keys=True).encode('utf-8'))
+        return h.hexdigest()
+
+    def obter(self, chave: str) -> Optional[Dict[str, Any]]:
+        """Retorna uma cópia do resultado em cache, ou None"""
+        resultado, expirado = self._backend.obter(chave)
+        if expirado:
+            self.remocoes += 1
+        if resultado is None:
+            self.falhas += 1
+            return None
+        self.acertos += 1
+        return dict(resultado)
+
+    def guardar(self, chave: str, resultado: Dict[str, Any]):
+        """Guarda o resultado de uma predição"""
+        self.remocoes += self._backend.guardar(chave, resultado)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Contadores de acertos, falhas e remoções para o endpoint de status"""
+        total = self.acertos + self.falhas
+        return {
+            'ativo': True,
+            'backend': self.backend,
+            'itens': self._backend.tamanho(),
+            'max_itens': self._backend.max_itens,
+            'ttl_segundos': self._backend.ttl,
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'remocoes': self.remocoes,
+            'taxa_acerto': self.acertos / total if total else 0.0
+        }
@@ -0,0 +1,261 @@
+"""
+Classificação offline em massa com o pipeline hierárquico (Espécie → Saúde)
+
+Percorre uma árvore de diretórios no formato do PlantVillage (ou lê um CSV de
+caminhos, como `datasets_processados/dataset_especies.csv`), decodifica as
+imagens em um pool de processos com prefetch e executa o pipeline em lotes
+grandes, com os mesmos modelos, backend e thresholds da API (o arquivo
+THRESHOLDS_ARQUIVO publicado por `otimizar_thresholds.py`, lido no início), mas
+sem o aquecimento dos modelos da API. Os resultados
+são gravados a cada lote; rodar novamente com a mesma saída retoma de onde
+parou.
+
+Uso:
+    python classificar_em_lote.py --diretorio PlantVillage --saida resultados/plantvillage.csv
+    python classificar_em_lote.py --csv datasets_processados/dataset_especies.csv --split test \\
+        --saida resultados/teste.parquet --tamanho-lote 128
+"""
+import argparse
+import csv
+import glob
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from preprocessamento import MODOS, carregar_rgb, normalizar_lote
+from processamento_lotes import EXTENSOES_IMAGEM, dividir_em_lotes
+
+COLUNAS_RESULTADO = [
+    'caminho', 'especie', 'confianca_especie', 'saude', 'confianca_saude', 'classificacao',
+    'confianca', 'probabilidade_bruta', 'threshold', 'erro'
+]
+
+# Colunas do CSV de entrada copiadas para a saída (rótulos, para avaliação)
+COLUNAS_ROTULOS = ('especie', 'classe', 'split')
+
+
+def listar_diretorio(diretorio: str) -> List[Dict[str, Any]]:
+    """Todas as imagens de uma árvore de diretórios, em ordem estável"""
+    entradas = []
+    for raiz, subdiretorios, arquivos in os.walk(diretorio):
+        subdiretorios.sort()
+        for arquivo in sorted(arquivos):
+            if arquivo.lower().endswith(EXTENSOES_IMAGEM):
+                entradas.append({'caminho': os.path.join(raiz, arquivo),
+                                 'rotulo_pasta': os.path.basename(raiz)})
+    return entradas
+
+
+def listar_csv(caminho_csv: str, coluna: str = 'caminho', split: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Caminhos (e rótulos, se houver) de um CSV no formato dos datasets processados"""
+    import pandas as pd
+
+    df = pd.read_csv(caminho_csv)
+    if split is not None:
+        df = df[df['split'] == split]
+    colunas = [coluna] + [c for c in COLUNAS_ROTULOS if c in df.columns and c != coluna]
+    entradas = []
+    for registro in df[colunas].to_dict('records'):
+        entrada = {'caminho': registro.pop(coluna)}
+        entrada.update({f'rotulo_{nome}': valor for nome, valor in registro.items()})
+        entradas.append(entrada)
+    return entradas
+
+
+class EscritorCSV:
+    """Saída CSV com acréscimo a cada lote (retomável)"""
+
+    def __init__(self, caminho: str, colunas: Sequence[str]):
+        self.caminho = caminho
+        self.colunas = list(colunas)
+
+    def processados(self) -> Set[str]:
+        if not os.path.exists(self.caminho):
+            return set()
+        with open(self.caminho, newline='', encoding='utf-8') as f:
+            return {linha['caminho'] for linha in csv.DictReader(f)}
+
+    def escrever(self, linhas: List[Dict[str, Any]]):
+        novo = not os.path.exists(self.caminho) or os.path.getsize(self.caminho) == 0
+        with open(self.caminho, 'a', newline='', encoding='utf-8') as f:
+            escritor = csv.DictWriter(f, fieldnames=self.colunas, extrasaction='ignore')
+            if novo:
+                escritor.writeheader()
+            escritor.writerows(linhas)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class EscritorParquet:
+    """
+    Saída Parquet em partes (`<saida>/parte-NNNNNN.parquet`), uma por gravação
+
+    Um arquivo Parquet não aceita acréscimos; gravar cada lote em uma parte
+    mantém a retomada simples e a saída legível com `pd.read_parquet(<saida>)`.
+    """
+
+    def __init__(self, caminho: str, colunas: Sequence[str]):
+        self.caminho = caminho
+        self.colunas = list(colunas)
+        os.makedirs(caminho, exist_ok=True)
+        self._proxima = len(glob.glob(os.path.join(caminho, 'parte-*.parquet')))
+
+    def processados(self) -> Set[str]:
+        import pandas as pd
+
+        processados = set()
+        for parte in sorted(glob.glob(os.path.join(self.caminho, 'parte-*.parquet'))):
+            processados.update(pd.read_parquet(parte, columns=['caminho'])['caminho'])
+        return processados
+
+    def escrever(self, linhas: List[Dict[str, Any]]):
+        import pandas as pd
+
+        destino = os.path.join(self.caminho, f'parte-{self._proxima:06d}.parquet')
+        temporario = destino + '.tmp'
+        pd.DataFrame(linhas, columns=self.colunas).to_parquet(temporario, index=False)
+        os.replace(temporario, destino)
+        self._proxima += 1
+
+
+def _decodificar_lote(caminhos: Sequence[str], modo: str) -> List[Tuple[Optional[np.ndarray], Optional[str]]]:
+    """Decodifica um lote de arquivos para uint8 (executado no pool de processos)"""
+    saidas = []
+    for caminho in caminhos:
+        try:
+            with open(caminho, 'rb') as f:
+                saidas.append((carregar_rgb(f, (224, 224), modo), None))
+        except Exception as e:
+            saidas.append((None, f"Erro ao processar imagem: {e}"))
+    return saidas
+
+
+def decodificar_com_prefetch(pool: ProcessPoolExecutor, lotes: Sequence[Sequence[Dict[str, Any]]],
+                             modo: str, prefetch: int, workers: int) -> Iterator[Tuple[Sequence, list]]:
+    """
+    Decodifica os lotes no pool mantendo `prefetch` lotes adiantados
+
+    Cada lote é dividido entre os workers; os lotes são entregues na ordem
+    de entrada.
+    """
+    pendentes: deque = deque()
+    proximo = 0
+
+    def agendar(lote):
+        caminhos = [entrada['caminho'] for entrada in lote]
+        partes = max(1, min(workers, len(caminhos)))
+        tamanho = -(-len(caminhos) // partes)
+        return [pool.submit(_decodificar_lote, parte, modo) for parte in dividir_em_lotes(caminhos, tamanho)]
+
+    while proximo < len(lotes) or pendentes:
+        while proximo < len(lotes) and len(pendentes) <= prefetch:
+            pendentes.append((lotes[proximo], agendar(lotes[proximo])))
+            proximo += 1
+        lote, futuros = pendentes.popleft()
+        decodificados = []
+        for futuro in futuros:
+            decodificados.extend(futuro.result())
+        yield lote, decodificados
+
+
+def classificar(api, lote: Sequence[Dict[str, Any]], decodificados: list, modo: str) -> List[Dict[str, Any]]:
+    """Executa o pipeline hierárquico em um lote decodificado e monta as linhas de saída"""
+    linhas = [dict(entrada) for entrada in lote]
+    validos = [i for i, (imagem, _) in enumerate(decodificados) if imagem is not None]
+    for i, (_, erro) in enumerate(decodificados):
+        linhas[i]['erro'] = erro
+
+    if validos:
+        img_batch = normalizar_lote([decodificados[i][0] for i in validos], modo)
+        try:
+            resultados = api.pipeline_hierarquico_lote(img_batch)
+        except Exception as e:
+            for i in validos:
+                linhas[i]['erro'] = f"Erro no pipeline: {getattr(e, 'detail', e)}"
+            return linhas
+
+        for i, resultado in zip(validos, resultados):
+            linhas[i].update(api.formatar_resultado(resultado, 'compacto'))
+            linhas[i]['probabilidade_bruta'] = resultado['debug_info'].get('probabilidade_bruta')
+            linhas[i]['threshold'] = resultado['debug_info'].get('threshold_usado')
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classificação offline em massa com o pipeline hierárquico")
+    entrada = parser.add_mutually_exclusive_group(required=True)
+    entrada.add_argument('--diretorio', help="Árvore de diretórios com imagens (formato PlantVillage)")
+    entrada.add_argument('--csv', help="CSV com os caminhos das imagens")
+    parser.add_argument('--coluna', default='caminho', help="Coluna de caminhos do CSV")
+    parser.add_argument('--split', default=None, help="Filtra o CSV por split (train/val/test)")
+    parser.add_argument('--saida', required=True, help="Arquivo .csv ou diretório .parquet de resultados")
+    parser.add_argument('--tamanho-lote', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processos de decodificação")
+    parser.add_argument('--prefetch', type=int, default=2, help="Lotes decodificados à frente da inferência")
+    parser.add_argument('--modo', choices=MODOS, default=os.getenv('PREPROCESSAMENTO_MODO', 'exato'))
+    parser.add_argument('--recomecar', action='store_true', help="Ignora resultados existentes em --saida")
+    args = parser.parse_args()
+
+    if args.diretorio:
+        entradas = listar_diretorio(args.diretorio)
+        colunas = COLUNAS_RESULTADO + ['rotulo_pasta']
+    else:
+        entradas = listar_csv(args.csv, args.coluna, args.split)
+        colunas = COLUNAS_RESULTADO + sorted({k for e in entradas for k in e if k.startswith('rotulo_')})
+
+    if args.recomecar and os.path.exists(args.saida):
+        if os.path.isdir(args.saida):
+            for parte in glob.glob(os.path.join(args.saida, 'parte-*.parquet')):
+                os.remove(parte)
+        else:
+            os.remove(args.saida)
+
+    os.makedirs(os.path.dirname(args.saida.rstrip('/')) or '.', exist_ok=True)
+    if args.saida.rstrip('/').endswith('.parquet'):
+        escritor = EscritorParquet(args.saida, colunas)
+    else:
+        escritor = EscritorCSV(args.saida, colunas)
+
+    processados = escritor.processados()
+    pendentes = [e for e in entradas if e['caminho'] not in processados]
+    print(f"📂 {len(entradas)} imagens; {len(processados)} já processadas; {len(pendentes)} pendentes")
+    if not pendentes:
+        return
+
+    import api
+
+    # O aquecimento só serve para a latência das primeiras requisições da API;
+    # aqui ele custaria uma passada sintética por modelo e tamanho de lote
+    api.AQUECIMENTO_ATIVO = False
+    api.carregar_thresholds()
+    print(f"🔬 Thresholds ({api.versao_thresholds}): {api.thresholds_cientificos}")
+    api.carregar_modelos()
+
+    lotes = list(dividir_em_lotes(pendentes, args.tamanho_lote))
+    inicio = time.perf_counter()
+    concluidas = falhas = 0
+
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=contexto) as pool:
+        for n, (lote, decodificados) in enumerate(
+                decodificar_com_prefetch(pool, lotes, args.modo, args.prefetch, args.workers), 1):
+            linhas = classificar(api, lote, decodificados, args.modo)
+            escritor.escrever(linhas)
+
+            concluidas += len(linhas)
+            falhas += sum(1 for linha in linhas if linha.get('erro'))
+            if n % 10 == 0 or n == len(lotes):
+                decorrido = time.perf_counter() - inicio
+                print(f"   {concluidas}/{len(pendentes)} imagens ({concluidas / decorrido:.1f} img/s, "
+                      f"{falhas} falhas)")
+
+    print(f"✅ Resultados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+"""
+Armazém de embeddings do backbone ResNet50 para retreino rápido de cabeças
+
+Calcula uma única vez, por imagem dos datasets processados, o embedding do
+backbone (saída de bloco da ResNet50 do modelo de espécies + GlobalAveragePooling)
+e o persiste com os rótulos de espécie/saúde. Cabeças de especialistas podem
+então ser retreinadas e reavaliadas em segundos na CPU, sem passar as imagens
+pela ResNet50 de novo.
+
+O modelo de espécies passou por fine-tuning: os blocos finais já estão
+especializados em separar espécies e descartam parte do sinal de doença. Por
+padrão o corte é o mesmo de `backbone_compartilhado` — o bloco mais profundo
+com pesos idênticos entre o modelo de espécies e os especialistas, ou seja,
+anterior ao fine-tuning. Sem especialistas para comparar (ou sem blocos em
+comum), usa o bloco mais profundo e registra isso em `metadados.json`
+(`backbone_compartilhado: false`): cabeças treinadas sobre esses embeddings
+herdam o viés do classificador de espécies.
+
+Os embeddings ficam vinculados à impressão digital (SHA-256) dos pesos do
+backbone: se os pesos mudam, o armazém é descartado na próxima geração. Uma
+imagem alterada no disco (tamanho ou mtime) também é recalculada.
+
+Uso:
+    python embeddings_backbone.py gerar
+    python embeddings_backbone.py gerar --csv datasets_processados/dataset_tomato.csv
+    python embeddings_backbone.py treinar --csv datasets_processados/dataset_tomato.csv --epocas 30
+"""
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backends_inferencia import CAMINHO_MODELO_ESPECIES, ESPECIES_ESPECIALISTAS, caminho_especialista
+from processamento_lotes import dividir_em_lotes
+
+DIRETORIO_EMBEDDINGS = 'datasets_processados/embeddings'
+COLUNAS_INDICE = ['caminho', 'tamanho', 'mtime_ns', 'parte', 'posicao', 'especie', 'classe']
+
+
+def corte_pre_fine_tuning(modelo_especies, caminhos_especialistas: Sequence[str]) -> Optional[str]:
+    """
+    Bloco mais profundo com pesos iguais entre o modelo de espécies e todos os especialistas
+
+    Returns:
+        str: Nome da camada, ou None se não há especialistas ou blocos em comum
+    """
+    from tensorflow.keras.models import load_model
+
+    from backbone_compartilhado import CORTES_RESNET50, encontrar_corte_comum
+
+    cortes = []
+    for caminho in caminhos_especialistas:
+        if os.path.exists(caminho):
+            cortes.append(encontrar_corte_comum(modelo_especies, load_model(caminho)))
+    if not cortes or None in cortes:
+        return None
+    return min(cortes, key=CORTES_RESNET50.index)
+
+
+def criar_extrator(caminho_modelo: str = CAMINHO_MODELO_ESPECIES, camada: Optional[str] = None,
+                   caminhos_especialistas: Optional[Sequence[str]] = None):
+    """
+    Submodelo imagem → embedding (GlobalAveragePooling da saída de `camada`)
+
+    Sem `camada`, usa o corte anterior ao fine-tuning (`corte_pre_fine_tuning`,
+    com os especialistas servidos por padrão) e, na falta dele, a saída de
+    bloco mais profunda da ResNet50 presente no modelo. `camada` deve ser uma
+    saída de bloco (ver `backbone_compartilhado.CORTES_RESNET50`).
+
+    Returns:
+        tuple: (extrator, nome da camada, se a camada é compartilhada com os especialistas)
+    """
+    from tensorflow.keras.layers import GlobalAveragePooling2D
+    from tensorflow.keras.models import Model, load_model
+
+    from backbone_compartilhado import CORTES_RESNET50
+
+    modelo = load_model(caminho_modelo)
+    if caminhos_especialistas is None:
+        caminhos_especialistas = [caminho_especialista(e) for e in ESPECIES_ESPECIALISTAS]
+    corte = corte_pre_fine_tuning(modelo, caminhos_especialistas)
+    if camada is None:
+        camada = corte
+    compartilhado = (camada is not None and corte is not None
+                     and CORTES_RESNET50.index(camada) <= CORTES_RESNET50.index(corte))
+    if camada is None:
+        nomes = {c.name for c in modelo.layers}
+        camada = next(c for c in reversed(CORTES_RESNET50) if c in nomes)
+        print(f"⚠️ Nenhum bloco compartilhado com os especialistas: usando {camada}, "
+              f"já ajustado para classificar espécies")
+    saida = GlobalAveragePooling2D(name='embedding')(modelo.get_layer(camada).output)
+    return Model(inputs=modelo.input, outputs=saida), camada, compartilhado
+
+
+def impressao_pesos(modelo) -> str:
+    """SHA-256 de todos os pesos de um modelo (muda com qualquer retreino ou fine-tuning)"""
+    h = hashlib.sha256()
+    for peso in modelo.weights:
+        valor = np.ascontiguousarray(peso.numpy())
+        h.update(peso.name.encode('utf-8'))
+        h.update(str(valor.shape).encode('utf-8'))
+        h.update(valor.tobytes())
+    return h.hexdigest()
+
+
+def _assinatura_arquivo(caminho: str) -> Tuple[int, int]:
+    """(tamanho, mtime_ns) de um arquivo, para detectar imagens alteradas"""
+    info = os.stat(caminho)
+    return info.st_size, info.st_mtime_ns
+
+
+class ArmazemEmbeddings:
+    """
+    Embeddings persistidos em partes `.npy` + um índice por caminho de imagem
+
+    Cada gravação cria uma nova parte (retomável: o que já foi gravado não é
+    recalculado). `metadados.json` guarda a impressão dos pesos do backbone
+    que gerou as partes, o modelo e a camada de corte.
+    """
+
+    def __init__(self, diretorio: str = DIRETORIO_EMBEDDINGS):
+        import pandas as pd
+
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+        self._caminho_meta = os.path.join(diretorio, 'metadados.json')
+        self._caminho_indice = os.path.join(diretorio, 'indice.csv')
+
+        self.meta: Dict[str, Any] = {}
+        if os.path.exists(self._caminho_meta):
+            with open(self._caminho_meta) as f:
+                self.meta = json.load(f)
+        if os.path.exists(self._caminho_indice):
+            self.indice = pd.read_csv(self._caminho_indice)
+        else:
+            self.indice = pd.DataFrame(columns=COLUNAS_INDICE)
+        self._partes: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.indice)
+
+    def _salvar(self):
+        temporario = self._caminho_indice + '.tmp'
+        self.indice.to_csv(temporario, index=False)
+        os.replace(temporario, self._caminho_indice)
+        with open(self._caminho_meta + '.tmp', 'w') as f:
+            json.dump(self.meta, f, indent=2, ensure_ascii=False)
+        os.replace(self._caminho_meta + '.tmp', self._caminho_meta)
+
+    def validar_backbone(self, impressao: str, descricao: Dict[str, Any]) -> int:
+        """
+        Descarta todos os embeddings se foram gerados com outros pesos
+
+        Returns:
+            int: Quantidade de embeddings invalidados
+        """
+        if self.meta.get('impressao_backbone') == impressao:
+            return 0
+        invalidados = len(self.indice)
+        for parte in glob.glob(os.path.join(self.diretorio, 'parte-*.npy')):
+            os.remove(parte)
+        self.indice = self.indice.iloc[0:0]
+        self._partes.clear()
+        self.meta = dict(descricao, impressao_backbone=impressao, proxima_parte=0)
+        self._salvar()
+        return invalidados
+
+    def pendentes(self, caminhos: Sequence[str]) -> List[str]:
+        """Caminhos sem embedding ou cujo arquivo mudou desde o cálculo"""
+        registrados = {
+            linha.caminho: (int(linha.tamanho), int(linha.mtime_ns))
+            for linha in self.indice[['caminho', 'tamanho', 'mtime_ns']].itertuples(index=False)
+        }
+        pendentes = []
+        for caminho in caminhos:
+            try:
+                assinatura = _assinatura_arquivo(caminho)
+            except OSError:
+                assinatura = None
+            if registrados.get(caminho) != assinatura:
+                pendentes.append(caminho)
+        return pendentes
+
+    def adicionar(self, caminhos: Sequence[str], embeddings: np.ndarray, rotulos: Dict[str, Dict[str, Any]]):
+        """Grava uma nova parte e atualiza o índice (substituindo entradas antigas dos mesmos caminhos)"""
+        import pandas as pd
+
+        parte = self.meta.get('proxima_parte', 0)
+        destino = os.path.join(self.diretorio, f'parte-{parte:06d}.npy')
+        np.save(destino + '.tmp.npy', np.asarray(embeddings, dtype=np.float32))
+        os.replace(destino + '.tmp.npy', destino)
+
+        linhas = []
+        for posicao, caminho in enumerate(caminhos):
+            tamanho, mtime_ns = _assinatura_arquivo(caminho)
+            linhas.append({'caminho': caminho, 'tamanho': tamanho, 'mtime_ns': mtime_ns, 'parte': parte,
+                           'posicao': posicao, **rotulos.get(caminho, {})})
+        novos = pd.DataFrame(linhas, columns=COLUNAS_INDICE)
+        self.indice = pd.concat([self.indice[~self.indice['caminho'].isin(set(caminhos))], novos],
+                                ignore_index=True)
+        self.meta['proxima_parte'] = parte + 1
+        self.meta['dimensao'] = int(embeddings.shape[1])
+        self._salvar()
+
+    def _parte(self, parte: int) -> np.ndarray:
+        if parte not in self._partes:
+            self._partes[parte] = np.load(os.path.join(self.diretorio, f'parte-{parte:06d}.npy'), mmap_mode='r')
+        return self._partes[parte]
+
+    def obter(self, caminhos: Sequence[str]) -> np.ndarray:
+        """
+        Embeddings (N, dimensão) na ordem de `caminhos`
+
+        Raises:
+            KeyError: Se algum caminho não tem embedding no armazém
+        """
+        localizacao = self.indice.set_index('caminho')[['parte', 'posicao']]
+        faltando = [c for c in caminhos if c not in localizacao.index]
+        if faltando:
+            raise KeyError(f"{len(faltando)} imagens sem embedding (ex.: {faltando[0]}); "
+                           f"execute `python embeddings_backbone.py gerar`")
+
+        saida = np.empty((len(caminhos), self.meta['dimensao']), dtype=np.float32)
+        selecao = localizacao.loc[list(caminhos)]
+        for parte, grupo in selecao.assign(_linha=np.arange(len(caminhos))).groupby('parte'):
+            saida[grupo['_linha'].values] = self._parte(int(parte))[grupo['posicao'].values]
+        return saida
+
+
+def _rotulos_csv(caminho_csv: str) -> Dict[str, Dict[str, Any]]:
+    """Rótulos de espécie/saúde de cada imagem de um CSV de dataset processado"""
+    import pandas as pd
+
+    df = pd.read_csv(caminho_csv)
+    # CSVs de especialista (dataset_<especie>.csv) têm só a classe de saúde
+    especie_arquivo = os.path.splitext(os.path.basename(caminho_csv))[0].replace('dataset_', '')
+    rotulos = {}
+    for registro in df.to_dict('records'):
+        rotulos[registro['caminho']] = {
+            'especie': registro.get('especie', especie_arquivo if 'classe' in registro else None),
+            'classe': registro.get('classe')
+        }
+    return rotulos
+
+
+def gerar_embeddings(csvs: Sequence[str], armazem: ArmazemEmbeddings, caminho_modelo: str = CAMINHO_MODELO_ESPECIES,
+                     camada: Optional[str] = None, tamanho_lote: int = 64, lotes_por_parte: int = 20,
+                     workers: int = 1, prefetch: int = 2) -> Dict[str, int]:
+    """
+    Calcula os embeddings que faltam para as imagens dos CSVs
+
+    Returns:
+        dict: Contagens de imagens invalidadas, calculadas e com falha
+    """
+    from classificar_em_lote import decodificar_com_prefetch
+    from preprocessamento import normalizar_lote
+
+    extrator, camada, compartilhado = criar_extrator(caminho_modelo, camada)
+    invalidados = armazem.validar_backbone(impressao_pesos(extrator), {
+        'modelo': caminho_modelo, 'camada': camada, 'backbone_compartilhado': compartilhado,
+        'preprocessamento': 'exato'
+    })
+    print(f"🧠 Backbone: {caminho_modelo} até {camada}"
+          + (" (anterior ao fine-tuning)" if compartilhado else ""))
+
+    rotulos: Dict[str, Dict[str, Any]] = {}
+    for caminho_csv in csvs:
+        for caminho, rotulo in _rotulos_csv(caminho_csv).items():
+            atual = rotulos.setdefault(caminho, {})
+            atual.update({k: v for k, v in rotulo.items() if v is not None})
+
+    pendentes = armazem.pendentes(list(rotulos))
+    print(f"📂 {len(rotulos)} imagens; {len(pendentes)} sem embedding atualizado"
+          + (f" ({invalidados} invalidados por mudança de pesos)" if invalidados else ""))
+
+    calculados = falhas = 0
+    acumulados_caminhos: List[str] = []
+    acumulados: List[np.ndarray] = []
+
+    def gravar():
+        nonlocal acumulados_caminhos, acumulados
+        if acumulados_caminhos:
+            armazem.adicionar(acumulados_caminhos, np.concatenate(acumulados), rotulos)
+            acumulados_caminhos, acumulados = [], []
+
+    lotes = list(dividir_em_lotes([{'caminho': c} for c in pendentes], tamanho_lote))
+    inicio = time.perf_counter()
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto) as pool:
+        for n, (lote, decodificados) in enumerate(
+                decodificar_com_prefetch(pool, lotes, 'exato', prefetch, workers), 1):
+            validos = [i for i, (imagem, _) in enumerate(decodificados) if imagem is not None]
+            falhas += len(lote) - len(validos)
+            if validos:
+                img_batch = normalizar_lote([decodificados[i][0] for i in validos])
+                acumulados.append(extrator.predict(img_batch, verbose=0))
+                acumulados_caminhos.extend(lote[i]['caminho'] for i in validos)
+                calculados += len(validos)
+            if n % lotes_por_parte == 0:
+                gravar()
+                print(f"   {calculados}/{len(pendentes)} embeddings "
+                      f"({calculados / (time.perf_counter() - inicio):.1f} img/s)")
+    gravar()
+    return {'invalidados': invalidados, 'calculados': calculados, 'falhas': falhas}
+
+
+def carregar_embeddings_dataset(caminho_csv: str, armazem: ArmazemEmbeddings,
+                                coluna_rotulo: Optional[str] = None) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Splits de um CSV de dataset processado com embeddings no lugar dos caminhos
+
+    Mesma estrutura de `utils.carregar_dataset_especies` ('X' são os embeddings).
+    """
+    import pandas as pd
+
+    df = pd.read_csv(caminho_csv)
+    coluna_rotulo = coluna_rotulo or ('especie' if 'especie' in df.columns else 'classe')
+    dataset = {}
+    for split in ('train', 'val', 'test'):
+        dados = df[df['split'] == split]
+        dataset[split] = {
+            'X': armazem.obter(dados['caminho'].tolist()),
+            'y': dados[coluna_rotulo].values,
+            'caminhos': dados['caminho'].values
+        }
+    return dataset
+
+
+def treinar_cabeca(dataset: Dict[str, Dict[str, np.ndarray]], epocas: int = 30, tamanho_lote: int = 256,
+                   taxa_aprendizado: float = 1e-3, dropout: float = 0.3, unidades: int = 256):
+    """
+    Treina uma cabeça densa sobre os embeddings
+
+    Duas classes → saída sigmoide com a probabilidade da segunda classe em
+    ordem alfabética ('unhealthy' nos especialistas, como nos modelos
+    servidos); mais classes → softmax. Usa class weights balanceados.
+
+    Returns:
+        tuple: (modelo, classes, métricas no split de teste)
+    """
+    import tensorflow as tf
+    from sklearn.metrics import accuracy_score, f1_score
+    from sklearn.utils.class_weight import compute_class_weight
+
+    classes = sorted(np.unique(dataset['train']['y']))
+    indices = {classe: i for i, classe in enumerate(classes)}
+    binario = len(classes) == 2
+
+    def alvos(split):
+        return np.array([indices[c] for c in dataset[split]['y']], dtype=np.int32)
+
+    y_train, y_val, y_test = alvos('train'), alvos('val'), alvos('test')
+    pesos = compute_class_weight('balanced', classes=np.arange(len(classes)), y=y_train)
+
+    modelo = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(dataset['train']['X'].shape[1],)),
+        tf.keras.layers.Dropout(dropout),
+        tf.keras.layers.Dense(unidades, activation='relu'),
+        tf.keras.layers.Dropout(dropout),
+        tf.keras.layers.Dense(1, activation='sigmoid') if binario else tf.keras.layers.Dense(len(classes), activation='softmax')
+    ])
+    modelo.compile(optimizer=tf.keras.optimizers.Adam(taxa_aprendizado),
+                   loss='binary_crossentropy' if binario else 'sparse_categorical_crossentropy',
+                   metrics=['accuracy'])
+    modelo.fit(dataset['train']['X'], y_train, validation_data=(dataset['val']['X'], y_val),
+               epochs=epocas, batch_size=tamanho_lote, class_weight=dict(enumerate(pesos)), verbose=0,
+               callbacks=[tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=5,
+                                                           restore_best_weights=True)])
+
+    probabilidades = modelo.predict(dataset['test']['X'], batch_size=tamanho_lote, verbose=0)
+    preditos = (probabilidades[:, 0] > 0.5).astype(int) if binario else probabilidades.argmax(axis=1)
+    metricas = {
+        'accuracy': float(accuracy_score(y_test, preditos)),
+        'f1': float(f1_score(y_test, preditos, average='binary' if binario else 'macro'))
+    }
+    return modelo, classes, metricas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Armazém de embeddings do backbone para retreino rápido")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    gerar = subcomandos.add_parser('gerar', help="Calcula os embeddings que faltam")
+    gerar.add_argument('--csv', nargs='*', default=None,
+                       help="CSVs de dataset (padrão: datasets_processados/dataset_*.csv)")
+    gerar.add_argument('--modelo', default=CAMINHO_MODELO_ESPECIES, help="Modelo de onde vem o backbone")
+    gerar.add_argument('--camada', default=None, help="Saída de bloco da ResNet50 (padrão: a mais profunda compartilhada com os especialistas)")
+    gerar.add_argument('--tamanho-lote', type=int, default=64)
+    gerar.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processos de decodificação")
+
+    treinar = subcomandos.add_parser('treinar', help="Treina e avalia uma cabeça sobre os embeddings")
+    treinar.add_argument('--csv', required=True, help="CSV do dataset (ex.: datasets_processados/dataset_tomato.csv)")
+    treinar.add_argument('--epocas', type=int, default=30)
+    treinar.add_argument('--salvar', default=None, help="Caminho .h5 para salvar a cabeça treinada")
+
+    for sub in (gerar, treinar):
+        sub.add_argument('--diretorio', default=DIRETORIO_EMBEDDINGS)
+    args = parser.parse_args()
+
+    armazem = ArmazemEmbeddings(args.diretorio)
+    if args.comando == 'gerar':
+        csvs = args.csv or sorted(glob.glob('datasets_processados/dataset_*.csv'))
+        contagens = gerar_embeddings(csvs, armazem, args.modelo, args.camada, args.tamanho_lote,
+                                     workers=args.workers)
+        print(f"✅ {contagens['calculados']} embeddings calculados, {contagens['falhas']} falhas; "
+              f"{len(armazem)} no armazém ({args.diretorio})")
+        return
+
+    inicio = time.perf_counter()
+    dataset = carregar_embeddings_dataset(args.csv, armazem)
+    modelo, classes, metricas = treinar_cabeca(dataset, epocas=args.epocas)
+    print(f"✅ Cabeça {classes} treinada em {time.perf_counter() - inicio:.1f}s: "
+          f"accuracy={metricas['accuracy']:.4f} f1={metricas['f1']:.4f} (teste)")
+    if args.salvar:
+        modelo.save(args.salvar)
+        print(f"💾 Cabeça salva em {args.salvar}")
+
+
+if __name__ == "__main__":
+    main()
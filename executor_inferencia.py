@@ -0,0 +1,123 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict
+
+
+class PoolSaturado(Exception):
+    """Levantada quando o limite de requisições pendentes foi atingido"""
+
+
+class _PoolMonitorado(Executor):
+    """Envolve um executor contando as tarefas submetidas e ainda não concluídas"""
+
+    def __init__(self, executor: Executor, workers: int):
+        self.executor = executor
+        self.workers = workers
+        self.pendentes = 0
+        self._lock = threading.Lock()
+
+    def _concluir(self, _futuro):
+        with self._lock:
+            self.pendentes -= 1
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._lock:
+            self.pendentes += 1
+        futuro = self.executor.submit(fn, *args, **kwargs)
+        futuro.add_done_callback(self._concluir)
+        return futuro
+
+    def estatisticas(self) -> Dict[str, int]:
+        pendentes = self.pendentes
+        em_execucao = min(pendentes, self.workers)
+        return {
+            'workers': self.workers,
+            'em_execucao': em_execucao,
+            'em_fila': pendentes - em_execucao
+        }
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+
+class ExecutorInferencia:
+    """
+    Executa decodificação e inferência fora do event loop do asyncio
+
+    - Inferência (TensorFlow) roda em um pool de threads
+    - Decodificação de imagens roda em um pool de processos (ou threads)
+    - Requisições acima de `limite_pendentes` são recusadas imediatamente
+    """
+
+    def __init__(self, threads_inferencia: int = 1, workers_decodificacao: int = 2,
+                 modo_decodificacao: str = 'processos', limite_pendentes: int = 64):
+        self.limite_pendentes = limite_pendentes
+        self.em_andamento = 0
+        self.total_recusadas = 0
+        self._lock_admissao = threading.Lock()
+
+        self.inferencia = _PoolMonitorado(
+            ThreadPoolExecutor(max_workers=threads_inferencia, thread_name_prefix='inferencia'),
+            threads_inferencia
+        )
+
+        if modo_decodificacao == 'processos':
+            # 'spawn' evita herdar o estado do TensorFlow via fork
+            pool_decodificacao = ProcessPoolExecutor(
+                max_workers=workers_decodificacao,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        else:
+            pool_decodificacao = ThreadPoolExecutor(
+                max_workers=workers_decodificacao, thread_name_prefix='decodificacao'
+            )
+        self.modo_decodificacao = modo_decodificacao
+        self.decodificacao = _PoolMonitorado(pool_decodificacao, workers_decodificacao)
+
+    def reservar(self):
+        """Reserva uma vaga para a requisição ou levanta `PoolSaturado`"""
+        with self._lock_admissao:
+            if self.em_andamento >= self.limite_pendentes:
+                self.total_recusadas += 1
+                raise PoolSaturado()
+            self.em_andamento += 1
+
+    def liberar(self):
+        """Libera a vaga reservada por `reservar` (pode ser chamado de outra thread)"""
+        with self._lock_admissao:
+            self.em_andamento -= 1
+
+    @asynccontextmanager
+    async def admitir(self):
+        """Mantém uma vaga reservada durante o bloco `async with`"""
+        self.reservar()
+        try:
+            yield
+        finally:
+            self.liberar()
+
+    async def decodificar(self, funcao: Callable, *args) -> Any:
+        """Executa uma função de decodificação no pool de decodificação"""
+        return await asyncio.wrap_future(self.decodificacao.submit(funcao, *args))
+
+    async def inferir(self, funcao: Callable, *args) -> Any:
+        """Executa uma função de inferência no pool de inferência"""
+        return await asyncio.wrap_future(self.inferencia.submit(funcao, *args))
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Retorna contagens de requisições em andamento e tarefas em fila"""
+        return {
+            'requisicoes_em_andamento': self.em_andamento,
+            'limite_pendentes': self.limite_pendentes,
+            'total_recusadas': self.total_recusadas,
+            'inferencia': self.inferencia.estatisticas(),
+            'decodificacao': dict(self.decodificacao.estatisticas(), modo=self.modo_decodificacao)
+        }
+
+    def encerrar(self):
+        """Finaliza os pools aguardando as tarefas em execução"""
+        self.inferencia.shutdown(wait=True)
+        self.decodificacao.shutdown(wait=True)
@@ -0,0 +1,144 @@
+"""
+Exporta os modelos servidos pela API para TFLite/ONNX e verifica a paridade
+
+Uso:
+    python exportar_modelos.py --formatos tflite onnx --amostras 64
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import load_model
+
+from backends_inferencia import (
+    BackendTFFunction, DIRETORIO_EXPORTADOS, caminho_exportado, carregar_backend, modelos_servidos
+)
+from preprocessamento import decodificar_imagem
+
+
+def exportar_tflite(modelo, caminho: str):
+    """Converte um modelo Keras para TFLite (float32)"""
+    conversor = tf.lite.TFLiteConverter.from_keras_model(modelo)
+    with open(caminho, 'wb') as f:
+        f.write(conversor.convert())
+
+
+def exportar_onnx(modelo, caminho: str, opset: int = 13):
+    """Converte um modelo Keras para ONNX"""
+    try:
+        import tf2onnx
+    except ImportError:
+        raise ImportError("Exportação ONNX requer o pacote tf2onnx (pip install tf2onnx)")
+
+    assinatura = (tf.TensorSpec((None,) + tuple(modelo.input_shape[1:]), tf.float32, name='input'),)
+    tf2onnx.convert.from_keras(modelo, input_signature=assinatura, opset=opset, output_path=caminho)
+
+
+EXPORTADORES = {
+    'tflite': exportar_tflite,
+    'onnx': exportar_onnx
+}
+
+
+def carregar_amostras(quantidade: int, caminho_csv: str = 'datasets_processados/dataset_especies.csv') -> np.ndarray:
+    """
+    Carrega imagens do split de teste para a verificação de paridade
+
+    Sem o CSV do dataset, usa entradas aleatórias no intervalo [0, 1].
+    """
+    if os.path.exists(caminho_csv):
+        from utils import carregar_dataset_especies
+
+        caminhos = carregar_dataset_especies(caminho_csv)['test']['X']
+        rng = np.random.default_rng(42)
+        caminhos = rng.choice(caminhos, size=min(quantidade, len(caminhos)), replace=False)
+        lote = []
+        for caminho in caminhos:
+            with open(caminho, 'rb') as f:
+                lote.append(decodificar_imagem(f.read()))
+        return np.concatenate(lote, axis=0)
+
+    print(f"⚠️ {caminho_csv} não encontrado: usando entradas aleatórias")
+    return np.random.default_rng(42).random((quantidade, 224, 224, 3), dtype=np.float32)
+
+
+def verificar_paridade(referencia, candidato, amostras: np.ndarray, tamanho_lote: int = 16) -> dict:
+    """
+    Compara as saídas de um backend com as do modelo Keras original
+
+    Returns:
+        dict: Diferença absoluta máxima, concordância da decisão (argmax para
+        o modelo de espécies, probabilidade > 0.5 para especialistas) e tempos
+    """
+    saidas_ref, saidas_cand = [], []
+    tempo_ref = tempo_cand = 0.0
+    for inicio in range(0, len(amostras), tamanho_lote):
+        lote = amostras[inicio:inicio + tamanho_lote]
+
+        t0 = time.perf_counter()
+        saidas_ref.append(referencia.predict(lote, verbose=0))
+        tempo_ref += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        saidas_cand.append(candidato.predict(lote, verbose=0))
+        tempo_cand += time.perf_counter() - t0
+
+    ref = np.concatenate(saidas_ref, axis=0)
+    cand = np.concatenate(saidas_cand, axis=0)
+
+    if ref.shape[1] > 1:
+        concordancia = np.mean(np.argmax(ref, axis=1) == np.argmax(cand, axis=1))
+    else:
+        concordancia = np.mean((ref[:, 0] > 0.5) == (cand[:, 0] > 0.5))
+
+    return {
+        'diferenca_maxima': float(np.max(np.abs(ref - cand))),
+        'concordancia_decisao': float(concordancia),
+        'tempo_keras_s': tempo_ref,
+        'tempo_backend_s': tempo_cand
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta os modelos da API para TFLite/ONNX")
+    parser.add_argument('--formatos', nargs='+', choices=list(EXPORTADORES), default=['tflite'])
+    parser.add_argument('--diretorio', default=DIRETORIO_EXPORTADOS)
+    parser.add_argument('--amostras', type=int, default=32, help="Imagens usadas na verificação de paridade")
+    parser.add_argument('--sem-paridade', action='store_true', help="Apenas exporta, sem comparar saídas")
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    os.makedirs(args.diretorio, exist_ok=True)
+    amostras = None if args.sem_paridade else carregar_amostras(args.amostras)
+
+    for nome, caminho_h5 in modelos_servidos().items():
+        if not os.path.exists(caminho_h5):
+            print(f"⚠️ {nome}: modelo não encontrado em {caminho_h5}")
+            continue
+
+        print(f"📂 {nome}: carregando {caminho_h5}")
+        modelo = load_model(caminho_h5)
+
+        for formato in args.formatos:
+            destino = caminho_exportado(nome, formato, args.diretorio)
+            EXPORTADORES[formato](modelo, destino)
+            print(f"✅ {nome} → {destino} ({os.path.getsize(destino) / 1e6:.1f} MB)")
+
+        if amostras is None:
+            continue
+
+        candidatos = {'tf_function': BackendTFFunction(modelo)}
+        for formato in args.formatos:
+            candidatos[formato] = carregar_backend(nome, caminho_h5, formato, args.threads, args.diretorio)
+
+        for backend, candidato in candidatos.items():
+            paridade = verificar_paridade(modelo, candidato, amostras)
+            print(f"   🔍 {backend}: dif. máx={paridade['diferenca_maxima']:.2e} "
+                  f"concordância={paridade['concordancia_decisao'] * 100:.1f}% "
+                  f"tempo={paridade['tempo_backend_s']:.2f}s (keras {paridade['tempo_keras_s']:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
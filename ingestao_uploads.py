@@ -0,0 +1,135 @@
+import io
+import json
+from typing import BinaryIO, Dict, Optional
+
+# Assinaturas (magic bytes) dos formatos de imagem aceitos
+ASSINATURAS_IMAGEM = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+)
+
+# Bytes do início do arquivo necessários para identificar o formato
+TAMANHO_CABECALHO = 12
+
+
+def detectar_formato_imagem(cabecalho) -> Optional[str]:
+    """Identifica o formato da imagem pelos primeiros bytes, sem decodificá-la"""
+    cabecalho = bytes(cabecalho[:TAMANHO_CABECALHO])
+    for assinatura, formato in ASSINATURAS_IMAGEM:
+        if cabecalho.startswith(assinatura):
+            return formato
+    if cabecalho[:4] == b'RIFF' and cabecalho[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def tamanho_arquivo(arquivo: BinaryIO) -> int:
+    """Tamanho de um arquivo já recebido, sem lê-lo"""
+    arquivo.seek(0, io.SEEK_END)
+    tamanho = arquivo.tell()
+    arquivo.seek(0)
+    return tamanho
+
+
+def conteudo_em_memoria(arquivo: BinaryIO) -> Optional[bytes]:
+    """
+    Conteúdo de um upload mantido em memória pelo parser multipart, sem cópia
+
+    `SpooledTemporaryFile` guarda uploads pequenos em um `BytesIO`, cujo
+    `getvalue()` devolve o próprio buffer. Retorna None se o upload já foi
+    escrito em disco.
+    """
+    interno = getattr(arquivo, '_file', arquivo)
+    if isinstance(interno, io.BytesIO):
+        return interno.getvalue()
+    return None
+
+
+def configurar_spool_multipart(tamanho_maximo: int):
+    """Tamanho até o qual o parser multipart do Starlette mantém cada arquivo em memória"""
+    try:
+        from starlette.formparsers import MultiPartParser
+    except ImportError:
+        return
+    if hasattr(MultiPartParser, 'spool_max_size'):
+        MultiPartParser.spool_max_size = tamanho_maximo
+
+
+class MiddlewareLimiteCorpo:
+    """
+    Middleware ASGI que limita o tamanho do corpo das requisições por rota
+
+    Um `Content-Length` inválido ou acima do limite é recusado antes de o
+    corpo ser lido. Sem `Content-Length` (chunked), o corpo é contado à
+    medida que chega e a requisição é interrompida assim que passa do limite,
+    sem terminar o upload nem o spool do multipart.
+    """
+
+    def __init__(self, app, limites: Dict[str, int]):
+        self.app = app
+        self.limites = limites
+
+    @staticmethod
+    async def _responder(send, status: int, detalhe: str):
+        corpo = json.dumps({'detail': detalhe}, ensure_ascii=False).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(corpo)).encode()),
+                        (b'connection', b'close')]
+        })
+        await send({'type': 'http.response.body', 'body': corpo})
+
+    async def __call__(self, scope, receive, send):
+        limite = self.limites.get(scope.get('path')) if scope['type'] == 'http' else None
+        if limite is None or scope['method'] != 'POST':
+            await self.app(scope, receive, send)
+            return
+
+        for nome, valor in scope.get('headers', ()):
+            if nome == b'content-length':
+                try:
+                    tamanho = int(valor)
+                    if tamanho < 0:
+                        raise ValueError
+                except ValueError:
+                    await self._responder(send, 400, "Content-Length inválido")
+                    return
+                if tamanho > limite:
+                    await self._responder(send, 413, f"Corpo da requisição acima do limite de {limite} bytes")
+                    return
+                break
+
+        recebidos = 0
+        excedeu = False
+        iniciada = False
+
+        async def receber():
+            nonlocal recebidos, excedeu
+            mensagem = await receive()
+            if mensagem['type'] == 'http.request':
+                recebidos += len(mensagem.get('body', b''))
+                if recebidos > limite:
+                    excedeu = True
+                    return {'type': 'http.disconnect'}
+            return mensagem
+
+        async def enviar(mensagem):
+            nonlocal iniciada
+            # Após exceder o limite, a resposta é a 413 deste middleware
+            if not excedeu:
+                iniciada = iniciada or mensagem['type'] == 'http.response.start'
+                await send(mensagem)
+
+        try:
+            await self.app(scope, receber, enviar)
+        except Exception:
+            if not excedeu:
+                raise
+        if excedeu and not iniciada:
+            await self._responder(send, 413, f"Corpo da requisição acima do limite de {limite} bytes")
@@ -0,0 +1,157 @@
+import contextvars
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+# ID da requisição em andamento (definido por `MiddlewareIdRequisicao`)
+id_requisicao: contextvars.ContextVar = contextvars.ContextVar('id_requisicao', default=None)
+
+FORMATOS = ('json', 'texto')
+
+
+class FormatadorJSON(logging.Formatter):
+    """Um objeto JSON por linha: campos fixos + `extra={'campos': {...}}` do chamador"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        evento = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage()
+        }
+        if getattr(record, 'id_requisicao', None):
+            evento['id_requisicao'] = record.id_requisicao
+        campos = getattr(record, 'campos', None)
+        if campos:
+            evento.update(campos)
+        if record.exc_text:
+            evento['excecao'] = record.exc_text
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+class FormatadorTexto(logging.Formatter):
+    """Formato legível para desenvolvimento, com os campos estruturados ao final"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        linha = f"{self.formatTime(record)} {record.levelname} {record.getMessage()}"
+        if getattr(record, 'id_requisicao', None):
+            linha += f" [{record.id_requisicao}]"
+        campos = getattr(record, 'campos', None)
+        if campos:
+            linha += ' ' + json.dumps(campos, ensure_ascii=False, default=str)
+        if record.exc_text:
+            linha += '\n' + record.exc_text
+        return linha
+
+
+class _HandlerFila(QueueHandler):
+    """
+    QueueHandler que não bloqueia o chamador
+
+    Com a fila cheia o registro é descartado (e contado) em vez de esperar o
+    listener, para que os logs nunca segurem uma requisição. O ID da
+    requisição é capturado aqui, no contexto de quem registrou o log.
+    """
+
+    def __init__(self, fila: queue.Queue):
+        super().__init__(fila)
+        self.descartados = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if not hasattr(record, 'id_requisicao'):
+            record.id_requisicao = id_requisicao.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+def configurar_logging(nome: str = 'plant_api', nivel: str = 'INFO', formato: str = 'json',
+                       fila_maxima: int = 10000) -> QueueListener:
+    """
+    Configura o logger `nome` para escrever em stdout a partir de uma thread separada
+
+    Returns:
+        QueueListener já iniciado (chamar `stop()` no encerramento para esvaziar a fila)
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de log inválido: {formato}. Opções: {FORMATOS}")
+
+    saida = logging.StreamHandler(sys.stdout)
+    saida.setFormatter(FormatadorJSON() if formato == 'json' else FormatadorTexto())
+
+    fila: queue.Queue = queue.Queue(maxsize=fila_maxima)
+    logger = logging.getLogger(nome)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(_HandlerFila(fila))
+    logger.setLevel(nivel.upper())
+    logger.propagate = False
+
+    ouvinte = QueueListener(fila, saida, respect_handler_level=True)
+    ouvinte.start()
+    return ouvinte
+
+
+def logs_descartados(nome: str = 'plant_api') -> int:
+    """Registros descartados por fila cheia desde a configuração"""
+    return sum(getattr(h, 'descartados', 0) for h in logging.getLogger(nome).handlers)
+
+
+def amostrar(taxa: float) -> bool:
+    """Decide se um evento amostrado deve ser registrado (taxa entre 0 e 1)"""
+    return taxa >= 1.0 or random.random() < taxa
+
+
+class MiddlewareIdRequisicao:
+    """
+    Middleware ASGI que associa um ID a cada requisição HTTP
+
+    Reaproveita o cabeçalho `X-Request-ID` do cliente (se presente) e o
+    devolve na resposta. Implementado direto sobre ASGI para não adicionar
+    o custo do `BaseHTTPMiddleware`.
+    """
+
+    def __init__(self, app, cabecalho: str = 'x-request-id'):
+        self.app = app
+        self.cabecalho = cabecalho.encode('latin-1')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        rid = None
+        for nome, valor in scope.get('headers', ()):
+            if nome == self.cabecalho:
+                rid = valor.decode('latin-1')[:128]
+                break
+        rid = rid or uuid.uuid4().hex
+
+        async def enviar(mensagem):
+            if mensagem['type'] == 'http.response.start':
+                mensagem['headers'] = list(mensagem.get('headers', ())) + [
+                    (self.cabecalho, rid.encode('latin-1'))
+                ]
+            await send(mensagem)
+
+        token = id_requisicao.set(rid)
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            id_requisicao.reset(token)
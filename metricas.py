@@ -0,0 +1,162 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Limites (segundos) dos histogramas de latência
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Limites (bytes) do histograma de tamanho de upload
+BUCKETS_BYTES = (16e3, 64e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6, 16e6)
+
+
+def _formatar_rotulos(nomes: Sequence[str], valores: Sequence[str], extra: str = '') -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _formatar_valor(valor: float) -> str:
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor))
+
+
+class _Metrica:
+    tipo = ''
+
+    def __init__(self, nome: str, descricao: str, rotulos: Sequence[str] = (), ativo: bool = True):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.ativo = ativo
+        self._valores: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _chave(self, rotulos: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(rotulos.get(nome, '')) for nome in self.rotulos)
+
+    def expor(self) -> List[str]:
+        linhas = [f'# HELP {self.nome} {self.descricao}', f'# TYPE {self.nome} {self.tipo}']
+        with self._lock:
+            itens = sorted(self._valores.items())
+            linhas.extend(self._linhas(itens))
+        return linhas
+
+
+class Contador(_Metrica):
+    """Contador monotônico com rótulos"""
+
+    tipo = 'counter'
+
+    def inc(self, valor: float = 1.0, **rotulos):
+        if not self.ativo:
+            return
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0.0) + valor
+
+    def valor(self, **rotulos) -> float:
+        return self._valores.get(self._chave(rotulos), 0.0)
+
+    def _linhas(self, itens):
+        for chave, valor in itens:
+            yield f'{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_valor(valor)}'
+
+
+class Histograma(_Metrica):
+    """Histograma com buckets fixos (contagens cumulativas apenas na exposição)"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome: str, descricao: str, rotulos: Sequence[str] = (),
+                 buckets: Sequence[float] = BUCKETS_LATENCIA, ativo: bool = True):
+        super().__init__(nome, descricao, rotulos, ativo)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor: float, **rotulos):
+        if not self.ativo:
+            return
+        chave = self._chave(rotulos)
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            estado = self._valores.get(chave)
+            if estado is None:
+                estado = self._valores[chave] = [[0] * (len(self.buckets) + 1), 0.0]
+            estado[0][indice] += 1
+            estado[1] += valor
+
+    def medir(self, **rotulos):
+        """Context manager que observa o tempo decorrido do bloco"""
+        if not self.ativo:
+            return nullcontext()
+        return self._medir(rotulos)
+
+    @contextmanager
+    def _medir(self, rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def _linhas(self, itens):
+        for chave, (contagens, soma) in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float('inf'),), contagens):
+                acumulado += contagem
+                le = f'le="{_formatar_valor(limite)}"'
+                yield f'{self.nome}_bucket{_formatar_rotulos(self.rotulos, chave, le)} {acumulado}'
+            rotulos = _formatar_rotulos(self.rotulos, chave)
+            yield f'{self.nome}_sum{rotulos} {_formatar_valor(soma)}'
+            yield f'{self.nome}_count{rotulos} {acumulado}'
+
+
+class Registro:
+    """
+    Conjunto de métricas exposto no formato texto do Prometheus
+
+    Com `ativo=False` todas as métricas criadas pelo registro ignoram as
+    observações, de modo que a instrumentação pode ficar no código sem custo.
+    Coletores são funções chamadas na exposição para métricas derivadas de
+    estado já existente (ex.: tempos de carregamento dos modelos); retornam
+    (nome, tipo, descrição, [(rótulos, valor)]).
+    """
+
+    def __init__(self, ativo: bool = True):
+        self.ativo = ativo
+        self._metricas: List[_Metrica] = []
+        self._coletores: List[Callable] = []
+
+    def contador(self, nome: str, descricao: str, rotulos: Sequence[str] = ()) -> Contador:
+        metrica = Contador(nome, descricao, rotulos, self.ativo)
+        self._metricas.append(metrica)
+        return metrica
+
+    def histograma(self, nome: str, descricao: str, rotulos: Sequence[str] = (),
+                   buckets: Optional[Sequence[float]] = None) -> Histograma:
+        metrica = Histograma(nome, descricao, rotulos, buckets or BUCKETS_LATENCIA, self.ativo)
+        self._metricas.append(metrica)
+        return metrica
+
+    def adicionar_coletor(self, coletor: Callable):
+        self._coletores.append(coletor)
+
+    def expor(self) -> str:
+        linhas = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.expor())
+        for coletor in self._coletores:
+            for nome, tipo, descricao, amostras in coletor():
+                linhas.append(f'# HELP {nome} {descricao}')
+                linhas.append(f'# TYPE {nome} {tipo}')
+                for rotulos, valor in amostras:
+                    linhas.append(f'{nome}{_formatar_rotulos(list(rotulos), list(rotulos.values()))} '
+                                  f'{_formatar_valor(valor)}')
+        return '\n'.join(linhas) + '\n'
@@ -0,0 +1,236 @@
+"""
+Inferência em mosaico para imagens de campo em alta resolução
+
+Em vez de reduzir a foto inteira para 224x224 (o que apaga as lesões de
+fotos de drone com muitas folhas), a imagem é dividida em tiles de 224px
+sobrepostos, os tiles de fundo são descartados por uma máscara de pixels
+verdes e os restantes passam juntos, em um único lote, pelo pipeline
+hierárquico. Os resultados por tile são agregados em um veredito da imagem
+e em um mapa grosseiro de doença (um valor por tile).
+
+As funções de extração não dependem de TensorFlow nem de FastAPI, para
+rodarem no pool de decodificação da API.
+"""
+import io
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+TAMANHO_TILE = 224
+
+
+def posicoes_eixo(comprimento: int, tamanho: int, sobreposicao: float) -> np.ndarray:
+    """
+    Início de cada tile ao longo de um eixo
+
+    Os tiles são distribuídos uniformemente entre as bordas, com sobreposição
+    de pelo menos `sobreposicao` (fração do tile); o último termina na borda.
+    """
+    if comprimento <= tamanho:
+        return np.zeros(1, dtype=np.int64)
+    passo = max(1, int(tamanho * (1 - sobreposicao)))
+    quantidade = math.ceil((comprimento - tamanho) / passo) + 1
+    return np.linspace(0, comprimento - tamanho, quantidade).round().astype(np.int64)
+
+
+def _contar_tiles(altura: int, largura: int, tamanho: int, sobreposicao: float) -> int:
+    return len(posicoes_eixo(altura, tamanho, sobreposicao)) * len(posicoes_eixo(largura, tamanho, sobreposicao))
+
+
+def dimensoes_limitadas(altura: int, largura: int, tamanho: int = TAMANHO_TILE, sobreposicao: float = 0.25,
+                        max_tiles: int = 64, lado_maximo: int = 4096) -> Tuple[int, int]:
+    """
+    Dimensões (altura, largura) em que a imagem é dividida
+
+    O menor lado é levado a pelo menos `tamanho` e o maior a no máximo
+    `lado_maximo`; se a grade ainda passar de `max_tiles`, a imagem é
+    reduzida até caber (mantendo a cobertura inteira da imagem).
+
+    Raises:
+        ValueError: Se a proporção da imagem não permite as duas condições
+        (ex.: uma faixa de 50x5000 precisaria de 224x22400)
+    """
+    if max(altura, largura) * tamanho > min(altura, largura) * lado_maximo:
+        raise ValueError(f"Proporção da imagem ({largura}x{altura}) acima do limite de "
+                         f"{lado_maximo / tamanho:.1f}:1 para tiles de {tamanho}px")
+    escala = max(tamanho / min(altura, largura), 1.0)
+    escala = min(escala, max(lado_maximo / max(altura, largura), tamanho / min(altura, largura)))
+    altura_final, largura_final = round(altura * escala), round(largura * escala)
+
+    while (_contar_tiles(altura_final, largura_final, tamanho, sobreposicao) > max_tiles
+           and min(altura_final, largura_final) > tamanho):
+        escala *= 0.9
+        escala = max(escala, tamanho / min(altura, largura))
+        altura_final, largura_final = round(altura * escala), round(largura * escala)
+    return max(altura_final, tamanho), max(largura_final, tamanho)
+
+
+def fracao_verde(tiles: np.ndarray, margem: int = 20, subamostragem: int = 4) -> np.ndarray:
+    """
+    Fração de pixels de vegetação de cada tile (índice de excesso de verde 2G - R - B > margem)
+
+    Calculada em uma grade subamostrada de pixels, em uma única operação
+    vetorizada para todos os tiles.
+    """
+    amostra = tiles[:, ::subamostragem, ::subamostragem].astype(np.int16)
+    excesso = 2 * amostra[..., 1] - amostra[..., 0] - amostra[..., 2]
+    return (excesso > margem).mean(axis=(1, 2))
+
+
+def extrair_tiles(img_bytes, tamanho: int = TAMANHO_TILE, sobreposicao: float = 0.25, max_tiles: int = 64,
+                  lado_maximo: int = 4096, fracao_verde_minima: float = 0.0, modo: str = 'exato') -> Dict[str, Any]:
+    """
+    Decodifica uma imagem e a divide em tiles uint8 (N, tamanho, tamanho, 3)
+
+    Args:
+        img_bytes: Conteúdo do arquivo de imagem
+        tamanho: Lado dos tiles (entrada dos modelos)
+        sobreposicao: Sobreposição mínima entre tiles vizinhos (fração do tile)
+        max_tiles: Limite de tiles por imagem (a imagem é reduzida para caber)
+        lado_maximo: Maior lado usado, antes do limite de tiles
+        fracao_verde_minima: Tiles com menos vegetação que isto são descartados como fundo (0 desativa)
+        modo: 'exato' ou 'rapido' (decodificação JPEG reduzida, ver `preprocessamento.carregar_rgb`)
+
+    Returns:
+        dict: 'tiles' (apenas os mantidos), 'posicoes' [(linha, coluna)] dos
+        tiles mantidos na grade, 'grade' (linhas, colunas), 'tamanho_original'
+        (largura, altura), 'tamanho_processado' (largura, altura) e
+        'fracao_verde' de todos os tiles
+    """
+    if isinstance(img_bytes, (bytes, bytearray, memoryview)):
+        img_bytes = io.BytesIO(img_bytes)
+    img = Image.open(img_bytes)
+    largura_original, altura_original = img.size
+
+    altura, largura = dimensoes_limitadas(altura_original, largura_original, tamanho, sobreposicao,
+                                          max_tiles, lado_maximo)
+    if modo == 'rapido' and img.format == 'JPEG':
+        img.draft('RGB', (largura, altura))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    if img.size != (largura, altura):
+        img = img.resize((largura, altura), reducing_gap=3.0 if modo == 'rapido' else None)
+    pixels = np.asarray(img, dtype=np.uint8)
+
+    ys = posicoes_eixo(altura, tamanho, sobreposicao)
+    xs = posicoes_eixo(largura, tamanho, sobreposicao)
+    # Proporções extremas (ex.: panorâmicas) podem passar do limite mesmo com o
+    # menor lado em `tamanho`: os tiles do eixo longo são espaçados para caber
+    if len(ys) * len(xs) > max_tiles:
+        if len(xs) >= len(ys):
+            xs = np.linspace(0, largura - tamanho, max(1, max_tiles // len(ys))).round().astype(np.int64)
+        else:
+            ys = np.linspace(0, altura - tamanho, max(1, max_tiles // len(xs))).round().astype(np.int64)
+
+    tiles = np.empty((len(ys) * len(xs), tamanho, tamanho, 3), dtype=np.uint8)
+    posicoes = []
+    for linha, y in enumerate(ys):
+        for coluna, x in enumerate(xs):
+            tiles[len(posicoes)] = pixels[y:y + tamanho, x:x + tamanho]
+            posicoes.append((linha, coluna))
+
+    verde = fracao_verde(tiles)
+    if fracao_verde_minima > 0:
+        mantidos = np.flatnonzero(verde >= fracao_verde_minima)
+        tiles = tiles[mantidos]
+        posicoes = [posicoes[i] for i in mantidos]
+
+    return {
+        'tiles': tiles,
+        'posicoes': posicoes,
+        'grade': (len(ys), len(xs)),
+        'tamanho_original': (largura_original, altura_original),
+        'tamanho_processado': (largura, altura),
+        'fracao_verde': verde
+    }
+
+
+def intensidade_doenca(probabilidade: float, threshold: float) -> float:
+    """
+    Probabilidade de 'unhealthy' reescalada para que o threshold da espécie fique em 0.5
+
+    Torna comparáveis, no mesmo mapa, tiles avaliados por especialistas com
+    thresholds diferentes (ex.: pepper 0.15, tomato 0.75).
+    """
+    if probabilidade <= threshold:
+        return 0.5 * probabilidade / threshold if threshold > 0 else 0.0
+    return 0.5 + 0.5 * (probabilidade - threshold) / (1 - threshold) if threshold < 1 else 1.0
+
+
+def agregar_tiles(resultados: List[Dict[str, Any]], posicoes: List[Tuple[int, int]], grade: Tuple[int, int],
+                  fracao_doente_minima: float = 0.1) -> Dict[str, Any]:
+    """
+    Veredito da imagem e mapa de doença a partir dos resultados por tile
+
+    A espécie é a de maior confiança somada entre os tiles, e a sua confiança
+    é a média entre os tiles que a predisseram. Entre os tiles
+    dessa espécie com saúde avaliada, a imagem é 'unhealthy' se ao menos
+    `fracao_doente_minima` deles (e no mínimo um) forem 'unhealthy': uma
+    lesão costuma aparecer em poucos tiles.
+
+    Returns:
+        dict: 'especie', 'saude', 'resultado_final', 'pipeline_sucesso',
+        'mapa_doenca' (linhas x colunas; None para tiles de fundo ou sem
+        saúde avaliada) e 'tiles' (resumo por tile)
+    """
+    mapa: List[List[Optional[float]]] = [[None] * grade[1] for _ in range(grade[0])]
+    if not resultados:
+        return {
+            'especie': {'nome': None, 'confianca': 0.0},
+            'saude': {'status': 'unknown', 'confianca': 0.0, 'tiles_doentes': 0, 'tiles_avaliados': 0},
+            'resultado_final': {'classificacao': 'unknown', 'confianca': 0.0},
+            'pipeline_sucesso': False,
+            'erro': 'Nenhum tile com vegetação suficiente',
+            'mapa_doenca': mapa,
+            'tiles': []
+        }
+
+    votos: Dict[str, float] = {}
+    contagem: Dict[str, int] = {}
+    for resultado in resultados:
+        nome = resultado['especie']['nome']
+        votos[nome] = votos.get(nome, 0.0) + resultado['especie']['confianca']
+        contagem[nome] = contagem.get(nome, 0) + 1
+    especie = max(votos, key=votos.get)
+    confianca_especie = votos[especie] / contagem[especie]
+
+    tiles = []
+    doentes, saudaveis = [], []
+    for resultado, (linha, coluna) in zip(resultados, posicoes):
+        debug_info = resultado['debug_info']
+        intensidade = None
+        if 'threshold_usado' in debug_info:
+            intensidade = round(intensidade_doenca(debug_info['probabilidade_bruta'], debug_info['threshold_usado']), 4)
+            mapa[linha][coluna] = intensidade
+        if resultado['especie']['nome'] == especie and resultado['saude']['status'] in ('healthy', 'unhealthy'):
+            (doentes if resultado['saude']['status'] == 'unhealthy' else saudaveis).append(resultado['saude']['confianca'])
+        tiles.append({
+            'linha': linha,
+            'coluna': coluna,
+            'especie': resultado['especie']['nome'],
+            'saude': resultado['saude']['status'],
+            'intensidade_doenca': intensidade
+        })
+
+    avaliados = len(doentes) + len(saudaveis)
+    if avaliados == 0:
+        saude, confianca_saude = 'unknown', 0.0
+    elif len(doentes) >= max(1, math.ceil(fracao_doente_minima * avaliados)):
+        saude, confianca_saude = 'unhealthy', float(np.mean(doentes))
+    else:
+        saude, confianca_saude = 'healthy', float(np.mean(saudaveis))
+
+    return {
+        'especie': {'nome': especie, 'confianca': confianca_especie},
+        'saude': {'status': saude, 'confianca': confianca_saude,
+                  'tiles_doentes': len(doentes), 'tiles_avaliados': avaliados},
+        'resultado_final': {
+            'classificacao': f"{especie}_{saude}",
+            'confianca': confianca_especie * confianca_saude if avaliados else confianca_especie
+        },
+        'pipeline_sucesso': avaliados > 0,
+        'mapa_doenca': mapa,
+        'tiles': tiles
+    }
@@ -0,0 +1,255 @@
+"""
+Otimização dos thresholds dos especialistas e arquivo versionado de thresholds
+
+Calcula (uma vez, com cache) as probabilidades de 'unhealthy' de cada
+especialista sobre o split escolhido do seu dataset, varre todos os
+thresholds candidatos em uma única passada ordenada (soma acumulada, O(n log n))
+e grava as curvas de precisão/recall/F1 e um novo arquivo de thresholds
+versionado, que a API recarrega sem reiniciar (`THRESHOLDS_ARQUIVO`).
+
+Critério: maior F1 de 'unhealthy'; em empates, o menor threshold (mais
+sensível a plantas doentes), como na análise original.
+
+Uso:
+    python otimizar_thresholds.py --split val
+    python otimizar_thresholds.py --especies tomato potato --simular
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from typing import Any, Dict
+
+import numpy as np
+
+from backends_inferencia import ESPECIES_ESPECIALISTAS, csv_especialista
+from cache_dataset import hash_arquivo
+from thresholds import ARQUIVO_THRESHOLDS, DIRETORIO_VERSOES, thresholds_em_uso
+
+DIRETORIO_PROBABILIDADES = 'datasets_processados/probabilidades'
+
+CSV_ESPECIALISTAS = {especie: csv_especialista(especie) for especie in ESPECIES_ESPECIALISTAS}
+
+
+def curvas_threshold(probabilidades: np.ndarray, rotulos: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Precisão, recall e F1 de todos os thresholds candidatos em uma passada
+
+    A decisão é `probabilidade > threshold` (como na API). Os candidatos são
+    0 e cada probabilidade distinta; após ordenar, o número de verdadeiros
+    positivos acima de cada candidato sai de uma soma acumulada dos rótulos.
+
+    Args:
+        probabilidades: Probabilidade da classe positiva ('unhealthy') por imagem
+        rotulos: 1 para a classe positiva, 0 caso contrário
+
+    Returns:
+        dict: Arrays 'threshold', 'precisao', 'recall', 'f1', 'accuracy', 'positivos_preditos'
+    """
+    probabilidades = np.asarray(probabilidades, dtype=np.float64)
+    rotulos = np.asarray(rotulos, dtype=np.int64)
+    ordem = np.argsort(probabilidades, kind='stable')
+    ordenadas = probabilidades[ordem]
+    positivos_acumulados = np.concatenate([[0], np.cumsum(rotulos[ordem])])
+
+    n = len(ordenadas)
+    total_positivos = int(positivos_acumulados[-1])
+    thresholds = np.unique(np.concatenate([[0.0], ordenadas]))
+
+    # Imagens com probabilidade <= threshold ficam abaixo do corte
+    abaixo = np.searchsorted(ordenadas, thresholds, side='right')
+    vp = total_positivos - positivos_acumulados[abaixo]
+    preditos = n - abaixo
+    fp = preditos - vp
+    vn = (n - total_positivos) - fp
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precisao = np.where(preditos > 0, vp / np.maximum(preditos, 1), 1.0)
+        recall = vp / total_positivos if total_positivos else np.zeros(len(thresholds))
+        f1 = np.where(precisao + recall > 0, 2 * precisao * recall / (precisao + recall), 0.0)
+    return {
+        'threshold': thresholds,
+        'precisao': precisao,
+        'recall': recall,
+        'f1': f1,
+        'accuracy': (vp + vn) / max(n, 1),
+        'positivos_preditos': preditos
+    }
+
+
+def melhor_threshold(curvas: Dict[str, np.ndarray]) -> Dict[str, float]:
+    """Ponto de maior F1 (o menor threshold em caso de empate)"""
+    i = int(np.argmax(curvas['f1']))
+    return {chave: float(valores[i]) for chave, valores in curvas.items()}
+
+
+def metricas_no_threshold(curvas: Dict[str, np.ndarray], threshold: float) -> Dict[str, float]:
+    """Métricas de um threshold qualquer (mesma decisão do maior candidato <= threshold)"""
+    i = max(int(np.searchsorted(curvas['threshold'], threshold, side='right')) - 1, 0)
+    return {chave: float(valores[i]) for chave, valores in curvas.items() if chave != 'threshold'}
+
+
+def probabilidades_especialista(especie: str, split: str = 'val', tamanho_lote: int = 64, workers: int = 1,
+                                diretorio: str = DIRETORIO_PROBABILIDADES) -> Dict[str, Any]:
+    """
+    Probabilidades de 'unhealthy' do especialista no split do seu dataset, com cache
+
+    O cache (`<diretorio>/<especie>_<split>.npz`) é reaproveitado enquanto o
+    modelo e o CSV não mudam.
+
+    Returns:
+        dict: 'probabilidades', 'rotulos' (1 = classe positiva), 'caminhos', 'classe_positiva'
+    """
+    import pandas as pd
+
+    from backends_inferencia import caminho_especialista
+
+    caminho_modelo = caminho_especialista(especie)
+    caminho_csv = CSV_ESPECIALISTAS[especie]
+    impressao = f"{hash_arquivo(caminho_modelo)}:{hash_arquivo(caminho_csv)}"
+    caminho_cache = os.path.join(diretorio, f'{especie}_{split}.npz')
+
+    if os.path.exists(caminho_cache):
+        with np.load(caminho_cache, allow_pickle=False) as dados:
+            if str(dados['impressao']) == impressao:
+                return {
+                    'probabilidades': dados['probabilidades'], 'rotulos': dados['rotulos'],
+                    'caminhos': dados['caminhos'], 'classe_positiva': str(dados['classe_positiva'])
+                }
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    from tensorflow.keras.models import load_model
+
+    from classificar_em_lote import decodificar_com_prefetch
+    from preprocessamento import normalizar_lote
+    from processamento_lotes import dividir_em_lotes
+
+    df = pd.read_csv(caminho_csv)
+    df = df[df['split'] == split]
+    # Classe positiva: a 2ª em ordem alfabética ('unhealthy'), como no treino dos especialistas
+    classe_positiva = sorted(df['classe'].unique())[-1]
+
+    modelo = load_model(caminho_modelo)
+    entradas = [{'caminho': c, 'rotulo': int(r == classe_positiva)} for c, r in zip(df['caminho'], df['classe'])]
+    caminhos, rotulos, probabilidades = [], [], []
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto) as pool:
+        lotes = list(dividir_em_lotes(entradas, tamanho_lote))
+        for lote, decodificados in decodificar_com_prefetch(pool, lotes, 'exato', 2, workers):
+            validos = [i for i, (imagem, _) in enumerate(decodificados) if imagem is not None]
+            if not validos:
+                continue
+            img_batch = normalizar_lote([decodificados[i][0] for i in validos])
+            probabilidades.append(modelo.predict(img_batch, verbose=0)[:, 0])
+            caminhos.extend(lote[i]['caminho'] for i in validos)
+            rotulos.extend(lote[i]['rotulo'] for i in validos)
+
+    resultado = {
+        'probabilidades': np.concatenate(probabilidades).astype(np.float32) if probabilidades else np.zeros(0, np.float32),
+        'rotulos': np.asarray(rotulos, dtype=np.int8),
+        'caminhos': np.asarray(caminhos),
+        'classe_positiva': classe_positiva
+    }
+    os.makedirs(diretorio, exist_ok=True)
+    np.savez(caminho_cache + '.tmp.npz', impressao=impressao, **resultado)
+    os.replace(caminho_cache + '.tmp.npz', caminho_cache)
+    return resultado
+
+
+def gravar_thresholds(thresholds: Dict[str, float], metricas: Dict[str, Any], origem: Dict[str, Any],
+                      arquivo: str = ARQUIVO_THRESHOLDS, diretorio_versoes: str = DIRETORIO_VERSOES) -> Dict[str, Any]:
+    """
+    Grava uma nova versão dos thresholds e a publica em `arquivo`
+
+    Cada versão fica em `<diretorio_versoes>/thresholds_vNNNN.json`; `arquivo`
+    é substituído atomicamente por uma cópia da versão nova.
+    """
+    os.makedirs(diretorio_versoes, exist_ok=True)
+    versoes = glob.glob(os.path.join(diretorio_versoes, 'thresholds_v*.json'))
+    versao = max((int(os.path.basename(v)[len('thresholds_v'):-len('.json')]) for v in versoes), default=0) + 1
+
+    conteudo = {
+        'versao': versao,
+        'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'thresholds': {especie: round(float(t), 6) for especie, t in thresholds.items()},
+        'metricas': metricas,
+        'origem': origem
+    }
+    texto = json.dumps(conteudo, indent=2, ensure_ascii=False)
+    with open(os.path.join(diretorio_versoes, f'thresholds_v{versao:04d}.json'), 'w') as f:
+        f.write(texto)
+    os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+    with open(arquivo + '.tmp', 'w') as f:
+        f.write(texto)
+    os.replace(arquivo + '.tmp', arquivo)
+    return conteudo
+
+
+def gravar_curvas(curvas_por_especie: Dict[str, Dict[str, np.ndarray]], caminho: str):
+    """Curvas de todas as espécies em um CSV (especie, threshold, precisao, recall, f1, ...)"""
+    import pandas as pd
+
+    tabelas = [pd.DataFrame(curvas).assign(especie=especie) for especie, curvas in curvas_por_especie.items()]
+    tabela = pd.concat(tabelas, ignore_index=True)
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    tabela[['especie'] + [c for c in tabela.columns if c != 'especie']].to_csv(caminho, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Otimiza os thresholds dos especialistas (máximo F1)")
+    parser.add_argument('--especies', nargs='*', default=list(CSV_ESPECIALISTAS), choices=list(CSV_ESPECIALISTAS))
+    parser.add_argument('--split', default='val', help="Split usado na otimização (evite o de teste)")
+    parser.add_argument('--arquivo', default=os.getenv('THRESHOLDS_ARQUIVO', ARQUIVO_THRESHOLDS),
+                        help="Arquivo de thresholds lido pela API")
+    parser.add_argument('--curvas', default='resultados/curvas_thresholds.csv')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processos de decodificação")
+    parser.add_argument('--simular', action='store_true', help="Apenas reporta, sem gravar nova versão")
+    args = parser.parse_args()
+
+    # Referência: a versão publicada, ou os valores padrão
+    em_uso, versao_em_uso = thresholds_em_uso(args.arquivo)
+    print(f"🔬 Thresholds em uso ({versao_em_uso}): {em_uso}")
+
+    thresholds, metricas, curvas_por_especie = {}, {}, {}
+    for especie in args.especies:
+        dados = probabilidades_especialista(especie, args.split, workers=args.workers)
+        if not len(dados['probabilidades']):
+            print(f"⚠️ {especie}: nenhuma imagem no split {args.split}")
+            continue
+        inicio = time.perf_counter()
+        curvas = curvas_threshold(dados['probabilidades'], dados['rotulos'])
+        melhor = melhor_threshold(curvas)
+        atual = metricas_no_threshold(curvas, em_uso.get(especie, 0.5))
+        curvas_por_especie[especie] = curvas
+
+        thresholds[especie] = melhor['threshold']
+        metricas[especie] = {
+            'f1': melhor['f1'], 'precisao': melhor['precisao'], 'recall': melhor['recall'],
+            'accuracy': melhor['accuracy'], 'imagens': int(len(dados['rotulos'])),
+            'classe_positiva': dados['classe_positiva'], 'f1_threshold_anterior': atual['f1']
+        }
+        print(f"🔬 {especie}: threshold {melhor['threshold']:.4f} → F1={melhor['f1']:.4f} "
+              f"P={melhor['precisao']:.4f} R={melhor['recall']:.4f} "
+              f"(em uso {em_uso.get(especie, 0.5):.2f}: F1={atual['f1']:.4f}; "
+              f"{len(curvas['threshold'])} candidatos em {(time.perf_counter() - inicio) * 1000:.1f} ms)")
+
+    if not thresholds:
+        print("❌ Nenhum threshold calculado")
+        return
+
+    gravar_curvas(curvas_por_especie, args.curvas)
+    print(f"📈 Curvas em {args.curvas}")
+    if args.simular:
+        return
+
+    # Espécies não otimizadas nesta execução mantêm o valor em uso
+    completos = dict(em_uso, **thresholds)
+    conteudo = gravar_thresholds(completos, metricas, {'split': args.split, 'criterio': 'max_f1'}, args.arquivo)
+    print(f"✅ Thresholds v{conteudo['versao']} publicados em {args.arquivo}: {conteudo['thresholds']}")
+
+
+if __name__ == "__main__":
+    main()
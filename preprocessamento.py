@@ -0,0 +1,141 @@
+import io
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+# Modos de preprocessamento:
+# - 'exato': decodificação completa; resultado idêntico ao caminho original
+#   (img / 255.0 em float64) após a conversão para float32 feita pelo Keras
+# - 'rapido': decodificação JPEG reduzida (draft) e normalização em float32;
+#   difere do modo exato dentro de uma tolerância verificada por `verificar_paridade`
+MODOS = ('exato', 'rapido')
+
+
+def carregar_rgb(img_bytes, target_size=(224, 224), modo: str = 'exato', resample=None) -> np.ndarray:
+    """
+    Decodifica e redimensiona uma imagem para um array uint8 (altura, largura, 3)
+
+    No modo 'rapido', JPEGs são decodificados diretamente em uma escala
+    reduzida (1/2, 1/4 ou 1/8) próxima do tamanho final antes do resample,
+    evitando decodificar todos os pixels de fotos grandes.
+
+    Args:
+        img_bytes: Conteúdo do arquivo (bytes, memoryview ou arquivo binário)
+        target_size: Tamanho desejado (largura, altura)
+        modo: 'exato' ou 'rapido'
+        resample: Filtro do PIL para o redimensionamento (padrão do PIL se None)
+    """
+    if isinstance(img_bytes, (bytes, bytearray, memoryview)):
+        img_bytes = io.BytesIO(img_bytes)
+    img = Image.open(img_bytes)
+
+    if modo == 'rapido' and img.format == 'JPEG':
+        img.draft('RGB', target_size)
+
+    # Converter para RGB se necessário
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # Redimensionar
+    if modo == 'rapido':
+        img = img.resize(target_size, resample=resample, reducing_gap=3.0)
+    else:
+        img = img.resize(target_size, resample=resample)
+
+    return np.asarray(img, dtype=np.uint8)
+
+
+def normalizar(img_uint8: np.ndarray, saida: Optional[np.ndarray] = None,
+               modo: str = 'exato') -> np.ndarray:
+    """
+    Normaliza (0-255 → 0-1) escrevendo diretamente em um buffer float32
+
+    No modo 'exato' a divisão é calculada em float64 elemento a elemento e
+    arredondada para float32, reproduzindo o caminho original sem alocar o
+    array float64 intermediário.
+    """
+    if saida is None:
+        saida = np.empty(img_uint8.shape, dtype=np.float32)
+    if modo == 'exato':
+        np.divide(img_uint8, 255.0, out=saida, casting='unsafe')
+    else:
+        np.multiply(img_uint8, np.float32(1.0 / 255.0), out=saida, dtype=np.float32)
+    return saida
+
+
+def normalizar_lote(imagens_uint8: List[np.ndarray], modo: str = 'exato') -> np.ndarray:
+    """Monta um lote float32 pré-alocado a partir de imagens uint8 do mesmo tamanho"""
+    lote = np.empty((len(imagens_uint8),) + imagens_uint8[0].shape, dtype=np.float32)
+    for i, img in enumerate(imagens_uint8):
+        normalizar(img, saida=lote[i], modo=modo)
+    return lote
+
+
+def decodificar_imagem(img_bytes, target_size=(224, 224), modo: str = 'exato') -> np.ndarray:
+    """
+    Decodifica e normaliza uma imagem para os modelos
+
+    Não depende de TensorFlow nem de FastAPI, para poder ser executada em
+    processos separados do servidor.
+
+    Args:
+        img_bytes: Conteúdo do arquivo de imagem
+        target_size: Tamanho desejado (largura, altura)
+        modo: 'exato' ou 'rapido'
+
+    Returns:
+        numpy.array: Imagem float32 normalizada com dimensão de batch (1, 224, 224, 3)
+    """
+    return normalizar_lote([carregar_rgb(img_bytes, target_size, modo)], modo)
+
+
+def decodificar_imagem_referencia(img_bytes: bytes, target_size=(224, 224)) -> np.ndarray:
+    """Caminho original de preprocessamento (float64), usado como referência de paridade"""
+    img = Image.open(io.BytesIO(img_bytes))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img = img.resize(target_size)
+    return np.expand_dims(np.array(img) / 255.0, axis=0)
+
+
+def verificar_paridade(img_bytes: bytes, modo: str = 'rapido', tolerancia: float = 0.0,
+                       target_size=(224, 224)) -> dict:
+    """
+    Compara o modo de preprocessamento com o caminho original
+
+    Returns:
+        dict: Diferença absoluta máxima e média, e se está dentro da tolerância
+    """
+    referencia = decodificar_imagem_referencia(img_bytes, target_size).astype(np.float32)
+    obtido = decodificar_imagem(img_bytes, target_size, modo)
+    diferenca = np.abs(obtido - referencia)
+    return {
+        'modo': modo,
+        'diferenca_maxima': float(diferenca.max()),
+        'diferenca_media': float(diferenca.mean()),
+        'dentro_tolerancia': bool(diferenca.max() <= tolerancia)
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Verifica a paridade do preprocessamento com o caminho original")
+    parser.add_argument('imagens', nargs='+', help="Arquivos de imagem para comparar")
+    parser.add_argument('--modo', choices=MODOS, default='rapido')
+    parser.add_argument('--tolerancia', type=float, default=0.0,
+                        help="Diferença absoluta máxima aceita por pixel (escala 0-1)")
+    args = parser.parse_args()
+
+    falhas = 0
+    for caminho in args.imagens:
+        with open(caminho, 'rb') as f:
+            resultado = verificar_paridade(f.read(), args.modo, args.tolerancia)
+        status = "✅" if resultado['dentro_tolerancia'] else "❌"
+        falhas += not resultado['dentro_tolerancia']
+        print(f"{status} {caminho}: máx={resultado['diferenca_maxima']:.5f} "
+              f"média={resultado['diferenca_media']:.5f}")
+
+    sys.exit(1 if falhas else 0)
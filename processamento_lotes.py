@@ -0,0 +1,168 @@
+import queue
+import tarfile
+import threading
+import zipfile
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+EXTENSOES_IMAGEM = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+EXTENSOES_COMPACTADAS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+def eh_imagem(content_type, filename) -> bool:
+    """Verifica se o upload é uma imagem pelo content type ou pela extensão"""
+    if content_type and content_type.startswith('image/'):
+        return True
+    return bool(filename) and filename.lower().endswith(EXTENSOES_IMAGEM)
+
+
+def eh_compactado(content_type, filename) -> bool:
+    """Verifica se o upload é um arquivo zip/tar"""
+    if content_type in ('application/zip', 'application/x-zip-compressed',
+                        'application/x-tar', 'application/gzip', 'application/x-gzip'):
+        return True
+    return bool(filename) and filename.lower().endswith(EXTENSOES_COMPACTADAS)
+
+
+def iterar_imagens_compactadas(arquivo_obj: BinaryIO, limite_itens: int,
+                               limite_bytes_item: int) -> Iterator[Tuple[str, Optional[bytes]]]:
+    """
+    Itera sob demanda pelas imagens de um arquivo zip ou tar
+
+    Entradas que não são imagens são ignoradas; entradas acima de
+    `limite_bytes_item` são devolvidas com conteúdo None, sem serem lidas.
+
+    Raises:
+        ValueError: Se o conteúdo não é um zip/tar válido ou excede `limite_itens`
+    """
+    total = 0
+
+    if zipfile.is_zipfile(arquivo_obj):
+        arquivo_obj.seek(0)
+        with zipfile.ZipFile(arquivo_obj) as arquivo:
+            for info in arquivo.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(EXTENSOES_IMAGEM):
+                    continue
+                total += 1
+                if total > limite_itens:
+                    raise ValueError(f"Arquivo compactado com mais de {limite_itens} imagens")
+                yield info.filename, arquivo.read(info) if info.file_size <= limite_bytes_item else None
+        return
+
+    arquivo_obj.seek(0)
+    try:
+        with tarfile.open(fileobj=arquivo_obj, mode='r:*') as arquivo:
+            for membro in arquivo:
+                if not membro.isfile() or not membro.name.lower().endswith(EXTENSOES_IMAGEM):
+                    continue
+                total += 1
+                if total > limite_itens:
+                    raise ValueError(f"Arquivo compactado com mais de {limite_itens} imagens")
+                yield membro.name, arquivo.extractfile(membro).read() if membro.size <= limite_bytes_item else None
+    except tarfile.TarError as e:
+        raise ValueError(f"Arquivo compactado inválido: {e}")
+
+
+def dividir_em_lotes(itens: Sequence, tamanho: int) -> Iterator[Sequence]:
+    """Divide uma sequência em fatias de até `tamanho` elementos"""
+    for inicio in range(0, len(itens), tamanho):
+        yield itens[inicio:inicio + tamanho]
+
+
+_FIM = object()
+
+
+class _Falha:
+    """Marca uma exceção fatal que precisa ser propagada até o consumidor"""
+
+    def __init__(self, erro: Exception):
+        self.erro = erro
+
+
+def executar_em_estagios(fonte: Iterable, estagios: Sequence[Tuple[Callable[[list], list], int]],
+                         tamanho_buffer: int = 8) -> Iterator:
+    """
+    Executa uma sequência de estágios em threads ligadas por filas limitadas
+
+    Cada estágio é um par (função, tamanho_lote): a função recebe uma lista de
+    até `tamanho_lote` itens (o que estiver disponível na fila, sem esperar
+    completar o lote) e devolve a lista de itens para o próximo estágio.
+    As filas entre estágios têm no máximo `tamanho_buffer` itens, então a
+    memória usada não cresce com o tamanho da fonte.
+
+    Exceções levantadas pela fonte ou por um estágio interrompem o pipeline e
+    são relançadas para o consumidor. Fechar o gerador cancela os estágios.
+    """
+    cancelado = threading.Event()
+    filas = [queue.Queue(maxsize=tamanho_buffer) for _ in range(len(estagios) + 1)]
+
+    def colocar(fila: queue.Queue, item) -> bool:
+        while not cancelado.is_set():
+            try:
+                fila.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produtor():
+        try:
+            for item in fonte:
+                if not colocar(filas[0], item):
+                    return
+        except Exception as e:
+            colocar(filas[0], _Falha(e))
+            return
+        colocar(filas[0], _FIM)
+
+    def estagio(funcao, tamanho_lote, entrada: queue.Queue, saida: queue.Queue):
+        while not cancelado.is_set():
+            try:
+                item = entrada.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            lote, terminal = [], None
+            while True:
+                if item is _FIM or isinstance(item, _Falha):
+                    terminal = item
+                    break
+                lote.append(item)
+                if len(lote) >= tamanho_lote:
+                    break
+                try:
+                    item = entrada.get_nowait()
+                except queue.Empty:
+                    break
+
+            if lote:
+                try:
+                    saidas = funcao(lote)
+                except Exception as e:
+                    colocar(saida, _Falha(e))
+                    return
+                for resultado in saidas:
+                    if not colocar(saida, resultado):
+                        return
+
+            if terminal is not None:
+                colocar(saida, terminal)
+                return
+
+    threads = [threading.Thread(target=produtor, daemon=True)]
+    for i, (funcao, tamanho_lote) in enumerate(estagios):
+        threads.append(threading.Thread(
+            target=estagio, args=(funcao, tamanho_lote, filas[i], filas[i + 1]), daemon=True
+        ))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = filas[-1].get()
+            if item is _FIM:
+                return
+            if isinstance(item, _Falha):
+                raise item.erro
+            yield item
+    finally:
+        cancelado.set()
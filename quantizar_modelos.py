@@ -0,0 +1,182 @@
+"""
+Quantização pós-treinamento (INT8/FP16) dos modelos servidos pela API
+
+Gera as variantes TFLite de cada modelo usando um subconjunto de calibração
+dos datasets processados e produz um relatório de acurácia/F1 por espécie,
+medido nos thresholds em uso pela API (THRESHOLDS_ARQUIVO, ou os padrão).
+
+Uso:
+    python quantizar_modelos.py --variantes int8 fp16 --calibracao 200 --avaliacao 500
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import tensorflow as tf
+from sklearn.metrics import accuracy_score, f1_score
+from tensorflow.keras.models import load_model
+
+from backends_inferencia import (
+    CAMINHO_ENCODER_ESPECIES, DATASETS_ESPECIALISTAS, DIRETORIO_EXPORTADOS, VARIANTES,
+    BackendTFLite, caminho_exportado, modelos_servidos
+)
+from preprocessamento import decodificar_imagem
+from thresholds import thresholds_em_uso
+from utils import carregar_dataset_especialista, carregar_dataset_especies
+
+
+def _amostrar(caminhos, rotulos, quantidade: int, seed: int = 42):
+    """Amostra aleatória reprodutível de (caminhos, rótulos)"""
+    rng = np.random.default_rng(seed)
+    indices = rng.choice(len(caminhos), size=min(quantidade, len(caminhos)), replace=False)
+    return [caminhos[i] for i in indices], [rotulos[i] for i in indices]
+
+
+def _carregar_imagens(caminhos) -> np.ndarray:
+    """Decodifica uma lista de imagens no mesmo preprocessamento da API"""
+    lote = []
+    for caminho in caminhos:
+        with open(caminho, 'rb') as f:
+            lote.append(decodificar_imagem(f.read()))
+    return np.concatenate(lote, axis=0)
+
+
+def dataset_do_modelo(nome: str):
+    """Dataset (splits train/val/test) usado para calibrar e avaliar cada modelo"""
+    if nome == 'especies':
+        return carregar_dataset_especies()
+    return carregar_dataset_especialista(DATASETS_ESPECIALISTAS[nome.replace('especialista_', '')])
+
+
+def quantizar(modelo, variante: str, calibracao: np.ndarray) -> bytes:
+    """
+    Converte um modelo Keras para TFLite quantizado
+
+    - fp16: pesos em float16
+    - int8: pesos e ativações em int8, calibrados com `calibracao`
+      (entrada e saída continuam em float32)
+    """
+    conversor = tf.lite.TFLiteConverter.from_keras_model(modelo)
+    conversor.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if variante == 'fp16':
+        conversor.target_spec.supported_types = [tf.float16]
+    elif variante == 'int8':
+        def dataset_representativo():
+            for i in range(len(calibracao)):
+                yield [calibracao[i:i + 1]]
+
+        conversor.representative_dataset = dataset_representativo
+        conversor.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    else:
+        raise ValueError(f"Variante inválida: {variante}")
+
+    return conversor.convert()
+
+
+def _prever(modelo, imagens: np.ndarray, tamanho_lote: int = 32):
+    """Predições em lotes, retornando também o tempo médio por imagem"""
+    saidas = []
+    inicio = time.perf_counter()
+    for i in range(0, len(imagens), tamanho_lote):
+        saidas.append(modelo.predict(imagens[i:i + tamanho_lote], verbose=0))
+    tempo = (time.perf_counter() - inicio) / max(1, len(imagens))
+    return np.concatenate(saidas, axis=0), tempo
+
+
+def avaliar(nome: str, saidas: np.ndarray, rotulos, encoder_especies, thresholds: dict) -> dict:
+    """
+    Acurácia e F1 nas mesmas regras de decisão da API
+
+    Especialistas usam o threshold em uso da espécie; o modelo de espécies
+    usa argmax (F1 macro).
+    """
+    if nome == 'especies':
+        esperado = encoder_especies.transform(rotulos)
+        predito = np.argmax(saidas, axis=1)
+        return {
+            'acuracia': float(accuracy_score(esperado, predito)),
+            'f1': float(f1_score(esperado, predito, average='macro'))
+        }
+
+    especie = nome.replace('especialista_', '')
+    threshold = thresholds.get(especie, 0.5)
+    esperado = np.array([r == 'unhealthy' for r in rotulos])
+    predito = saidas[:, 0] > threshold
+    return {
+        'threshold': threshold,
+        'acuracia': float(accuracy_score(esperado, predito)),
+        'f1': float(f1_score(esperado, predito))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantização INT8/FP16 dos modelos da API")
+    parser.add_argument('--variantes', nargs='+', choices=[v for v in VARIANTES if v != 'fp32'],
+                        default=['int8', 'fp16'])
+    parser.add_argument('--calibracao', type=int, default=200, help="Imagens de treino para calibração INT8")
+    parser.add_argument('--avaliacao', type=int, default=500, help="Imagens de teste para o relatório")
+    parser.add_argument('--diretorio', default=DIRETORIO_EXPORTADOS)
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with open(CAMINHO_ENCODER_ESPECIES, 'rb') as f:
+        encoder_especies = pickle.load(f)
+    thresholds, versao_thresholds = thresholds_em_uso()
+    print(f"🔬 Thresholds ({versao_thresholds}): {thresholds}")
+
+    os.makedirs(args.diretorio, exist_ok=True)
+    relatorio = {'versao_thresholds': versao_thresholds}
+
+    for nome, caminho_h5 in modelos_servidos().items():
+        if not os.path.exists(caminho_h5):
+            print(f"⚠️ {nome}: modelo não encontrado em {caminho_h5}")
+            continue
+
+        print(f"📂 {nome}: carregando {caminho_h5}")
+        modelo = load_model(caminho_h5)
+        dataset = dataset_do_modelo(nome)
+
+        caminhos_cal, _ = _amostrar(list(dataset['train']['X']), list(dataset['train']['y']), args.calibracao)
+        calibracao = _carregar_imagens(caminhos_cal)
+
+        caminhos_teste, rotulos_teste = _amostrar(
+            list(dataset['test']['X']), list(dataset['test']['y']), args.avaliacao
+        )
+        imagens_teste = _carregar_imagens(caminhos_teste)
+
+        saidas, tempo = _prever(modelo, imagens_teste)
+        base = dict(avaliar(nome, saidas, rotulos_teste, encoder_especies, thresholds),
+                    ms_por_imagem=tempo * 1000, tamanho_mb=os.path.getsize(caminho_h5) / 1e6)
+        relatorio[nome] = {'fp32': base}
+        print(f"   fp32: acc={base['acuracia']:.4f} f1={base['f1']:.4f} {base['ms_por_imagem']:.1f} ms/img")
+
+        for variante in args.variantes:
+            destino = caminho_exportado(nome, 'tflite', args.diretorio, variante)
+            with open(destino, 'wb') as f:
+                f.write(quantizar(modelo, variante, calibracao))
+
+            saidas, tempo = _prever(BackendTFLite(destino, args.threads), imagens_teste)
+            metricas = dict(avaliar(nome, saidas, rotulos_teste, encoder_especies, thresholds),
+                            ms_por_imagem=tempo * 1000, tamanho_mb=os.path.getsize(destino) / 1e6)
+            metricas['delta_acuracia'] = metricas['acuracia'] - base['acuracia']
+            metricas['delta_f1'] = metricas['f1'] - base['f1']
+            metricas['speedup'] = base['ms_por_imagem'] / metricas['ms_por_imagem']
+            relatorio[nome][variante] = metricas
+
+            print(f"   {variante}: acc={metricas['acuracia']:.4f} ({metricas['delta_acuracia']:+.4f}) "
+                  f"f1={metricas['f1']:.4f} ({metricas['delta_f1']:+.4f}) "
+                  f"{metricas['ms_por_imagem']:.1f} ms/img (x{metricas['speedup']:.2f}) "
+                  f"{metricas['tamanho_mb']:.1f} MB → {destino}")
+
+    caminho_relatorio = os.path.join(args.diretorio, 'relatorio_quantizacao.json')
+    with open(caminho_relatorio, 'w') as f:
+        json.dump(relatorio, f, indent=2)
+    print(f"📊 Relatório salvo em {caminho_relatorio}")
+
+
+if __name__ == "__main__":
+    main()
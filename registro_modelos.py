@@ -0,0 +1,261 @@
+"""
+Registro versionado dos modelos servidos pela API
+
+Cada versão é um diretório `<registro>/<versao>/` com a mesma estrutura de
+`modelos_salvos/` (modelo de espécies, encoder, `especialistas/` e,
+opcionalmente, `exportados/`) e um `manifesto.json` com o hash de cada
+arquivo. O arquivo `<registro>/ATUAL` aponta a versão carregada na
+inicialização. Sem nenhuma versão registrada, a API usa os caminhos fixos
+de `modelos_salvos/`.
+
+Uso:
+    python registro_modelos.py listar
+    python registro_modelos.py publicar v2 --especialista tomato=novos/especialista_tomato.h5
+    python registro_modelos.py ativar v2
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional
+
+from backends_inferencia import (
+    CAMINHO_ENCODER_ESPECIES, CAMINHO_MODELO_ESPECIES, DIRETORIO_EXPORTADOS, ESPECIES_ESPECIALISTAS,
+    caminho_especialista
+)
+from cache_dataset import hash_arquivo
+
+DIRETORIO_REGISTRO = 'modelos_salvos/registro'
+
+
+def _arquivos_relativos() -> Dict[str, str]:
+    """Nome lógico → caminho dentro do diretório de uma versão"""
+    arquivos = {
+        'especies': os.path.basename(CAMINHO_MODELO_ESPECIES),
+        'encoder_especies': os.path.basename(CAMINHO_ENCODER_ESPECIES)
+    }
+    for especie in ESPECIES_ESPECIALISTAS:
+        arquivos[f'especialista_{especie}'] = os.path.join('especialistas', os.path.basename(caminho_especialista(especie)))
+    return arquivos
+
+
+def caminhos_fixos() -> Dict[str, str]:
+    """Caminhos usados sem registro (os mesmos dos notebooks)"""
+    caminhos = {'especies': CAMINHO_MODELO_ESPECIES, 'encoder_especies': CAMINHO_ENCODER_ESPECIES,
+                'exportados': DIRETORIO_EXPORTADOS}
+    for especie in ESPECIES_ESPECIALISTAS:
+        caminhos[f'especialista_{especie}'] = caminho_especialista(especie)
+    return caminhos
+
+
+class ConjuntoModelos:
+    """
+    Modelos de uma versão: espécies, encoder, especialistas e backbone compartilhado
+
+    O pipeline processa cada lote inteiro com o conjunto ativo no seu início;
+    uma recarga troca o conjunto de uma só vez, e os lotes em andamento
+    terminam com o anterior.
+    """
+
+    def __init__(self, versao: str = '', caminhos: Optional[Dict[str, str]] = None):
+        self.versao = versao
+        self.caminhos = caminhos or {}
+        self.modelo_especies = None
+        self.encoder_especies = None
+        self.modelos_especialistas: Dict[str, Any] = {}
+        self.backbone_compartilhado = None
+        # Carregamentos de especialistas em andamento (carregamento lazy)
+        self.futuros_especialistas: Dict[str, Any] = {}
+        # Tempos frio/quente do aquecimento por modelo e tamanho de lote (ver api.aquecer_modelos)
+        self.tempos_aquecimento: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+
+class RegistroModelos:
+    """Versões publicadas em `diretorio` e a versão ativa"""
+
+    def __init__(self, diretorio: str = DIRETORIO_REGISTRO):
+        self.diretorio = diretorio
+        self._arquivo_atual = os.path.join(diretorio, 'ATUAL')
+
+    def versoes(self) -> List[str]:
+        """Versões publicadas (com manifesto), em ordem de publicação"""
+        if not os.path.isdir(self.diretorio):
+            return []
+        versoes = [v for v in os.listdir(self.diretorio)
+                   if os.path.exists(os.path.join(self.diretorio, v, 'manifesto.json'))]
+        return sorted(versoes, key=lambda v: self.manifesto(v).get('publicado_em', ''))
+
+    def manifesto(self, versao: str) -> Dict[str, Any]:
+        with open(os.path.join(self.diretorio, versao, 'manifesto.json')) as f:
+            return json.load(f)
+
+    def versao_atual(self) -> Optional[str]:
+        """Versão apontada por ATUAL (ou a última publicada); None sem registro"""
+        if os.path.exists(self._arquivo_atual):
+            with open(self._arquivo_atual) as f:
+                versao = f.read().strip()
+            if versao:
+                return versao
+        versoes = self.versoes()
+        return versoes[-1] if versoes else None
+
+    def caminhos(self, versao: str) -> Dict[str, str]:
+        """
+        Caminhos dos arquivos de uma versão
+
+        Raises:
+            FileNotFoundError: Se a versão não foi publicada
+        """
+        base = os.path.join(self.diretorio, versao)
+        if not os.path.exists(os.path.join(base, 'manifesto.json')):
+            raise FileNotFoundError(f"Versão de modelos não encontrada no registro: {versao}")
+        caminhos = {nome: os.path.join(base, relativo) for nome, relativo in _arquivos_relativos().items()}
+        caminhos['exportados'] = os.path.join(base, 'exportados')
+        return caminhos
+
+    def verificar(self, versao: str):
+        """
+        Confere os arquivos de uma versão com os hashes do manifesto
+
+        Raises:
+            ValueError: Se algum arquivo foi alterado ou removido depois da publicação
+        """
+        caminhos = self.caminhos(versao)
+        alterados = []
+        for nome, esperado in self.manifesto(versao)['arquivos'].items():
+            caminho = caminhos.get(nome)
+            if caminho is None or not os.path.exists(caminho) or hash_arquivo(caminho) != esperado:
+                alterados.append(nome)
+        if alterados:
+            raise ValueError(f"Versão {versao} alterada após a publicação (manifesto não confere): {alterados}")
+
+    def ativar(self, versao: str):
+        """Aponta ATUAL para `versao` (carregada nas próximas inicializações)"""
+        self.caminhos(versao)
+        with open(self._arquivo_atual + '.tmp', 'w') as f:
+            f.write(versao + '\n')
+        os.replace(self._arquivo_atual + '.tmp', self._arquivo_atual)
+
+    def publicar(self, versao: str, arquivos: Dict[str, str], base: Optional[Dict[str, str]] = None,
+                 descricao: str = '') -> Dict[str, Any]:
+        """
+        Publica uma nova versão
+
+        Os arquivos não informados em `arquivos` vêm de `base` (por padrão a
+        versão atual, ou os caminhos fixos sem registro). Todos são copiados:
+        hard links seriam alterados quando os notebooks regravam os .h5 no
+        mesmo lugar, mudando versões já publicadas. Os modelos exportados da
+        base são mantidos apenas para os modelos não substituídos.
+
+        Raises:
+            FileNotFoundError: Se um arquivo informado em `arquivos` não existe
+        """
+        destino = os.path.join(self.diretorio, versao)
+        if os.path.exists(destino):
+            raise FileExistsError(f"Versão já publicada: {versao}")
+        if base is None:
+            atual = self.versao_atual()
+            base = self.caminhos(atual) if atual else caminhos_fixos()
+
+        relativos = _arquivos_relativos()
+        desconhecidos = set(arquivos) - set(relativos)
+        if desconhecidos:
+            raise ValueError(f"Arquivos desconhecidos: {sorted(desconhecidos)}. Opções: {sorted(relativos)}")
+        inexistentes = {nome: caminho for nome, caminho in arquivos.items() if not os.path.isfile(caminho)}
+        if inexistentes:
+            raise FileNotFoundError(f"Arquivos informados não encontrados: {inexistentes}")
+
+        temporario = destino + '.tmp'
+        shutil.rmtree(temporario, ignore_errors=True)
+        hashes = {}
+        for nome, relativo in relativos.items():
+            origem = arquivos.get(nome, base.get(nome))
+            # Modelos não informados e ausentes na base (ex.: especialista nunca treinado)
+            if not origem or not os.path.exists(origem):
+                continue
+            alvo = os.path.join(temporario, relativo)
+            os.makedirs(os.path.dirname(alvo), exist_ok=True)
+            shutil.copy2(origem, alvo)
+            hashes[nome] = hash_arquivo(alvo)
+        # Modelos exportados (TFLite/ONNX) continuam válidos só para os modelos não substituídos
+        exportados_base = base.get('exportados')
+        if exportados_base and os.path.isdir(exportados_base):
+            for arquivo in sorted(os.listdir(exportados_base)):
+                nome = os.path.splitext(arquivo)[0]
+                for sufixo in ('_fp16', '_int8'):
+                    nome = nome[:-len(sufixo)] if nome.endswith(sufixo) else nome
+                if nome in relativos and nome not in arquivos:
+                    os.makedirs(os.path.join(temporario, 'exportados'), exist_ok=True)
+                    shutil.copy2(os.path.join(exportados_base, arquivo), os.path.join(temporario, 'exportados', arquivo))
+
+        if 'especies' not in hashes or 'encoder_especies' not in hashes:
+            shutil.rmtree(temporario, ignore_errors=True)
+            raise FileNotFoundError("Uma versão precisa ao menos do modelo de espécies e do encoder")
+
+        manifesto = {
+            'versao': versao,
+            'publicado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'descricao': descricao,
+            'arquivos': hashes
+        }
+        with open(os.path.join(temporario, 'manifesto.json'), 'w') as f:
+            json.dump(manifesto, f, indent=2, ensure_ascii=False)
+        os.replace(temporario, destino)
+        return manifesto
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registro versionado dos modelos da API")
+    parser.add_argument('--registro', default=os.getenv('REGISTRO_MODELOS', DIRETORIO_REGISTRO))
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    subcomandos.add_parser('listar', help="Lista as versões publicadas")
+
+    publicar = subcomandos.add_parser('publicar', help="Publica uma nova versão")
+    publicar.add_argument('versao')
+    publicar.add_argument('--especies', default=None, help="Novo modelo de espécies (.h5)")
+    publicar.add_argument('--encoder', default=None, help="Novo label encoder de espécies (.pkl)")
+    publicar.add_argument('--especialista', action='append', default=[], metavar='ESPECIE=CAMINHO',
+                          help="Novo especialista (repetível)")
+    publicar.add_argument('--descricao', default='')
+    publicar.add_argument('--ativar', action='store_true', help="Aponta ATUAL para a nova versão")
+
+    ativar = subcomandos.add_parser('ativar', help="Define a versão carregada na inicialização")
+    ativar.add_argument('versao')
+    args = parser.parse_args()
+
+    registro = RegistroModelos(args.registro)
+    if args.comando == 'listar':
+        atual = registro.versao_atual()
+        if not registro.versoes():
+            print(f"📭 Nenhuma versão em {args.registro} (a API usa modelos_salvos/)")
+        for versao in registro.versoes():
+            manifesto = registro.manifesto(versao)
+            marcador = '👉' if versao == atual else '  '
+            print(f"{marcador} {versao}  {manifesto['publicado_em']}  {len(manifesto['arquivos'])} arquivos"
+                  + (f"  {manifesto['descricao']}" if manifesto['descricao'] else ''))
+        return
+
+    if args.comando == 'ativar':
+        registro.ativar(args.versao)
+        print(f"✅ ATUAL → {args.versao} (POST /admin/modelos/recarregar aplica sem reiniciar)")
+        return
+
+    arquivos = {}
+    if args.especies:
+        arquivos['especies'] = args.especies
+    if args.encoder:
+        arquivos['encoder_especies'] = args.encoder
+    for item in args.especialista:
+        especie, _, caminho = item.partition('=')
+        arquivos[f'especialista_{especie.lower()}'] = caminho
+    manifesto = registro.publicar(args.versao, arquivos, descricao=args.descricao)
+    print(f"✅ Versão {args.versao} publicada ({len(manifesto['arquivos'])} arquivos)")
+    if args.ativar:
+        registro.ativar(args.versao)
+        print(f"👉 ATUAL → {args.versao}")
+
+
+if __name__ == "__main__":
+    main()
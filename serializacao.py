@@ -0,0 +1,64 @@
+import json
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Modos de resposta:
+# - 'completo': formato original, com `debug_info` detalhado
+# - 'compacto': apenas classe, saúde e confianças (sem as strings de debug)
+MODOS_RESPOSTA = ('completo', 'compacto')
+
+TIPO_JSON = 'application/json'
+TIPO_JSON_COMPACTO = 'application/vnd.plant.compacto+json'
+TIPOS_MSGPACK = ('application/msgpack', 'application/x-msgpack')
+
+
+def negociar_formato(modo: Optional[str], accept: Optional[str], padrao: str = 'completo') -> Tuple[str, bool]:
+    """
+    Escolhe o modo de resposta e se o corpo será MessagePack
+
+    O modo vem do parâmetro `modo` da query ou, na falta dele, do `Accept`
+    (`application/vnd.plant.compacto+json`). `Accept: application/msgpack`
+    seleciona o formato binário.
+
+    Returns:
+        tuple: (modo, msgpack)
+    """
+    accept = (accept or '').lower()
+    binario = any(tipo in accept for tipo in TIPOS_MSGPACK)
+
+    if modo is None:
+        modo = 'compacto' if TIPO_JSON_COMPACTO in accept else padrao
+    if modo not in MODOS_RESPOSTA:
+        raise HTTPException(status_code=400, detail=f"Modo de resposta inválido: {modo}. Opções: {MODOS_RESPOSTA}")
+    if binario and msgpack is None:
+        raise HTTPException(status_code=406, detail="Resposta MessagePack indisponível (pacote msgpack não instalado)")
+    return modo, binario
+
+
+def json_bytes(conteudo: Any) -> bytes:
+    """Serializa para JSON em UTF-8 (orjson quando disponível)"""
+    if orjson is not None:
+        return orjson.dumps(conteudo, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(conteudo, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def resposta(conteudo: Any, binario: bool = False, status_code: int = 200) -> Response:
+    """Resposta HTTP em JSON (orjson, se instalado) ou MessagePack"""
+    if binario:
+        return Response(msgpack.packb(conteudo, use_bin_type=True), status_code=status_code,
+                        media_type=TIPOS_MSGPACK[0])
+    if orjson is not None:
+        return Response(json_bytes(conteudo), status_code=status_code, media_type=TIPO_JSON)
+    return JSONResponse(content=conteudo, status_code=status_code)
@@ -0,0 +1,242 @@
+"""
+Servidor de inferência compartilhado entre os workers do uvicorn
+
+Os modelos são carregados uma única vez neste processo. Os workers da API
+(iniciados com SERVIDOR_INFERENCIA=<socket>) não carregam TensorFlow nem os
+modelos: enviam os lotes de imagens por memória compartilhada e recebem os
+resultados do pipeline hierárquico. A memória total fica praticamente
+constante ao adicionar workers, e novos workers sobem em segundos.
+
+O protocolo de `multiprocessing.connection` troca objetos serializados com
+pickle: quem se conecta ao socket consegue executar código neste processo.
+Por isso a chave de autenticação (SERVIDOR_INFERENCIA_CHAVE) é obrigatória,
+sem valor padrão, e o socket é criado com permissão 0600 (apenas o usuário
+que iniciou o servidor, o mesmo dos workers).
+
+Uso:
+    export SERVIDOR_INFERENCIA_CHAVE=$(python -c "import secrets; print(secrets.token_hex(32))")
+    python servidor_inferencia.py --endereco /tmp/plant_inferencia.sock
+    SERVIDOR_INFERENCIA=/tmp/plant_inferencia.sock uvicorn api:app --workers 4
+"""
+import argparse
+import logging
+import os
+import queue
+import threading
+from multiprocessing import resource_tracker
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+ENDERECO_PADRAO = '/tmp/plant_inferencia.sock'
+
+logger = logging.getLogger('plant_api')
+
+
+def chave_autenticacao() -> bytes:
+    """
+    Chave compartilhada entre o servidor e os workers (SERVIDOR_INFERENCIA_CHAVE)
+
+    Raises:
+        RuntimeError: Se a variável não estiver definida
+    """
+    chave = os.getenv('SERVIDOR_INFERENCIA_CHAVE', '')
+    if not chave:
+        raise RuntimeError(
+            "Defina SERVIDOR_INFERENCIA_CHAVE (a mesma no servidor e nos workers), por exemplo com "
+            "python -c \"import secrets; print(secrets.token_hex(32))\""
+        )
+    return chave.encode('utf-8')
+
+
+class _BufferCompartilhado:
+    """Bloco de memória compartilhada reaproveitado entre chamadas (cresce sob demanda)"""
+
+    def __init__(self):
+        self.shm: Optional[SharedMemory] = None
+
+    def escrever(self, array: np.ndarray) -> Dict[str, Any]:
+        """Copia o array para o bloco e retorna a descrição enviada ao servidor"""
+        if self.shm is None or self.shm.size < array.nbytes:
+            self.liberar()
+            self.shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+        destino = np.ndarray(array.shape, dtype=array.dtype, buffer=self.shm.buf)
+        destino[...] = array
+        return {'nome': self.shm.name, 'forma': array.shape, 'dtype': array.dtype.str}
+
+    def liberar(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+class ClienteInferencia:
+    """
+    Cliente usado pelos workers da API
+
+    Mantém uma conexão (e um bloco de memória compartilhada) por chamada
+    concorrente, já que conexões não são thread-safe.
+    """
+
+    def __init__(self, endereco: str = ENDERECO_PADRAO, conexoes: int = 2, chave: Optional[bytes] = None):
+        self.endereco = endereco
+        self.chave = chave = chave or chave_autenticacao()
+        self._livres: queue.Queue = queue.Queue()
+        for _ in range(conexoes):
+            self._livres.put((Client(endereco, authkey=chave), _BufferCompartilhado()))
+
+    def chamar(self, operacao: str, array: np.ndarray, *args) -> Any:
+        """Executa uma operação do servidor com `array` passado por memória compartilhada"""
+        conexao, buffer = self._livres.get()
+        try:
+            descricao = buffer.escrever(np.ascontiguousarray(array))
+            conexao.send((operacao, descricao, args))
+            ok, resposta = conexao.recv()
+        finally:
+            self._livres.put((conexao, buffer))
+        if not ok:
+            raise RuntimeError(resposta)
+        return resposta
+
+    def controlar(self, operacao: str, *args) -> Any:
+        """Executa uma operação de controle do servidor (sem array)"""
+        conexao, buffer = self._livres.get()
+        try:
+            conexao.send((operacao, None, args))
+            ok, resposta = conexao.recv()
+        finally:
+            self._livres.put((conexao, buffer))
+        if not ok:
+            raise RuntimeError(resposta)
+        return resposta
+
+    def info(self) -> Dict[str, Any]:
+        """Estado dos modelos no servidor de inferência"""
+        return self.controlar('info')
+
+    def fechar(self):
+        while not self._livres.empty():
+            conexao, buffer = self._livres.get_nowait()
+            conexao.close()
+            buffer.liberar()
+
+
+def _anexar(descricao: Dict[str, Any], anexados: Dict[str, SharedMemory]) -> np.ndarray:
+    """Visão (sem cópia) do array escrito pelo worker na memória compartilhada"""
+    shm = anexados.get(descricao['nome'])
+    if shm is None:
+        for antigo in anexados.values():
+            antigo.close()
+        anexados.clear()
+        shm = SharedMemory(name=descricao['nome'])
+        # Quem criou o bloco (o worker) é responsável por removê-lo
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        anexados[descricao['nome']] = shm
+    return np.ndarray(descricao['forma'], dtype=np.dtype(descricao['dtype']), buffer=shm.buf)
+
+
+def _atender(conexao, operacoes: Dict[str, Callable], controles: Dict[str, Callable]):
+    """
+    Atende as chamadas de um worker até a conexão ser fechada
+
+    `operacoes` recebem o array da memória compartilhada; `controles`
+    recebem apenas os argumentos.
+    """
+    anexados: Dict[str, SharedMemory] = {}
+    try:
+        while True:
+            try:
+                operacao, descricao, args = conexao.recv()
+            except EOFError:
+                break
+            try:
+                if operacao in controles:
+                    resposta = controles[operacao](*args)
+                else:
+                    resposta = operacoes[operacao](_anexar(descricao, anexados), *args)
+                conexao.send((True, resposta))
+            except Exception as e:
+                conexao.send((False, getattr(e, 'detail', str(e))))
+    finally:
+        for shm in anexados.values():
+            shm.close()
+        conexao.close()
+
+
+def _escutar(endereco: str, chave: bytes) -> Listener:
+    """Cria o socket já com permissão 0600, sem janela em que outros usuários possam se conectar"""
+    if os.path.exists(endereco):
+        os.remove(endereco)
+    mascara = os.umask(0o177)
+    try:
+        listener = Listener(endereco, family='AF_UNIX', authkey=chave)
+    finally:
+        os.umask(mascara)
+    os.chmod(endereco, 0o600)
+    return listener
+
+
+def servir(endereco: str = ENDERECO_PADRAO, chave: Optional[bytes] = None):
+    """Carrega os modelos uma vez e atende os workers da API"""
+    chave = chave or chave_autenticacao()
+
+    import api
+    from logging_estruturado import configurar_logging
+
+    configurar_logging('plant_api', api.LOG_NIVEL, api.LOG_FORMATO, api.LOG_FILA_MAXIMA)
+    # Os thresholds são aplicados aqui na operação 'pipeline': o servidor
+    # também recarrega o arquivo quando ele muda
+    api.iniciar_monitor_thresholds()
+    api.carregar_modelos()
+
+    operacoes = {
+        'pipeline': api.pipeline_hierarquico_lote,
+        'especies': api.etapa_especies_lote,
+        'saude': api.etapa_saude_lote
+    }
+
+    def info():
+        modelos = api.modelos_ativos
+        return {
+            'versao_modelos': api.versao_modelos,
+            'classes': modelos.encoder_especies.classes_.tolist(),
+            'especialistas': list(modelos.modelos_especialistas.keys()),
+            'backend_inferencia': api.BACKEND_INFERENCIA,
+            'tempos_carregamento': api.tempos_carregamento,
+            'tempos_aquecimento': modelos.tempos_aquecimento
+        }
+
+    def recarregar(versao=None):
+        # Recargas pedidas por qualquer worker acontecem aqui, uma única vez
+        try:
+            return api.iniciar_recarga(versao)
+        except api.HTTPException as e:
+            return {'erro_http': e.status_code, 'detail': e.detail}
+
+    controles = {
+        'info': info,
+        'modelos': api.info_modelos,
+        'recarregar': recarregar
+    }
+
+    with _escutar(endereco, chave) as listener:
+        logger.info("servidor de inferência ouvindo", extra={'campos': {'endereco': endereco}})
+        while True:
+            try:
+                conexao = listener.accept()
+            except AuthenticationError:
+                logger.warning("conexão recusada: chave de autenticação inválida")
+                continue
+            threading.Thread(target=_atender, args=(conexao, operacoes, controles), daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de inferência compartilhado entre workers da API")
+    parser.add_argument('--endereco', default=os.getenv('SERVIDOR_INFERENCIA', ENDERECO_PADRAO),
+                        help="Caminho do socket Unix")
+    args = parser.parse_args()
+    servir(args.endereco)
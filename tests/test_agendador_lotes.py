@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from agendador_lotes import AgendadorLotes
+
+
+def _pipeline_fake(lotes_recebidos):
+    def funcao_lote(img_batch):
+        lotes_recebidos.append(len(img_batch))
+        return [{'valor': float(img[0, 0, 0])} for img in img_batch]
+    return funcao_lote
+
+
+def _imagem(valor):
+    return np.full((1, 2, 2, 3), valor, dtype=np.float32)
+
+
+def test_agrupa_requisicoes_concorrentes_em_um_lote():
+    lotes = []
+
+    async def cenario():
+        agendador = AgendadorLotes(_pipeline_fake(lotes), janela_ms=50, tamanho_maximo=16)
+        await agendador.iniciar()
+        try:
+            return await asyncio.gather(*(agendador.submeter(_imagem(i)) for i in range(5))), agendador
+        finally:
+            await agendador.parar()
+
+    resultados, agendador = asyncio.run(cenario())
+    assert [r['valor'] for r in resultados] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert lotes == [5]
+    assert agendador.estatisticas()['histograma_tamanho_lote'] == {'5': 1}
+
+
+def test_respeita_tamanho_maximo():
+    lotes = []
+
+    async def cenario():
+        agendador = AgendadorLotes(_pipeline_fake(lotes), janela_ms=50, tamanho_maximo=4)
+        await agendador.iniciar()
+        try:
+            return await asyncio.gather(*(agendador.submeter(_imagem(i)) for i in range(10)))
+        finally:
+            await agendador.parar()
+
+    resultados = asyncio.run(cenario())
+    assert [r['valor'] for r in resultados] == [float(i) for i in range(10)]
+    assert max(lotes) <= 4 and sum(lotes) == 10
+
+
+def test_janela_fecha_lote_sem_esperar_tamanho_maximo():
+    lotes = []
+
+    async def cenario():
+        agendador = AgendadorLotes(_pipeline_fake(lotes), janela_ms=20, tamanho_maximo=64)
+        await agendador.iniciar()
+        try:
+            inicio = time.perf_counter()
+            await agendador.submeter(_imagem(1))
+            return time.perf_counter() - inicio
+        finally:
+            await agendador.parar()
+
+    duracao = asyncio.run(cenario())
+    assert lotes == [1]
+    assert duracao < 1.0
+
+
+def test_erro_do_pipeline_chega_a_todas_as_requisicoes_do_lote():
+    def falhar(img_batch):
+        raise RuntimeError('modelo indisponível')
+
+    async def cenario():
+        agendador = AgendadorLotes(falhar, janela_ms=20, tamanho_maximo=8)
+        await agendador.iniciar()
+        try:
+            return await asyncio.gather(*(agendador.submeter(_imagem(i)) for i in range(3)),
+                                        return_exceptions=True)
+        finally:
+            await agendador.parar()
+
+    resultados = asyncio.run(cenario())
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+
+
+def test_falha_ao_montar_o_lote_nao_derruba_o_agendador():
+    lotes = []
+
+    async def cenario():
+        agendador = AgendadorLotes(_pipeline_fake(lotes), janela_ms=20, tamanho_maximo=8)
+        await agendador.iniciar()
+        try:
+            # Formas incompatíveis: np.concatenate falha antes da inferência
+            erros = await asyncio.gather(agendador.submeter(_imagem(1)),
+                                         agendador.submeter(np.zeros((1, 3, 3, 3), dtype=np.float32)),
+                                         return_exceptions=True)
+            seguinte = await asyncio.wait_for(agendador.submeter(_imagem(2)), 2)
+            return erros, seguinte
+        finally:
+            await agendador.parar()
+
+    erros, seguinte = asyncio.run(cenario())
+    assert all(isinstance(e, ValueError) for e in erros)
+    assert seguinte == {'valor': 2.0}
+
+
+def test_pipeline_com_resultados_faltando_falha_todas_as_requisicoes():
+    async def cenario():
+        agendador = AgendadorLotes(lambda img_batch: [{}], janela_ms=20, tamanho_maximo=8)
+        await agendador.iniciar()
+        try:
+            return await asyncio.wait_for(asyncio.gather(
+                *(agendador.submeter(_imagem(i)) for i in range(3)), return_exceptions=True), 2)
+        finally:
+            await agendador.parar()
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(cenario()))
+
+
+@pytest.mark.parametrize('lotes_simultaneos,sobrepostos', [(1, False), (2, True)])
+def test_lotes_simultaneos(lotes_simultaneos, sobrepostos):
+    barreira = threading.Barrier(2, timeout=0.5)
+
+    def funcao_lote(img_batch):
+        # Só passa se outro lote estiver em execução ao mesmo tempo
+        try:
+            barreira.wait()
+            return [{'sobreposto': True} for _ in img_batch]
+        except threading.BrokenBarrierError:
+            return [{'sobreposto': False} for _ in img_batch]
+
+    async def cenario():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            agendador = AgendadorLotes(funcao_lote, janela_ms=1, tamanho_maximo=1, executor=executor,
+                                       lotes_simultaneos=lotes_simultaneos)
+            await agendador.iniciar()
+            try:
+                return await asyncio.gather(agendador.submeter(_imagem(1)), agendador.submeter(_imagem(2)))
+            finally:
+                await agendador.parar()
+
+    resultados = asyncio.run(cenario())
+    assert all(r['sobreposto'] == sobrepostos for r in resultados)
@@ -0,0 +1,63 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+tf = pytest.importorskip('tensorflow')
+
+from backbone_compartilhado import construir_backbone_compartilhado, encontrar_corte_comum
+
+
+def _mini_resnet(saidas: int, semente: int):
+    """ResNet mínima com os nomes de camada da ResNet50 (pool1_pool, convN_blockM_out)"""
+    from tensorflow.keras import layers
+
+    tf.keras.utils.set_random_seed(semente)
+    entrada = layers.Input(shape=(32, 32, 3), name='input_1')
+    x = layers.Conv2D(8, 3, padding='same', activation='relu', name='conv1_conv')(entrada)
+    x = layers.MaxPooling2D(name='pool1_pool')(x)
+    for bloco in (1, 2):
+        atalho = x
+        y = layers.Conv2D(8, 3, padding='same', activation='relu', name=f'conv2_block{bloco}_1_conv')(x)
+        y = layers.Conv2D(8, 3, padding='same', name=f'conv2_block{bloco}_2_conv')(y)
+        x = layers.Add(name=f'conv2_block{bloco}_add')([atalho, y])
+        x = layers.Activation('relu', name=f'conv2_block{bloco}_out')(x)
+    x = layers.GlobalAveragePooling2D(name='avg_pool')(x)
+    x = layers.Dense(saidas, activation='sigmoid' if saidas == 1 else 'softmax', name='saida')(x)
+    return tf.keras.Model(entrada, x)
+
+
+@pytest.fixture
+def modelos():
+    especies = _mini_resnet(3, semente=0)
+    especialista = _mini_resnet(1, semente=1)
+    # Tronco idêntico até conv2_block1_out; o resto "passou por fine-tuning"
+    for camada in especies.layers:
+        if camada.name.startswith(('conv1', 'pool1', 'conv2_block1')) and camada.weights:
+            especialista.get_layer(camada.name).set_weights(camada.get_weights())
+    return especies, especialista
+
+
+def test_corte_comum(modelos):
+    especies, especialista = modelos
+    assert encontrar_corte_comum(especies, especialista) == 'conv2_block1_out'
+
+
+def test_tronco_mais_cabecas_igual_aos_modelos_completos(modelos):
+    especies, especialista = modelos
+    backbone = construir_backbone_compartilhado(especies, {'tomato': especialista}, corte_minimo='pool1_pool')
+    assert backbone.corte == 'conv2_block1_out'
+
+    imagens = np.random.default_rng(0).random((4, 32, 32, 3)).astype(np.float32)
+    features = backbone.extrair(imagens)
+    np.testing.assert_allclose(backbone.cabeca_especies.predict(features, verbose=0),
+                               especies.predict(imagens, verbose=0), rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(backbone.cabecas_especialistas['tomato'].predict(features, verbose=0),
+                               especialista.predict(imagens, verbose=0), rtol=1e-5, atol=1e-6)
+
+
+def test_cabeca_independente_do_modelo_completo(modelos):
+    especies, especialista = modelos
+    backbone = construir_backbone_compartilhado(especies, {'tomato': especialista}, corte_minimo='pool1_pool')
+    cabeca = backbone.cabecas_especialistas['tomato']
+    assert not {id(c) for c in cabeca.layers} & {id(c) for c in especialista.layers}
+    assert 'conv1_conv' not in {c.name for c in cabeca.layers}
+    assert cabeca.count_params() < especialista.count_params()
@@ -0,0 +1,53 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+tf = pytest.importorskip('tensorflow')
+
+from backends_inferencia import BackendTFLite
+
+
+def _modelo():
+    tf.keras.utils.set_random_seed(0)
+    entrada = tf.keras.layers.Input(shape=(8, 8, 3))
+    x = tf.keras.layers.Conv2D(4, 3, activation='relu')(entrada)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    return tf.keras.Model(entrada, tf.keras.layers.Dense(2, activation='softmax')(x))
+
+
+def _exportar(modelo, destino, int8=False):
+    conversor = tf.lite.TFLiteConverter.from_keras_model(modelo)
+    if int8:
+        gerador = np.random.default_rng(1)
+        conversor.optimizations = [tf.lite.Optimize.DEFAULT]
+        conversor.representative_dataset = lambda: (
+            [gerador.random((1, 8, 8, 3), dtype=np.float32)] for _ in range(32))
+        conversor.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        conversor.inference_input_type = tf.int8
+        conversor.inference_output_type = tf.int8
+    destino.write_bytes(conversor.convert())
+    return str(destino)
+
+
+@pytest.fixture(scope='module')
+def modelo():
+    return _modelo()
+
+
+def test_lotes_de_tamanhos_variados(modelo, tmp_path):
+    backend = BackendTFLite(_exportar(modelo, tmp_path / 'modelo.tflite'))
+    imagens = np.random.default_rng(0).random((7, 8, 8, 3), dtype=np.float32)
+    for tamanho in (1, 7, 3, 1):
+        np.testing.assert_allclose(backend.predict(imagens[:tamanho]), modelo.predict(imagens[:tamanho], verbose=0),
+                                   atol=1e-5)
+
+
+def test_int8_satura_entradas_fora_do_intervalo(modelo, tmp_path):
+    backend = BackendTFLite(_exportar(modelo, tmp_path / 'modelo_int8.tflite', int8=True))
+    escala, zero = backend._entrada['quantization']
+    limite_superior = (127 - zero) * escala
+    # Acima do intervalo representável: deve virar 127, não dar a volta para valores negativos
+    fora = np.full((2, 8, 8, 3), limite_superior * 3, dtype=np.float32)
+    no_limite = np.full((2, 8, 8, 3), limite_superior, dtype=np.float32)
+    assert backend._quantizar_entrada(fora).max() == 127
+    np.testing.assert_array_equal(backend._quantizar_entrada(fora), backend._quantizar_entrada(no_limite))
+    np.testing.assert_allclose(backend.predict(fora), backend.predict(no_limite))
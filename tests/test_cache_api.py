@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('fastapi')
+
+import api
+from cache_predicoes import CachePredicoes
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = CachePredicoes()
+    monkeypatch.setattr(api, 'cache_predicoes', cache)
+    return cache
+
+
+def test_chave_usa_a_versao_do_inicio_da_requisicao(cache, monkeypatch):
+    monkeypatch.setattr(api, 'versao_modelos', 'v2')
+    assert api._chave_cache(b'img', 'v1') != api._chave_cache(b'img', 'v2')
+
+
+def test_resultado_de_outra_versao_nao_e_guardado(cache):
+    chave = api._chave_cache(b'img', 'v1')
+    api._guardar_cache(chave, 'v1', {'versao_modelos': 'v2'})
+    assert cache.obter(chave) is None
+    api._guardar_cache(chave, 'v1', {'versao_modelos': 'v1'})
+    assert cache.obter(chave) == {'versao_modelos': 'v1'}
+
+
+def test_stream_responde_pelo_cache_sem_decodificar(cache):
+    # Só o cabeçalho PNG: passa na validação, mas não seria decodificável
+    png = b'\x89PNG\r\n\x1a\n' + b'\x00' * 16
+    cache.guardar(api._chave_cache(png, 'v1'), {'versao_modelos': 'v1'})
+    itens = api._estagio_decodificar([{'arquivo': 'a.png', 'bytes': png, 'erro': None}], versao='v1')
+    assert itens[0]['resultado'] == {'versao_modelos': 'v1'}
+    assert 'imagem' not in itens[0]
+    assert api._estagio_especies(itens) == itens
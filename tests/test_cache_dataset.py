@@ -0,0 +1,48 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+import cache_dataset
+
+
+@pytest.fixture
+def csv_com_imagens(tmp_path):
+    rng = np.random.default_rng(0)
+    linhas = []
+    for i, split in enumerate(('train', 'train', 'val', 'test')):
+        caminho = tmp_path / f'img_{i}.png'
+        Image.fromarray(rng.integers(0, 256, (37, 53, 3), dtype=np.uint8)).save(caminho)
+        linhas.append({'caminho': str(caminho), 'especie': 'Tomato', 'split': split})
+    caminho_csv = tmp_path / 'dataset_teste.csv'
+    pd.DataFrame(linhas).to_csv(caminho_csv, index=False)
+    return str(caminho_csv), linhas
+
+
+def test_cache_usa_vizinho_mais_proximo(tmp_path, csv_com_imagens):
+    caminho_csv, linhas = csv_com_imagens
+    diretorio = cache_dataset.construir_cache(caminho_csv, str(tmp_path / 'cache'), tamanho=(16, 24))
+
+    X = np.load(os.path.join(diretorio, 'train.npy'))
+    esperado = np.asarray(Image.open(linhas[0]['caminho']).convert('RGB').resize((24, 16), Image.NEAREST))
+    np.testing.assert_array_equal(X[0], esperado)
+
+    with open(os.path.join(diretorio, 'metadados.json')) as f:
+        assert json.load(f)['interpolacao'] == 'nearest'
+    assert cache_dataset.cache_atualizado(caminho_csv, diretorio, (16, 24), 'exato')
+
+
+def test_cache_sem_interpolacao_registrada_esta_desatualizado(tmp_path, csv_com_imagens):
+    caminho_csv, _ = csv_com_imagens
+    diretorio = cache_dataset.construir_cache(caminho_csv, str(tmp_path / 'cache'), tamanho=(16, 24))
+    caminho_meta = os.path.join(diretorio, 'metadados.json')
+    with open(caminho_meta) as f:
+        meta = json.load(f)
+    del meta['interpolacao']
+    with open(caminho_meta, 'w') as f:
+        json.dump(meta, f)
+
+    assert not cache_dataset.cache_atualizado(caminho_csv, diretorio, (16, 24), 'exato')
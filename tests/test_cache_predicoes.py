@@ -0,0 +1,44 @@
+from cache_predicoes import CachePredicoes
+
+THRESHOLDS = {'tomato': 0.75, 'potato': 0.65, 'pepper': 0.15}
+
+
+def test_chave_estavel_e_independente_da_ordem_dos_thresholds():
+    invertidos = dict(reversed(list(THRESHOLDS.items())))
+    assert CachePredicoes.chave(b'img', 'v1', THRESHOLDS) == CachePredicoes.chave(b'img', 'v1', invertidos)
+
+
+def test_chave_muda_com_imagem_versao_thresholds_e_configuracao():
+    base = CachePredicoes.chave(b'img', 'v1', THRESHOLDS, {'politica': 'padrao'})
+    variacoes = [
+        CachePredicoes.chave(b'outra', 'v1', THRESHOLDS, {'politica': 'padrao'}),
+        CachePredicoes.chave(b'img', 'v2', THRESHOLDS, {'politica': 'padrao'}),
+        CachePredicoes.chave(b'img', 'v1', dict(THRESHOLDS, tomato=0.7), {'politica': 'padrao'}),
+        CachePredicoes.chave(b'img', 'v1', THRESHOLDS, {'politica': 'top_k', 'top_k': 2, 'margem': 0.2}),
+    ]
+    assert base not in variacoes
+    assert len(set(variacoes)) == len(variacoes)
+
+
+def test_memoria_lru_remove_o_menos_usado():
+    cache = CachePredicoes(max_itens=2)
+    cache.guardar('a', {'v': 1})
+    cache.guardar('b', {'v': 2})
+    assert cache.obter('a') == {'v': 1}
+    cache.guardar('c', {'v': 3})
+    assert cache.obter('b') is None
+    assert cache.obter('a') == {'v': 1}
+    assert cache.estatisticas()['remocoes'] == 1
+
+
+def test_memoria_expira_por_ttl():
+    cache = CachePredicoes(ttl_segundos=-1)
+    cache.guardar('a', {'v': 1})
+    assert cache.obter('a') is None
+    assert cache.estatisticas()['remocoes'] == 1
+
+
+def test_disco_compartilha_entradas(tmp_path):
+    CachePredicoes(backend='disco', diretorio=str(tmp_path)).guardar('a', {'v': 1})
+    outro_worker = CachePredicoes(backend='disco', diretorio=str(tmp_path))
+    assert outro_worker.obter('a') == {'v': 1}
@@ -0,0 +1,33 @@
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+pytest.importorskip('fastapi')
+
+import api
+import classificar_em_lote
+
+
+class _Interrompido(Exception):
+    pass
+
+
+def test_carrega_modelos_sem_aquecimento(tmp_path, monkeypatch):
+    Image.fromarray(np.zeros((8, 8, 3), dtype=np.uint8)).save(tmp_path / 'folha.png')
+    monkeypatch.setattr(api, 'AQUECIMENTO_ATIVO', True)
+    monkeypatch.setattr(api, 'carregar_thresholds', lambda: None)
+    aquecimento = []
+
+    def carregar_modelos():
+        aquecimento.append(api.AQUECIMENTO_ATIVO)
+        raise _Interrompido()
+
+    monkeypatch.setattr(api, 'carregar_modelos', carregar_modelos)
+    monkeypatch.setattr(sys, 'argv', ['classificar_em_lote.py', '--diretorio', str(tmp_path),
+                                      '--saida', str(tmp_path / 'saida.csv')])
+
+    with pytest.raises(_Interrompido):
+        classificar_em_lote.main()
+    assert aquecimento == [False]
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import pytest
+
+from executor_inferencia import ExecutorInferencia, PoolSaturado
+
+
+@pytest.fixture
+def executor():
+    executor = ExecutorInferencia(threads_inferencia=1, workers_decodificacao=1,
+                                  modo_decodificacao='threads', limite_pendentes=2)
+    yield executor
+    executor.encerrar()
+
+
+def test_recusa_acima_do_limite_de_pendentes(executor):
+    executor.reservar()
+    executor.reservar()
+    with pytest.raises(PoolSaturado):
+        executor.reservar()
+    assert executor.estatisticas()['total_recusadas'] == 1
+
+    executor.liberar()
+    executor.reservar()
+    assert executor.em_andamento == 2
+
+
+def test_admitir_libera_a_vaga_mesmo_com_erro(executor):
+    async def cenario():
+        with pytest.raises(ValueError):
+            async with executor.admitir():
+                assert executor.em_andamento == 1
+                raise ValueError()
+        async with executor.admitir():
+            async with executor.admitir():
+                with pytest.raises(PoolSaturado):
+                    async with executor.admitir():
+                        pass
+
+    asyncio.run(cenario())
+    assert executor.em_andamento == 0
+    assert executor.total_recusadas == 1
+
+
+def test_estatisticas_dos_pools(executor):
+    liberar = threading.Event()
+
+    async def cenario():
+        tarefas = [asyncio.ensure_future(executor.inferir(liberar.wait)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        estatisticas = executor.estatisticas()['inferencia']
+        liberar.set()
+        await asyncio.gather(*tarefas)
+        return estatisticas
+
+    assert asyncio.run(cenario()) == {'workers': 1, 'em_execucao': 1, 'em_fila': 2}
+    assert executor.estatisticas()['inferencia']['em_fila'] == 0
+    assert executor.estatisticas()['decodificacao']['modo'] == 'threads'
+
+
+def test_api_responde_503_com_retry_after_quando_saturada(executor, monkeypatch):
+    pytest.importorskip('numpy')
+    pytest.importorskip('httpx')
+    from fastapi.testclient import TestClient
+
+    import api
+
+    executor.limite_pendentes = 0
+    monkeypatch.setattr(api, 'executor_inferencia', executor)
+    monkeypatch.setattr(api, 'modelos_prontos', True)
+
+    resposta = TestClient(api.app).post('/predict', files={'file': ('folha.png', b'\x89PNG\r\n\x1a\n', 'image/png')})
+    assert resposta.status_code == 503
+    assert resposta.headers['Retry-After'] == str(api.RETRY_AFTER_SEGUNDOS)
+    assert executor.total_recusadas == 1
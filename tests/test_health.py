@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('httpx')
+from fastapi.testclient import TestClient
+
+import api
+
+
+@pytest.fixture
+def cliente():
+    # Sem o lifespan: o carregamento dos modelos não é disparado
+    return TestClient(api.app)
+
+
+def test_carregando(cliente, monkeypatch):
+    monkeypatch.setattr(api, 'modelos_prontos', False)
+    monkeypatch.setattr(api, 'erro_carregamento', None)
+    assert cliente.get('/health/live').status_code == 200
+    resposta = cliente.get('/health/ready')
+    assert resposta.status_code == 503 and resposta.json()['status'] == 'carregando'
+
+
+def test_erro_de_carregamento_aparece_na_readiness_e_nao_na_liveness(cliente, monkeypatch):
+    monkeypatch.setattr(api, 'modelos_prontos', False)
+    monkeypatch.setattr(api, 'erro_carregamento', 'arquivo ausente')
+    assert cliente.get('/health/live').json() == {'status': 'ok'}
+    resposta = cliente.get('/health/ready')
+    assert resposta.status_code == 503
+    assert resposta.json()['status'] == 'erro' and resposta.json()['erro'] == 'arquivo ausente'
+
+
+def test_pronto(cliente, monkeypatch):
+    monkeypatch.setattr(api, 'modelos_prontos', True)
+    monkeypatch.setattr(api, 'erro_carregamento', None)
+    assert cliente.get('/health/ready').json()['status'] == 'pronto'
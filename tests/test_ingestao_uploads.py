@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+from ingestao_uploads import MiddlewareLimiteCorpo
+
+
+def _app_que_le_o_corpo(lidos):
+    async def app(scope, receive, send):
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'http.disconnect':
+                raise RuntimeError('cliente desconectou')
+            lidos.append(mensagem.get('body', b''))
+            if not mensagem.get('more_body'):
+                break
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'ok'})
+    return app
+
+
+def _executar(middleware, scope, partes):
+    enviados = []
+    fila = [{'type': 'http.request', 'body': parte, 'more_body': i < len(partes) - 1}
+            for i, parte in enumerate(partes)]
+
+    async def receive():
+        return fila.pop(0) if fila else {'type': 'http.disconnect'}
+
+    async def send(mensagem):
+        enviados.append(mensagem)
+
+    asyncio.run(middleware(scope, receive, send))
+    status = enviados[0]['status']
+    corpo = b''.join(m.get('body', b'') for m in enviados[1:])
+    return status, corpo
+
+
+def _scope(caminho='/predict', metodo='POST', content_length=None):
+    headers = [] if content_length is None else [(b'content-length', str(content_length).encode())]
+    return {'type': 'http', 'path': caminho, 'method': metodo, 'headers': headers}
+
+
+def test_dentro_do_limite_passa():
+    lidos = []
+    middleware = MiddlewareLimiteCorpo(_app_que_le_o_corpo(lidos), {'/predict': 10})
+    status, corpo = _executar(middleware, _scope(content_length=8), [b'1234', b'5678'])
+    assert status == 200 and corpo == b'ok'
+    assert b''.join(lidos) == b'12345678'
+
+
+def test_content_length_acima_do_limite_recusado_sem_ler_o_corpo():
+    lidos = []
+    middleware = MiddlewareLimiteCorpo(_app_que_le_o_corpo(lidos), {'/predict': 10})
+    status, corpo = _executar(middleware, _scope(content_length=11), [b'x' * 11])
+    assert status == 413
+    assert 'limite de 10 bytes' in json.loads(corpo)['detail']
+    assert lidos == []
+
+
+def test_content_length_invalido():
+    middleware = MiddlewareLimiteCorpo(_app_que_le_o_corpo([]), {'/predict': 10})
+    assert _executar(middleware, _scope(content_length='abc'), [b''])[0] == 400
+    assert _executar(middleware, _scope(content_length=-1), [b''])[0] == 400
+
+
+def test_chunked_interrompido_ao_passar_do_limite():
+    lidos = []
+    middleware = MiddlewareLimiteCorpo(_app_que_le_o_corpo(lidos), {'/predict': 10})
+    status, _ = _executar(middleware, _scope(), [b'x' * 6, b'x' * 6, b'x' * 6])
+    assert status == 413
+    assert len(lidos) == 1
+
+
+def test_rotas_sem_limite_e_outros_metodos_nao_sao_afetados():
+    middleware = MiddlewareLimiteCorpo(_app_que_le_o_corpo([]), {'/predict': 10})
+    assert _executar(middleware, _scope('/predict_batch', content_length=100), [b'x' * 100])[0] == 200
+    assert _executar(middleware, _scope(metodo='PUT', content_length=100), [b'x' * 100])[0] == 200
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import logging
+import queue
+
+import pytest
+
+from logging_estruturado import (MiddlewareIdRequisicao, _HandlerFila, configurar_logging, id_requisicao,
+                                 logs_descartados)
+
+
+@pytest.fixture
+def logger_com_fila():
+    fila = queue.Queue(maxsize=2)
+    handler = _HandlerFila(fila)
+    logger = logging.getLogger('plant_api_teste')
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    yield logger, fila
+    logger.removeHandler(handler)
+
+
+def test_fila_cheia_descarta_sem_bloquear(logger_com_fila):
+    logger, fila = logger_com_fila
+    for i in range(5):
+        logger.info("evento %d", i)
+
+    assert fila.qsize() == 2
+    assert [fila.get_nowait().msg for _ in range(2)] == ['evento 0', 'evento 1']
+    assert logs_descartados('plant_api_teste') == 3
+
+
+def _chamar(app, cabecalhos=()):
+    enviadas = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(mensagem):
+        enviadas.append(mensagem)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': '/', 'headers': list(cabecalhos)}
+    asyncio.run(app(scope, receive, send))
+    return dict(enviadas[0]['headers'])
+
+
+def _app_que_registra(logger):
+    async def app(scope, receive, send):
+        logger.info("predicao", extra={'campos': {'especie': 'Tomato'}})
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+    return MiddlewareIdRequisicao(app)
+
+
+def test_id_da_requisicao_chega_ao_log_e_a_resposta(logger_com_fila):
+    logger, fila = logger_com_fila
+    cabecalhos = _chamar(_app_que_registra(logger), [(b'x-request-id', b'abc-123')])
+
+    assert cabecalhos[b'x-request-id'] == b'abc-123'
+    registro = fila.get_nowait()
+    assert registro.id_requisicao == 'abc-123'
+    assert registro.campos == {'especie': 'Tomato'}
+    assert id_requisicao.get() is None
+
+
+def test_id_gerado_quando_o_cliente_nao_envia(logger_com_fila):
+    logger, fila = logger_com_fila
+    cabecalhos = _chamar(_app_que_registra(logger))
+
+    gerado = cabecalhos[b'x-request-id'].decode()
+    assert len(gerado) == 32
+    assert fila.get_nowait().id_requisicao == gerado
+
+
+def test_configurar_logging_escreve_json_em_stdout(capsys):
+    ouvinte = configurar_logging('plant_api_teste_json', 'INFO', 'json', fila_maxima=100)
+    logger = logging.getLogger('plant_api_teste_json')
+    token = id_requisicao.set('req-1')
+    try:
+        logger.info("modelos carregados", extra={'campos': {'versao_modelos': 'v3'}})
+        logger.debug("ignorado")
+    finally:
+        id_requisicao.reset(token)
+        ouvinte.stop()
+
+    linhas = capsys.readouterr().out.splitlines()
+    assert len(linhas) == 1
+    evento = json.loads(linhas[0])
+    assert evento['mensagem'] == 'modelos carregados'
+    assert evento['nivel'] == 'INFO' and evento['logger'] == 'plant_api_teste_json'
+    assert evento['id_requisicao'] == 'req-1' and evento['versao_modelos'] == 'v3'
+
+
+def test_formato_invalido():
+    with pytest.raises(ValueError):
+        configurar_logging('plant_api_teste_json', formato='xml')
@@ -0,0 +1,27 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+tf = pytest.importorskip('tensorflow')
+
+from utils import medir_vazao
+
+
+def _dataset(lotes, tamanho_lote=4):
+    x = np.zeros((lotes * tamanho_lote, 2, 2, 3), dtype=np.float32)
+    y = np.zeros(lotes * tamanho_lote, dtype=np.int32)
+    return tf.data.Dataset.from_tensor_slices((x, y)).batch(tamanho_lote)
+
+
+@pytest.mark.parametrize('lotes', [1, 2])
+def test_sem_lotes_apos_o_aquecimento(lotes):
+    assert medir_vazao(_dataset(lotes)) is None
+    assert medir_vazao(_dataset(lotes), lotes=0) is None
+
+
+def test_mede_a_passagem_inteira():
+    assert medir_vazao(_dataset(5)) > 0
+
+
+def test_pedido_maior_que_o_dataset_mede_o_que_houver():
+    assert medir_vazao(_dataset(3), lotes=10) > 0
+    assert medir_vazao(_dataset(2), lotes=10) is None
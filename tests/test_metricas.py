@@ -0,0 +1,106 @@
+import pytest
+
+from metricas import Registro
+
+
+def test_contador_com_rotulos_no_formato_texto():
+    registro = Registro()
+    predicoes = registro.contador('plant_predicoes_total', 'Predições por espécie', ['especie', 'saude'])
+    predicoes.inc(especie='Tomato', saude='doente')
+    predicoes.inc(2, especie='Potato', saude='saudavel')
+    predicoes.inc(especie='Tomato', saude='doente')
+
+    assert registro.expor() == (
+        '# HELP plant_predicoes_total Predições por espécie\n'
+        '# TYPE plant_predicoes_total counter\n'
+        'plant_predicoes_total{especie="Potato",saude="saudavel"} 2.0\n'
+        'plant_predicoes_total{especie="Tomato",saude="doente"} 2.0\n'
+    )
+    assert predicoes.valor(especie='Tomato', saude='doente') == 2.0
+
+
+def test_histograma_com_buckets_cumulativos_soma_e_contagem():
+    registro = Registro()
+    latencia = registro.histograma('plant_latencia_segundos', 'Latência', ['etapa'], buckets=(0.1, 1.0))
+    for valor in (0.05, 0.1, 0.5, 3.0):
+        latencia.observar(valor, etapa='inferencia')
+
+    assert registro.expor().splitlines()[2:] == [
+        'plant_latencia_segundos_bucket{etapa="inferencia",le="0.1"} 2',
+        'plant_latencia_segundos_bucket{etapa="inferencia",le="1.0"} 3',
+        'plant_latencia_segundos_bucket{etapa="inferencia",le="+Inf"} 4',
+        'plant_latencia_segundos_sum{etapa="inferencia"} 3.65',
+        'plant_latencia_segundos_count{etapa="inferencia"} 4',
+    ]
+
+
+def test_metrica_sem_rotulos_e_valores_escapados():
+    registro = Registro()
+    registro.contador('plant_recargas_total', 'Recargas').inc()
+    erros = registro.contador('plant_erros_total', 'Erros', ['mensagem'])
+    erros.inc(mensagem='arquivo "modelo.h5"\nem C:\\modelos')
+
+    linhas = registro.expor().splitlines()
+    assert 'plant_recargas_total 1.0' in linhas
+    assert r'plant_erros_total{mensagem="arquivo \"modelo.h5\"\nem C:\\modelos"} 1.0' in linhas
+
+
+def test_registro_inativo_ignora_observacoes():
+    registro = Registro(ativo=False)
+    contador = registro.contador('plant_predicoes_total', 'Predições')
+    histograma = registro.histograma('plant_latencia_segundos', 'Latência')
+    contador.inc()
+    histograma.observar(0.2)
+    with histograma.medir():
+        pass
+
+    assert registro.expor() == (
+        '# HELP plant_predicoes_total Predições\n'
+        '# TYPE plant_predicoes_total counter\n'
+        '# HELP plant_latencia_segundos Latência\n'
+        '# TYPE plant_latencia_segundos histogram\n'
+    )
+
+
+def test_medir_observa_o_tempo_do_bloco():
+    registro = Registro()
+    latencia = registro.histograma('plant_latencia_segundos', 'Latência', buckets=(60.0,))
+    with pytest.raises(ValueError):
+        with latencia.medir():
+            raise ValueError()
+    assert 'plant_latencia_segundos_count 1' in registro.expor().splitlines()
+
+
+def test_coletores_sao_chamados_na_exposicao():
+    registro = Registro()
+    estado = {'prontos': 0.0}
+    registro.adicionar_coletor(lambda: [
+        ('plant_modelos_prontos', 'gauge', 'Modelos prontos', [({}, estado['prontos'])]),
+        ('plant_modelo_carregamento_segundos', 'gauge', 'Carregamento',
+         [({'modelo': 'especies', 'status': 'ok'}, 1.5)])
+    ])
+    estado['prontos'] = 1.0
+
+    assert registro.expor() == (
+        '# HELP plant_modelos_prontos Modelos prontos\n'
+        '# TYPE plant_modelos_prontos gauge\n'
+        'plant_modelos_prontos 1.0\n'
+        '# HELP plant_modelo_carregamento_segundos Carregamento\n'
+        '# TYPE plant_modelo_carregamento_segundos gauge\n'
+        'plant_modelo_carregamento_segundos{modelo="especies",status="ok"} 1.5\n'
+    )
+
+
+def test_endpoint_metrics_da_api():
+    pytest.importorskip('numpy')
+    pytest.importorskip('httpx')
+    from fastapi.testclient import TestClient
+
+    import api
+
+    if not api.METRICAS_ATIVAS:
+        pytest.skip('METRICAS_ATIVAS=0')
+    resposta = TestClient(api.app).get('/metrics')
+    assert resposta.status_code == 200
+    assert resposta.headers['content-type'].startswith('text/plain; version=0.0.4')
+    assert '# TYPE plant_modelos_prontos gauge' in resposta.text.splitlines()
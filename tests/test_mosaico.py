@@ -0,0 +1,65 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from mosaico import TAMANHO_TILE, _contar_tiles, agregar_tiles, dimensoes_limitadas, posicoes_eixo
+
+
+def test_posicoes_eixo_imagem_menor_que_o_tile():
+    assert posicoes_eixo(100, TAMANHO_TILE, 0.25).tolist() == [0]
+    assert posicoes_eixo(TAMANHO_TILE, TAMANHO_TILE, 0.25).tolist() == [0]
+
+
+@pytest.mark.parametrize('comprimento', [225, 448, 1000, 4096])
+@pytest.mark.parametrize('sobreposicao', [0.0, 0.25, 0.5])
+def test_posicoes_eixo_cobre_as_bordas_com_sobreposicao_minima(comprimento, sobreposicao):
+    posicoes = posicoes_eixo(comprimento, TAMANHO_TILE, sobreposicao)
+    assert posicoes[0] == 0
+    assert posicoes[-1] == comprimento - TAMANHO_TILE
+    passo_maximo = max(1, int(TAMANHO_TILE * (1 - sobreposicao)))
+    assert np.all(np.diff(posicoes) <= passo_maximo)
+    assert np.all(np.diff(posicoes) > 0)
+
+
+@pytest.mark.parametrize('altura,largura', [(100, 100), (224, 224), (3000, 4000), (4000, 3000), (12000, 9000),
+                                            (224, 4096), (300, 5000)])
+def test_dimensoes_limitadas_respeita_tile_e_lado_maximo(altura, largura):
+    altura_final, largura_final = dimensoes_limitadas(altura, largura, max_tiles=64, lado_maximo=4096)
+    assert min(altura_final, largura_final) >= TAMANHO_TILE
+    assert max(altura_final, largura_final) <= 4096
+
+
+@pytest.mark.parametrize('altura,largura', [(100, 100), (3000, 4000), (12000, 9000)])
+def test_dimensoes_limitadas_respeita_max_tiles(altura, largura):
+    altura_final, largura_final = dimensoes_limitadas(altura, largura, max_tiles=64, lado_maximo=4096)
+    assert _contar_tiles(altura_final, largura_final, TAMANHO_TILE, 0.25) <= 64
+
+
+@pytest.mark.parametrize('altura,largura', [(50, 5000), (5000, 50), (224, 4097)])
+def test_dimensoes_limitadas_recusa_faixas_estreitas(altura, largura):
+    with pytest.raises(ValueError):
+        dimensoes_limitadas(altura, largura, lado_maximo=4096)
+
+
+def test_dimensoes_limitadas_mantem_proporcao():
+    altura_final, largura_final = dimensoes_limitadas(3000, 4000)
+    assert largura_final / altura_final == pytest.approx(4000 / 3000, rel=0.01)
+
+
+def _tile(especie, confianca, saude='healthy', confianca_saude=0.9):
+    return {'especie': {'nome': especie, 'confianca': confianca},
+            'saude': {'status': saude, 'confianca': confianca_saude},
+            'debug_info': {}}
+
+
+def test_agregar_tiles_confianca_media_entre_os_tiles_da_especie():
+    resultados = [_tile('Tomato', 0.9), _tile('Tomato', 0.7), _tile('Potato', 0.6)]
+    agregado = agregar_tiles(resultados, [(0, 0), (0, 1), (0, 2)], (1, 3))
+    assert agregado['especie'] == {'nome': 'Tomato', 'confianca': pytest.approx(0.8)}
+
+
+def test_agregar_tiles_poucos_tiles_doentes_bastam():
+    resultados = [_tile('Tomato', 0.9) for _ in range(9)] + [_tile('Tomato', 0.9, 'unhealthy', 0.8)]
+    agregado = agregar_tiles(resultados, [(0, i) for i in range(10)], (1, 10), fracao_doente_minima=0.1)
+    assert agregado['saude']['status'] == 'unhealthy'
+    assert agregado['saude']['tiles_doentes'] == 1 and agregado['saude']['tiles_avaliados'] == 10
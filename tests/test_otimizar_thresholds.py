@@ -0,0 +1,43 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+metrics = pytest.importorskip('sklearn.metrics')
+
+from otimizar_thresholds import curvas_threshold, melhor_threshold
+
+
+def _dados(n=500, semente=0):
+    gerador = np.random.default_rng(semente)
+    rotulos = gerador.integers(0, 2, n)
+    # Probabilidades com empates (arredondadas) para exercitar thresholds repetidos
+    probabilidades = np.clip(rotulos * 0.3 + gerador.random(n) * 0.7, 0, 1).round(2)
+    return probabilidades, rotulos
+
+
+def test_curvas_iguais_ao_sklearn_em_cada_threshold():
+    probabilidades, rotulos = _dados()
+    curvas = curvas_threshold(probabilidades, rotulos)
+    for i, threshold in enumerate(curvas['threshold']):
+        preditos = (probabilidades > threshold).astype(int)
+        assert curvas['precisao'][i] == pytest.approx(
+            metrics.precision_score(rotulos, preditos, zero_division=1.0))
+        assert curvas['recall'][i] == pytest.approx(metrics.recall_score(rotulos, preditos, zero_division=0.0))
+        assert curvas['f1'][i] == pytest.approx(metrics.f1_score(rotulos, preditos, zero_division=0.0))
+        assert curvas['accuracy'][i] == pytest.approx(metrics.accuracy_score(rotulos, preditos))
+        assert curvas['positivos_preditos'][i] == preditos.sum()
+
+
+def test_melhor_threshold_maximiza_f1_com_desempate_pelo_menor():
+    probabilidades, rotulos = _dados(semente=1)
+    curvas = curvas_threshold(probabilidades, rotulos)
+    melhor = melhor_threshold(curvas)
+    f1_sklearn = {t: metrics.f1_score(rotulos, (probabilidades > t).astype(int)) for t in curvas['threshold']}
+    maximo = max(f1_sklearn.values())
+    assert melhor['f1'] == pytest.approx(maximo)
+    assert melhor['threshold'] == min(t for t, f1 in f1_sklearn.items() if f1 == pytest.approx(maximo))
+
+
+def test_sem_positivos():
+    curvas = curvas_threshold(np.array([0.1, 0.5, 0.9]), np.zeros(3, dtype=int))
+    assert np.all(curvas['recall'] == 0)
+    assert np.all(curvas['f1'] == 0)
@@ -0,0 +1,63 @@
+import io
+
+import pytest
+
+np = pytest.importorskip('numpy')
+Image = pytest.importorskip('PIL.Image')
+ImageFilter = pytest.importorskip('PIL.ImageFilter')
+
+from preprocessamento import decodificar_imagem, normalizar_lote, verificar_paridade
+
+# Diferença máxima aceita no modo rápido (decodificação JPEG reduzida): 4 níveis de cinza
+TOLERANCIA_RAPIDO = 4 / 255
+
+
+def _preprocessar_original(img_bytes, target_size=(224, 224)):
+    """Caminho original da API: resize padrão do PIL e divisão por 255.0 em float64"""
+    img = Image.open(io.BytesIO(img_bytes))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img = img.resize(target_size)
+    return np.expand_dims(np.array(img) / 255.0, axis=0)
+
+
+@pytest.fixture(scope='module')
+def jpeg_grande():
+    """Foto sintética 2048x1536: gradientes suaves com manchas, como uma folha fotografada"""
+    gerador = np.random.default_rng(0)
+    altura, largura = 1536, 2048
+    y, x = np.mgrid[0:altura, 0:largura]
+    pixels = np.stack([x / largura * 255, y / altura * 255, (x + y) / (altura + largura) * 255], axis=-1)
+    pixels += gerador.normal(0, 20, (altura // 16, largura // 16, 3)).repeat(16, axis=0).repeat(16, axis=1)
+    img = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).filter(ImageFilter.GaussianBlur(4))
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def test_modo_exato_identico_ao_caminho_original(jpeg_grande):
+    # O Keras converte a entrada float64 para float32; a comparação é bit a bit
+    original = _preprocessar_original(jpeg_grande).astype(np.float32)
+    obtido = decodificar_imagem(jpeg_grande, modo='exato')
+    assert obtido.dtype == np.float32
+    np.testing.assert_array_equal(obtido, original)
+
+
+def test_modo_rapido_dentro_da_tolerancia(jpeg_grande):
+    original = _preprocessar_original(jpeg_grande).astype(np.float32)
+    obtido = decodificar_imagem(jpeg_grande, modo='rapido')
+    diferenca = np.abs(obtido - original)
+    assert diferenca.max() <= TOLERANCIA_RAPIDO
+    assert diferenca.mean() <= 1 / 255
+
+
+def test_verificar_paridade(jpeg_grande):
+    assert verificar_paridade(jpeg_grande, 'exato')['dentro_tolerancia']
+    assert verificar_paridade(jpeg_grande, 'rapido', TOLERANCIA_RAPIDO)['dentro_tolerancia']
+
+
+def test_normalizacao_exata_em_todos_os_valores():
+    valores = np.arange(256, dtype=np.uint8).reshape(1, 16, 16, 1)
+    np.testing.assert_array_equal(normalizar_lote(list(valores), 'exato'),
+                                  (valores / 255.0).astype(np.float32))
+    np.testing.assert_allclose(normalizar_lote(list(valores), 'rapido'), valores / 255.0, atol=1e-7)
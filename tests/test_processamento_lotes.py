@@ -0,0 +1,85 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+from processamento_lotes import executar_em_estagios
+
+
+def _fonte_contada(contador):
+    for i in itertools.count():
+        contador.append(i)
+        yield i
+
+
+def test_preserva_a_ordem_e_respeita_o_tamanho_dos_lotes():
+    lotes = []
+
+    def dobrar(lote):
+        lotes.append(len(lote))
+        return [x * 2 for x in lote]
+
+    saidas = list(executar_em_estagios(range(100), [(dobrar, 8), (lambda lote: [x + 1 for x in lote], 3)],
+                                       tamanho_buffer=4))
+    assert saidas == [x * 2 + 1 for x in range(100)]
+    assert sum(lotes) == 100 and max(lotes) <= 8
+
+
+def test_estagio_pode_expandir_ou_filtrar_itens():
+    saidas = executar_em_estagios(range(10), [(lambda lote: [x for x in lote if x % 2 == 0], 4),
+                                              (lambda lote: [y for x in lote for y in (x, x)], 2)])
+    assert list(saidas) == [0, 0, 2, 2, 4, 4, 6, 6, 8, 8]
+
+
+def test_fonte_vazia():
+    assert list(executar_em_estagios([], [(lambda lote: lote, 4)])) == []
+
+
+def test_erro_de_um_estagio_chega_ao_consumidor():
+    def falhar(lote):
+        if 5 in lote:
+            raise ValueError('item 5')
+        return lote
+
+    with pytest.raises(ValueError, match='item 5'):
+        list(executar_em_estagios(range(10), [(falhar, 1)]))
+
+
+def test_erro_da_fonte_chega_ao_consumidor():
+    def fonte():
+        yield 1
+        raise OSError('arquivo corrompido')
+
+    saidas = executar_em_estagios(fonte(), [(lambda lote: lote, 4)])
+    assert next(saidas) == 1
+    with pytest.raises(OSError, match='arquivo corrompido'):
+        next(saidas)
+
+
+def test_filas_limitadas_com_consumidor_lento():
+    produzidos = []
+    saidas = executar_em_estagios(_fonte_contada(produzidos), [(lambda lote: lote, 1), (lambda lote: lote, 1)],
+                                  tamanho_buffer=2)
+    assert next(saidas) == 0
+    time.sleep(0.5)
+    # 3 filas de 2 itens, mais um item em cada thread e o já entregue
+    assert len(produzidos) <= 3 * 2 + 3 + 1
+    saidas.close()
+
+
+def test_fechar_o_gerador_cancela_os_estagios():
+    produzidos = []
+    threads_antes = set(threading.enumerate())
+    saidas = executar_em_estagios(_fonte_contada(produzidos), [(lambda lote: lote, 4)], tamanho_buffer=2)
+    assert next(saidas) == 0
+    threads = set(threading.enumerate()) - threads_antes
+    assert len(threads) == 2
+    saidas.close()
+
+    for thread in threads:
+        thread.join(timeout=2)
+    assert not any(thread.is_alive() for thread in threads)
+    parados = len(produzidos)
+    time.sleep(0.3)
+    assert len(produzidos) == parados
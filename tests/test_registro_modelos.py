@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from registro_modelos import RegistroModelos
+
+
+@pytest.fixture
+def modelos(tmp_path):
+    arquivos = {}
+    for nome, conteudo in [('especies', b'especies-v1'), ('encoder_especies', b'encoder'),
+                           ('especialista_tomato', b'tomato-v1')]:
+        caminho = tmp_path / f'{nome}.bin'
+        caminho.write_bytes(conteudo)
+        arquivos[nome] = str(caminho)
+    return arquivos
+
+
+@pytest.fixture
+def registro(tmp_path):
+    return RegistroModelos(str(tmp_path / 'registro'))
+
+
+def test_publicar_grava_manifesto_com_hashes(registro, modelos):
+    manifesto = registro.publicar('v1', modelos, base={}, descricao='primeira')
+    assert registro.versoes() == ['v1']
+    assert set(manifesto['arquivos']) == set(modelos)
+    with open(f"{registro.diretorio}/v1/manifesto.json") as f:
+        assert json.load(f)['descricao'] == 'primeira'
+    registro.verificar('v1')
+
+
+def test_versao_herda_da_base_os_arquivos_nao_informados(registro, modelos, tmp_path):
+    registro.publicar('v1', modelos, base={})
+    registro.ativar('v1')
+    novo = tmp_path / 'tomato-v2.bin'
+    novo.write_bytes(b'tomato-v2')
+    manifesto = registro.publicar('v2', {'especialista_tomato': str(novo)})
+
+    v1, v2 = registro.manifesto('v1')['arquivos'], manifesto['arquivos']
+    assert v2['especies'] == v1['especies']
+    assert v2['especialista_tomato'] != v1['especialista_tomato']
+
+
+def test_publicacao_independente_dos_arquivos_de_origem(registro, modelos):
+    registro.publicar('v1', modelos, base={})
+    with open(modelos['especies'], 'wb') as f:
+        f.write(b'regravado pelo notebook')
+    registro.verificar('v1')
+
+
+def test_verificar_recusa_arquivo_alterado(registro, modelos):
+    registro.publicar('v1', modelos, base={})
+    with open(registro.caminhos('v1')['especies'], 'wb') as f:
+        f.write(b'alterado')
+    with pytest.raises(ValueError):
+        registro.verificar('v1')
+
+
+def test_publicar_recusa_caminho_informado_inexistente(registro, modelos):
+    with pytest.raises(FileNotFoundError):
+        registro.publicar('v1', dict(modelos, especialista_tomato='/nao/existe.h5'), base={})
+    assert registro.versoes() == []
+
+
+def test_publicar_recusa_versao_existente_e_nomes_desconhecidos(registro, modelos):
+    registro.publicar('v1', modelos, base={})
+    with pytest.raises(FileExistsError):
+        registro.publicar('v1', modelos, base={})
+    with pytest.raises(ValueError):
+        registro.publicar('v2', {'desconhecido': modelos['especies']}, base={})
+
+
+def test_sem_atual_usa_a_ultima_publicada(registro, modelos):
+    assert registro.versao_atual() is None
+    registro.publicar('v1', modelos, base={})
+    assert registro.versao_atual() == 'v1'
+
+
+def test_ativar_e_rollback(registro, modelos):
+    registro.publicar('v1', modelos, base={})
+    registro.publicar('v2', modelos, base={})
+    registro.ativar('v2')
+    assert registro.versao_atual() == 'v2'
+    registro.ativar('v1')
+    assert registro.versao_atual() == 'v1'
+    with pytest.raises(FileNotFoundError):
+        registro.ativar('v3')
+    assert registro.versao_atual() == 'v1'
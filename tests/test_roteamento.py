@@ -0,0 +1,65 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('fastapi')
+
+import api
+
+CLASSES = np.array(['Pepper_bell', 'Potato', 'Tomato', 'Grape'])
+
+
+@pytest.fixture
+def politica(monkeypatch):
+    def definir(nome, **parametros):
+        monkeypatch.setattr(api, 'POLITICA_ROTEAMENTO', nome)
+        for parametro, valor in parametros.items():
+            monkeypatch.setattr(api, f'ROTEAMENTO_{parametro.upper()}', valor)
+    return definir
+
+
+def test_padrao_usa_o_especialista_da_especie_predita(politica):
+    politica('padrao')
+    rotas = api._rotear_especies(np.array([[0.1, 0.2, 0.7, 0.0]]), CLASSES)
+    assert rotas == [{'decisao': 'especialista', 'especialistas': {'tomato': 1.0}}]
+
+
+def test_especie_sem_especialista(politica):
+    politica('padrao')
+    rotas = api._rotear_especies(np.array([[0.0, 0.1, 0.1, 0.8]]), CLASSES)
+    assert rotas[0]['decisao'] == 'sem_especialista'
+    assert rotas[0]['especialistas'] == {}
+
+
+def test_somente_especies(politica):
+    politica('somente_especies')
+    rotas = api._rotear_especies(np.array([[0.1, 0.2, 0.7, 0.0]]), CLASSES)
+    assert rotas[0] == {'decisao': 'somente_especies', 'especialistas': {}}
+
+
+def test_piso_confianca(politica):
+    politica('piso_confianca', piso_confianca=0.6)
+    rotas = api._rotear_especies(np.array([[0.1, 0.4, 0.5, 0.0], [0.0, 0.1, 0.9, 0.0]]), CLASSES)
+    assert rotas[0]['decisao'] == 'piso_confianca' and rotas[0]['especialistas'] == {}
+    assert rotas[1]['especialistas'] == {'tomato': 1.0}
+
+
+def test_top_k_executa_os_especialistas_das_especies_ambiguas(politica):
+    politica('top_k', top_k=2, margem=0.2)
+    rotas = api._rotear_especies(np.array([[0.05, 0.45, 0.5, 0.0], [0.0, 0.1, 0.9, 0.0]]), CLASSES)
+    assert rotas[0]['decisao'] == 'top_k'
+    assert rotas[0]['especialistas'] == pytest.approx({'tomato': 0.5, 'potato': 0.45})
+    assert rotas[1] == {'decisao': 'especialista', 'especialistas': {'tomato': 1.0}}
+
+
+def test_top_k_ignora_candidato_sem_especialista(politica):
+    politica('top_k', top_k=2, margem=0.2)
+    rotas = api._rotear_especies(np.array([[0.0, 0.05, 0.5, 0.45]]), CLASSES)
+    assert rotas[0] == {'decisao': 'especialista', 'especialistas': {'tomato': 0.5}}
+
+
+def test_configuracao_roteamento_entra_na_chave_do_cache(politica):
+    politica('padrao')
+    padrao = api.configuracao_roteamento()
+    politica('top_k', top_k=2, margem=0.2)
+    assert api.configuracao_roteamento() == {'politica': 'top_k', 'top_k': 2, 'margem': 0.2}
+    assert api.configuracao_roteamento() != padrao
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import serializacao
+from serializacao import TIPO_JSON_COMPACTO, json_bytes, negociar_formato, resposta
+
+
+@pytest.mark.parametrize('modo, accept, esperado', [
+    (None, None, ('completo', False)),
+    (None, 'application/json', ('completo', False)),
+    (None, TIPO_JSON_COMPACTO, ('compacto', False)),
+    (None, 'Application/VND.Plant.Compacto+JSON', ('compacto', False)),
+    ('completo', TIPO_JSON_COMPACTO, ('completo', False)),
+    ('compacto', 'application/json', ('compacto', False)),
+    (None, 'application/json;q=0.5, */*', ('completo', False)),
+])
+def test_modo_pela_query_ou_pelo_accept(modo, accept, esperado):
+    assert negociar_formato(modo, accept) == esperado
+
+
+def test_padrao_configuravel():
+    assert negociar_formato(None, '*/*', padrao='compacto') == ('compacto', False)
+
+
+def test_modo_invalido():
+    with pytest.raises(HTTPException) as erro:
+        negociar_formato('resumido', None)
+    assert erro.value.status_code == 400
+
+
+def test_msgpack_pelo_accept():
+    pytest.importorskip('msgpack')
+    assert negociar_formato(None, 'application/msgpack') == ('completo', True)
+    assert negociar_formato('compacto', 'application/x-msgpack') == ('compacto', True)
+
+
+def test_msgpack_indisponivel_responde_406(monkeypatch):
+    monkeypatch.setattr(serializacao, 'msgpack', None)
+    with pytest.raises(HTTPException) as erro:
+        negociar_formato(None, 'application/msgpack')
+    assert erro.value.status_code == 406
+
+
+def test_resposta_json_e_msgpack_com_o_mesmo_conteudo():
+    msgpack = pytest.importorskip('msgpack')
+    conteudo = {'especie': 'Tomato', 'confianca': 0.97, 'saude': 'doente', 'sintomas': ['mancha']}
+
+    json_resp = resposta(conteudo)
+    assert json_resp.media_type == 'application/json'
+    assert json.loads(json_resp.body) == conteudo
+
+    binaria = resposta(conteudo, binario=True, status_code=207)
+    assert binaria.media_type == 'application/msgpack' and binaria.status_code == 207
+    assert msgpack.unpackb(binaria.body, raw=False) == conteudo
+
+
+def test_json_bytes_sem_orjson(monkeypatch):
+    monkeypatch.setattr(serializacao, 'orjson', None)
+    assert json_bytes({'saude': 'saudável'}) == '{"saude":"saudável"}'.encode('utf-8')
+    assert json.loads(resposta({'a': 1}).body) == {'a': 1}
@@ -0,0 +1,113 @@
+"""
+Thresholds científicos dos especialistas e o arquivo versionado que os substitui
+
+Módulo leve (sem TensorFlow nem FastAPI) compartilhado pela API e pelas
+ferramentas offline: todas aplicam os mesmos thresholds. O arquivo
+(THRESHOLDS_ARQUIVO) é gerado por `otimizar_thresholds.py`; sem ele valem
+os valores padrão abaixo.
+"""
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+ARQUIVO_THRESHOLDS = 'modelos_salvos/thresholds.json'
+DIRETORIO_VERSOES = 'modelos_salvos/thresholds'
+
+# THRESHOLDS CIENTÍFICOS OTIMIZADOS
+# Valores encontrados através de análise científica de dados reais
+# Baseado em maximização do F1-Score para cada espécie
+THRESHOLDS_PADRAO = {
+    'tomato': 0.75,    # F1=100% - Threshold alto para modelo sensível
+    'potato': 0.65,    # F1=95.2% - Threshold médio-alto equilibrado
+    'pepper': 0.15     # F1=95.2% - Threshold baixo para modelo conservador
+}
+
+
+def arquivo_thresholds() -> str:
+    """Arquivo de thresholds configurado (THRESHOLDS_ARQUIVO)"""
+    return os.getenv('THRESHOLDS_ARQUIVO', ARQUIVO_THRESHOLDS)
+
+
+def ler_thresholds(arquivo: str) -> Dict[str, Any]:
+    """
+    Lê e valida um arquivo de thresholds
+
+    Raises:
+        ValueError: Se o conteúdo não tem thresholds numéricos entre 0 e 1
+    """
+    with open(arquivo) as f:
+        conteudo = json.load(f)
+    thresholds = conteudo.get('thresholds')
+    if not isinstance(thresholds, dict) or not thresholds:
+        raise ValueError(f"{arquivo} não contém 'thresholds'")
+    for especie, valor in thresholds.items():
+        if not isinstance(valor, (int, float)) or not 0.0 <= valor <= 1.0:
+            raise ValueError(f"Threshold inválido para {especie}: {valor!r}")
+    return conteudo
+
+
+class MonitorThresholds:
+    """
+    Recarrega o arquivo de thresholds quando ele muda no disco
+
+    Verifica tamanho/mtime a cada `intervalo` segundos em uma thread daemon e
+    chama `aplicar(conteudo)` com o arquivo já validado. Um arquivo inválido
+    é ignorado (e reportado a `ao_falhar`), mantendo os thresholds em uso.
+    """
+
+    def __init__(self, arquivo: str, aplicar: Callable[[Dict[str, Any]], None],
+                 ao_falhar: Optional[Callable[[Exception], None]] = None):
+        self.arquivo = arquivo
+        self.aplicar = aplicar
+        self.ao_falhar = ao_falhar
+        self._assinatura = None
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def recarregar(self) -> bool:
+        """Aplica o arquivo se ele mudou desde a última leitura; retorna se aplicou"""
+        try:
+            info = os.stat(self.arquivo)
+        except FileNotFoundError:
+            return False
+        assinatura = (info.st_size, info.st_mtime_ns)
+        if assinatura == self._assinatura:
+            return False
+        self._assinatura = assinatura
+        try:
+            conteudo = ler_thresholds(self.arquivo)
+        except (OSError, ValueError) as e:
+            if self.ao_falhar:
+                self.ao_falhar(e)
+            return False
+        self.aplicar(conteudo)
+        return True
+
+    def iniciar(self, intervalo: float):
+        """Carrega o arquivo agora e, com `intervalo` > 0, passa a vigiá-lo"""
+        self.recarregar()
+        if intervalo > 0 and self._thread is None:
+            def vigiar():
+                while not self._parar.wait(intervalo):
+                    self.recarregar()
+
+            self._thread = threading.Thread(target=vigiar, name='thresholds', daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+
+def thresholds_em_uso(arquivo: Optional[str] = None) -> Tuple[Dict[str, float], str]:
+    """
+    Thresholds ativos: os do arquivo publicado sobre os valores padrão
+
+    Returns:
+        tuple: (thresholds por especialista, versão do arquivo ou 'padrao')
+    """
+    arquivo = arquivo or arquivo_thresholds()
+    if not os.path.exists(arquivo):
+        return dict(THRESHOLDS_PADRAO), 'padrao'
+    conteudo = ler_thresholds(arquivo)
+    return {**THRESHOLDS_PADRAO, **conteudo['thresholds']}, str(conteudo.get('versao', 'desconhecida'))
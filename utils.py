@@ -3,6 +3,9 @@ import numpy as np
 import json
 import pickle
 import os
+import time
+import warnings
+import tensorflow as tf
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.models import load_model
 from tensorflow.keras.preprocessing import image
@@ -42,6 +45,47 @@ def carregar_dataset_especialista(especie, caminho_base='datasets_processados'):
         'test': {'X': test_data['caminho'].values, 'y': test_data['classe'].values}
     }
 
+def carregar_dataset_cache(nome, caminho_base='datasets_processados/cache'):
+    """
+    Carrega um dataset do cache gerado por `cache_dataset.py`
+    
+    Mesma estrutura de `carregar_dataset_especies`, mas com 'X' como array
+    uint8 (N, altura, largura, 3) mapeado em memória: fatias como
+    `X[inicio:fim]` não copiam nem decodificam nada. Os caminhos originais
+    ficam em 'caminhos'.
+    """
+    diretorio = nome if os.path.isdir(nome) else f'{caminho_base}/{nome}'
+    caminho_meta = f'{diretorio}/metadados.json'
+    if not os.path.exists(caminho_meta):
+        raise FileNotFoundError(f"Cache incompleto ou inexistente em {diretorio} (execute cache_dataset.py)")
+    with open(caminho_meta, 'r') as f:
+        meta = json.load(f)
+    
+    if os.path.exists(meta['origem']):
+        from cache_dataset import hash_arquivo
+        if hash_arquivo(meta['origem']) != meta['csv_sha256']:
+            warnings.warn(f"{meta['origem']} mudou desde a geração do cache em {diretorio} "
+                          "(execute cache_dataset.py para regenerá-lo)")
+    
+    indice = pd.read_csv(f'{diretorio}/indice.csv')
+    dataset = {}
+    for split in meta['splits']:
+        dados = indice[indice['split'] == split].sort_values('posicao')
+        dataset[split] = {
+            'X': np.load(f'{diretorio}/{split}.npy', mmap_mode='r'),
+            'y': dados['rotulo'].values,
+            'caminhos': dados['caminho'].values
+        }
+    return dataset
+
+def carregar_dataset_especies_cache(caminho_base='datasets_processados/cache'):
+    """Carrega o dataset de espécies do cache mapeado em memória"""
+    return carregar_dataset_cache('dataset_especies', caminho_base)
+
+def carregar_dataset_especialista_cache(especie, caminho_base='datasets_processados/cache'):
+    """Carrega o dataset de um especialista do cache mapeado em memória"""
+    return carregar_dataset_cache(f'dataset_{especie.lower()}', caminho_base)
+
 def carregar_label_encoder(tipo, especie=None, caminho_base='datasets_processados'):
     """Carrega label encoder"""
     if tipo == 'especies':
@@ -102,6 +146,214 @@ def criar_geradores(dataset, config, augment_train=True):
     
     return train_gen, val_gen, test_gen
 
+def _matrizes_aumento(tamanho_lote, altura, largura, rotacao=20, deslocamento_largura=0.2,
+                      deslocamento_altura=0.2, cisalhamento=0.2, zoom=0.2):
+    """
+    Transformações afins aleatórias de um lote, como no ImageDataGenerator
+    
+    Compõe rotação, deslocamento, cisalhamento (graus) e zoom na mesma ordem e
+    em torno do mesmo centro do `apply_affine_transform` do Keras, em
+    coordenadas (linha, coluna), e converte para os 8 parâmetros do
+    `ImageProjectiveTransformV3` (saída → entrada, coordenadas (x, y)).
+    """
+    def uniforme(limite):
+        return tf.random.uniform([tamanho_lote], -limite, limite)
+    
+    theta = uniforme(rotacao) * (np.pi / 180)
+    tx = uniforme(deslocamento_altura) * altura
+    ty = uniforme(deslocamento_largura) * largura
+    shear = uniforme(cisalhamento) * (np.pi / 180)
+    zx = tf.random.uniform([tamanho_lote], 1 - zoom, 1 + zoom)
+    zy = tf.random.uniform([tamanho_lote], 1 - zoom, 1 + zoom)
+    
+    zeros = tf.zeros([tamanho_lote])
+    uns = tf.ones([tamanho_lote])
+    
+    def matriz(*linhas):
+        return tf.reshape(tf.stack([v for linha in linhas for v in linha], axis=1), [tamanho_lote, 3, 3])
+    
+    rot = matriz((tf.cos(theta), -tf.sin(theta), zeros), (tf.sin(theta), tf.cos(theta), zeros), (zeros, zeros, uns))
+    desl = matriz((uns, zeros, tx), (zeros, uns, ty), (zeros, zeros, uns))
+    cis = matriz((uns, -tf.sin(shear), zeros), (zeros, tf.cos(shear), zeros), (zeros, zeros, uns))
+    zoo = matriz((zx, zeros, zeros), (zeros, zy, zeros), (zeros, zeros, uns))
+    
+    o_x, o_y = altura / 2 + 0.5, largura / 2 + 0.5
+    centro = tf.constant([[1, 0, o_x], [0, 1, o_y], [0, 0, 1]], tf.float32)
+    volta = tf.constant([[1, 0, -o_x], [0, 1, -o_y], [0, 0, 1]], tf.float32)
+    m = centro @ rot @ desl @ cis @ zoo @ volta
+    
+    # (linha, coluna) → (x=coluna, y=linha)
+    return tf.stack([m[:, 1, 1], m[:, 1, 0], m[:, 1, 2],
+                     m[:, 0, 1], m[:, 0, 0], m[:, 0, 2], zeros, zeros], axis=1)
+
+def aumentar_lote(imagens, brilho=(0.8, 1.2), **parametros_afins):
+    """
+    Data augmentation vetorizada sobre um lote float32 na escala 0-255
+    
+    Equivalente às configurações de `criar_geradores` (rotação, deslocamentos,
+    cisalhamento, zoom, flip horizontal e brilho), com preenchimento 'nearest'
+    e interpolação bilinear, aplicada ao lote inteiro em poucas operações.
+    """
+    forma = tf.shape(imagens)
+    tamanho_lote, altura, largura = forma[0], forma[1], forma[2]
+    
+    transformacoes = _matrizes_aumento(
+        tamanho_lote, tf.cast(altura, tf.float32), tf.cast(largura, tf.float32), **parametros_afins
+    )
+    imagens = tf.raw_ops.ImageProjectiveTransformV3(
+        images=imagens, transforms=transformacoes, output_shape=forma[1:3],
+        fill_value=0.0, interpolation='BILINEAR', fill_mode='NEAREST'
+    )
+    
+    flip = tf.random.uniform([tamanho_lote, 1, 1, 1]) < 0.5
+    imagens = tf.where(flip, tf.reverse(imagens, axis=[2]), imagens)
+    
+    fator = tf.random.uniform([tamanho_lote, 1, 1, 1], brilho[0], brilho[1])
+    return tf.clip_by_value(imagens * fator, 0.0, 255.0)
+
+def _anotar_dataset(ds, indices, class_indices, batch_size, caminhos):
+    """Atributos dos geradores do Keras usados nos notebooks, em um tf.data.Dataset"""
+    ds.classes = indices
+    ds.class_indices = class_indices
+    ds.samples = ds.n = len(indices)
+    ds.batch_size = batch_size
+    ds.filenames = list(caminhos)
+    ds.reset = lambda: None
+    return ds
+
+def criar_datasets_tfdata(dataset, config, augment_train=True, cache_val_test=True, seed=None):
+    """
+    Alternativa a `criar_geradores` baseada em tf.data
+    
+    Decodificação paralela, augmentation vetorizada por lote, cache das
+    imagens decodificadas de validação/teste (em memória, ou em arquivo se
+    `cache_val_test` for um caminho) e prefetch. Retorna (train, val, test)
+    com os mesmos lotes (imagens 0-1, rótulos one-hot em ordem alfabética) e
+    os atributos usados nos notebooks: `classes`, `class_indices`, `samples`,
+    `n`, `batch_size`, `filenames` e `reset()`.
+    """
+    altura, largura = config['img_height'], config['img_width']
+    batch_size = config['batch_size']
+    autotune = tf.data.AUTOTUNE
+    
+    nomes_classes = sorted(np.unique(dataset['train']['y']))
+    class_indices = {classe: i for i, classe in enumerate(nomes_classes)}
+    
+    def carregar(caminho, rotulo):
+        img = tf.io.decode_image(tf.io.read_file(caminho), channels=3, expand_animations=False)
+        # 'nearest' é a interpolação padrão do flow_from_dataframe
+        img = tf.image.resize(img, (altura, largura), method='nearest')
+        img.set_shape((altura, largura, 3))
+        return img, rotulo
+    
+    def normalizar(imagens, rotulos):
+        return tf.cast(imagens, tf.float32) / 255.0, rotulos
+    
+    def criar(split, treino):
+        caminhos = [str(c) for c in dataset[split]['X']]
+        indices = np.array([class_indices[c] for c in dataset[split]['y']], dtype=np.int32)
+        rotulos = np.eye(len(nomes_classes), dtype=np.float32)[indices]
+        
+        ds = tf.data.Dataset.from_tensor_slices((caminhos, rotulos))
+        if treino:
+            ds = ds.shuffle(len(caminhos), seed=seed, reshuffle_each_iteration=True)
+        ds = ds.map(carregar, num_parallel_calls=autotune, deterministic=not treino)
+        if not treino and cache_val_test:
+            ds = ds.cache(cache_val_test if isinstance(cache_val_test, str) else '')
+        ds = ds.batch(batch_size)
+        if treino and augment_train:
+            ds = ds.map(lambda x, y: (aumentar_lote(tf.cast(x, tf.float32)), y), num_parallel_calls=autotune)
+        ds = ds.map(normalizar, num_parallel_calls=autotune).prefetch(autotune)
+        
+        return _anotar_dataset(ds, indices, class_indices, batch_size, caminhos)
+    
+    return criar('train', True), criar('val', False), criar('test', False)
+
+def criar_datasets_cache(dataset, config, augment_train=True, seed=None):
+    """
+    Equivalente a `criar_datasets_tfdata` para um dataset de `carregar_dataset_cache`
+    
+    Os lotes saem direto do array mapeado em memória (fatias contíguas em
+    validação/teste; índices ordenados dentro de cada lote embaralhado no
+    treino), sem decodificar imagens.
+    """
+    altura, largura = config['img_height'], config['img_width']
+    batch_size = config['batch_size']
+    autotune = tf.data.AUTOTUNE
+    
+    if dataset['train']['X'].shape[1:3] != (altura, largura):
+        raise ValueError(f"Cache com imagens {dataset['train']['X'].shape[1:3]}, "
+                         f"configuração pede {(altura, largura)}")
+    
+    nomes_classes = sorted(np.unique(dataset['train']['y']))
+    class_indices = {classe: i for i, classe in enumerate(nomes_classes)}
+    rng = np.random.default_rng(seed)
+    
+    def criar(split, treino):
+        X = dataset[split]['X']
+        indices = np.array([class_indices[c] for c in dataset[split]['y']], dtype=np.int32)
+        rotulos = np.eye(len(nomes_classes), dtype=np.float32)[indices]
+        
+        def gerar():
+            ordem = rng.permutation(len(X)) if treino else None
+            for inicio in range(0, len(X), batch_size):
+                if ordem is None:
+                    yield X[inicio:inicio + batch_size], rotulos[inicio:inicio + batch_size]
+                else:
+                    lote = np.sort(ordem[inicio:inicio + batch_size])
+                    yield X[lote], rotulos[lote]
+        
+        ds = tf.data.Dataset.from_generator(gerar, output_signature=(
+            tf.TensorSpec((None, altura, largura, 3), tf.uint8),
+            tf.TensorSpec((None, len(nomes_classes)), tf.float32)
+        ))
+        ds = ds.apply(tf.data.experimental.assert_cardinality(-(-len(X) // batch_size)))
+        if treino and augment_train:
+            ds = ds.map(lambda x, y: (aumentar_lote(tf.cast(x, tf.float32)), y), num_parallel_calls=autotune)
+        ds = ds.map(lambda x, y: (tf.cast(x, tf.float32) / 255.0, y), num_parallel_calls=autotune)
+        ds = ds.prefetch(autotune)
+        return _anotar_dataset(ds, indices, class_indices, batch_size, dataset[split].get('caminhos', ()))
+    
+    return criar('train', True), criar('val', False), criar('test', False)
+
+def medir_vazao(gerador, lotes=None, aquecimento=2):
+    """
+    Imagens por segundo produzidas por um gerador Keras ou um tf.data.Dataset
+    
+    Os primeiros `aquecimento` lotes (abertura de arquivos, preenchimento do
+    prefetch) não entram na medição. Com `lotes=None` mede a passagem inteira.
+    Retorna None se não sobrar nenhum lote para medir depois do aquecimento.
+    """
+    if lotes is None:
+        lotes = len(gerador) - aquecimento
+    if lotes < 1:
+        return None
+    iterador = iter(gerador)
+    try:
+        for _ in range(aquecimento):
+            next(iterador)
+    except StopIteration:
+        return None
+    
+    imagens = 0
+    inicio = time.perf_counter()
+    for _ in range(lotes):
+        try:
+            x, _ = next(iterador)
+        except StopIteration:
+            break
+        imagens += len(x)
+    decorrido = time.perf_counter() - inicio
+    if imagens == 0:
+        return None
+    vazao = imagens / decorrido
+    
+    # O cache do tf.data só é gravado ao fim de uma passagem completa
+    if isinstance(gerador, tf.data.Dataset):
+        for _ in iterador:
+            pass
+    return vazao
+
 def carregar_modelo_especies(caminho_modelo='modelos_salvos/melhor_modelo_especies_final.h5',
                            caminho_encoder='datasets_processados/label_encoder_especies_modelo.pkl'):
     """Carrega modelo de classificação de espécies e seu encoder"""